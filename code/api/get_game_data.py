@@ -2,10 +2,15 @@ import requests
 import psycopg2
 from dotenv import load_dotenv
 import os
+import sys
 import json
 from time import sleep
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.metrics import metrics
+
 load_dotenv()
+metrics.start('get_game_data')
 
 API_URL = 'https://api.mobygames.com/v1/games'
 FETCH_LIMIT = 10
@@ -25,10 +30,15 @@ game_ids = cursor.fetchall()
 
 for game_id in game_ids:
     params={'format':'normal','api_key':os.getenv("API_KEY"), 'id':game_id}
-    response = requests.get(url=API_URL, params=params)
+    with metrics.timer('http_request', host='api.mobygames.com'):
+        response = requests.get(url=API_URL, params=params)
+    metrics.increment('bytes', len(response.content), stage='http')
     game_data = response.json()
     cursor.execute('''INSERT INTO game_api_response (game_id, response) VALUES (%s, %s)''', (game_id, json.dumps(game_data['games'][0])))
-    connection.commit()
+    with metrics.timer('db_commit'):
+        connection.commit()
+    metrics.increment('rows', stage='api_fetch')
     print(game_id[0])
-    sleep(SLEEP_DURATION)
+    with metrics.timer('rate_limit_wait'):
+        sleep(SLEEP_DURATION)
 connection.close()
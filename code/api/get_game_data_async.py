@@ -0,0 +1,263 @@
+import aiohttp
+import asyncio
+import psycopg2
+from dotenv import load_dotenv
+import os
+import sys
+import time
+import random
+import argparse
+from urllib.parse import urlparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.bulk_load import bulk_insert
+from common.rate_limit import AsyncTokenBucket, AsyncSharedRateLimiter
+from common.metrics import metrics
+from common.job_queue import JobQueue
+
+load_dotenv()
+
+# Can be pointed to a local stub server for testing
+API_URL = os.getenv('MOBYGAMES_API_URL', 'https://api.mobygames.com/v1/games')
+FETCH_LIMIT = 10
+
+# Request quota of the API key, the hourly quota is optional
+REQUESTS_PER_SECOND = float(os.getenv('API_REQUESTS_PER_SECOND', 1))
+REQUESTS_PER_HOUR = os.getenv('API_REQUESTS_PER_HOUR')
+
+# Queue shared by all processes that run with --queue
+QUEUE_NAME = 'game_api_response'
+MISSING_GAMES_QUERY = '''SELECT game_id FROM game g WHERE NOT EXISTS (SELECT 1 FROM game_api_response r WHERE r.game_id = g.game_id)'''
+
+MAX_CONCURRENCY = 4
+MAX_RETRIES = 5
+BACKOFF_BASE = 2
+INSERT_BATCH_SIZE = 50
+
+
+def connect_to_database():
+    return psycopg2.connect(
+        database=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+    )
+
+def select_missing_game_ids(cursor, limit):
+    """
+    Select the games that have no API response yet. Requests finish out of 
+    order, so after a crash there can be gaps below MAX(game_id) that a 
+    plain "game_id > MAX(game_id)" would skip.
+
+    :param cursor: Cursor of the database connection
+    :param limit: Maximum number of game IDs
+    :return: List of game IDs
+    """
+    cursor.execute(MISSING_GAMES_QUERY + ''' ORDER BY game_id LIMIT %s''', (limit,))
+    return [row[0] for row in cursor.fetchall()]
+
+def retry_delay(attempt, retry_after=None):
+    """
+    Delay before the next attempt, honours the Retry-After header if sent.
+
+    :param attempt: Number of the failed attempt, starting at 0
+    :param retry_after: Value of the Retry-After header
+    :return: Delay in seconds
+    """
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return BACKOFF_BASE ** attempt + random.uniform(0, 1)
+
+async def fetch_game(session, rate_limiters, game_id):
+    """
+    Fetch the API response of a game. Retries with backoff on 429 and 5xx 
+    responses and connection errors.
+
+    :param session: Shared HTTP session
+    :param rate_limiters: Token buckets, every request takes a token of each
+    :param game_id: ID of the game
+    :return: Game data as dict, None if the game could not be fetched
+    """
+    params = {'format': 'normal', 'api_key': os.getenv("API_KEY", ""), 'id': game_id}
+
+    for attempt in range(MAX_RETRIES + 1):
+        for rate_limiter in rate_limiters:
+            await rate_limiter.acquire()
+
+        try:
+            start = time.perf_counter()
+            async with session.get(API_URL, params=params) as response:
+                body = await response.read()
+                metrics.observe('http_request', time.perf_counter() - start, host=urlparse(API_URL).netloc)
+                metrics.increment('bytes', len(body), stage='http')
+
+                if response.status == 200:
+                    metrics.increment('rows', stage='api_fetch')
+                    return (await response.json())['games'][0]
+
+                if response.status != 429 and response.status < 500:
+                    print(f"Failed to fetch game {game_id}. Status code: {response.status}")
+                    return None
+
+                delay = retry_delay(attempt, response.headers.get('Retry-After'))
+                metrics.increment('retries', stage='api_fetch', reason=response.status)
+                print(f"Retrying game {game_id} in {delay:.1f}s. Status code: {response.status}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            delay = retry_delay(attempt)
+            metrics.increment('retries', stage='api_fetch', reason=type(e).__name__)
+            print(f"Retrying game {game_id} in {delay:.1f}s. Error: {e}")
+
+        await asyncio.sleep(delay)
+
+    print(f"Giving up on game {game_id} after {MAX_RETRIES} retries")
+    return None
+
+def insert_responses(connection, responses):
+    """
+    Insert a batch of API responses with a single COPY and commit them.
+
+    :param connection: Database connection
+    :param responses: List of (game_id, game_data) tuples
+    """
+    with connection.cursor() as cursor:
+        bulk_insert(cursor, 'game_api_response', ['game_id', 'response'], responses)
+    with metrics.timer('db_commit'):
+        connection.commit()
+
+async def fetch_worker(session, rate_limiters, game_queue, result_queue):
+    while True:
+        game_id = await game_queue.get()
+        try:
+            game_data = await fetch_game(session, rate_limiters, game_id)
+        except Exception as e:
+            print(f"Failed to fetch game {game_id}. Error: {e}")
+            game_data = None
+        await result_queue.put((game_id, game_data))
+        game_queue.task_done()
+
+def create_rate_limiters(connection=None):
+    """
+    Create the token buckets of the request quota. They are created once per
+    process, new buckets would allow a burst again. The hourly bucket only 
+    allows a burst of one request, a full bucket would allow up to twice the 
+    quota within an hour.
+
+    :param connection: Database connection for limiters shared by all processes, None for limiters of this process
+    :return: List of token buckets
+    """
+    if connection is not None:
+        # The quota belongs to the API key, so all --queue workers share one limit
+        rate_limiters = [AsyncSharedRateLimiter(connection, 'api per second', REQUESTS_PER_SECOND)]
+        if REQUESTS_PER_HOUR:
+            rate_limiters.append(AsyncSharedRateLimiter(connection, 'api per hour', float(REQUESTS_PER_HOUR) / 3600))
+        return rate_limiters
+
+    rate_limiters = [AsyncTokenBucket(REQUESTS_PER_SECOND)]
+    if REQUESTS_PER_HOUR:
+        rate_limiters.append(AsyncTokenBucket(float(REQUESTS_PER_HOUR) / 3600))
+    return rate_limiters
+
+async def fetch_games(game_ids, rate_limiters, concurrency=MAX_CONCURRENCY):
+    """
+    Fetch the API responses of the given games concurrently, within the 
+    request quota, and insert them in batches.
+
+    :param game_ids: List of game IDs
+    :param rate_limiters: Token buckets of the request quota, see create_rate_limiters
+    :param concurrency: Maximum number of requests in flight
+    :return: Dict of the games that could not be fetched and the error
+    """
+    game_queue = asyncio.Queue()
+    result_queue = asyncio.Queue()
+    for game_id in game_ids:
+        game_queue.put_nowait(game_id)
+
+    connection = connect_to_database()
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60)) as session:
+        workers = [asyncio.create_task(fetch_worker(session, rate_limiters, game_queue, result_queue))
+                   for _ in range(concurrency)]
+
+        responses = []
+        failed = {}
+        try:
+            for _ in range(len(game_ids)):
+                game_id, game_data = await result_queue.get()
+                if game_data is None:
+                    failed[game_id] = 'no API response'
+                    continue
+
+                responses.append((game_id, game_data))
+                print(game_id)
+
+                if len(responses) >= INSERT_BATCH_SIZE:
+                    await asyncio.to_thread(insert_responses, connection, responses)
+                    responses = []
+
+            # Insert the remaining responses
+            if responses:
+                await asyncio.to_thread(insert_responses, connection, responses)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            connection.close()
+
+    return failed
+
+async def fetch_games_from_queue(connection, job_queue, rate_limiters, batch_size, limit, concurrency=MAX_CONCURRENCY):
+    """
+    Fetch the games of the job queue batch by batch. The queue is processed
+    on a thread, while all batches run on this event loop and share the 
+    token buckets.
+
+    :param connection: Database connection of the job queue
+    :param job_queue: Job queue of the games
+    :param rate_limiters: Token buckets of the request quota, see create_rate_limiters
+    :param batch_size: Number of games claimed at once
+    :param limit: Maximum number of games
+    :param concurrency: Maximum number of requests in flight
+    """
+    loop = asyncio.get_running_loop()
+
+    def process_batch(game_ids):
+        return asyncio.run_coroutine_threadsafe(fetch_games(game_ids, rate_limiters, concurrency), loop).result()
+
+    await asyncio.to_thread(job_queue.run, connection, batch_size, process_batch, limit)
+
+def main():
+    parser = argparse.ArgumentParser(description='Fetch the API responses of the games concurrently.')
+    parser.add_argument('--limit', type=int, default=FETCH_LIMIT, help='maximum number of games to fetch')
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENCY, help='maximum number of requests in flight')
+    parser.add_argument('--queue', action='store_true',
+                        help='claim the games from the shared job queue, several processes can run at once and share the request quota')
+    parser.add_argument('--batch-size', type=int, default=INSERT_BATCH_SIZE, help='number of games claimed at once with --queue')
+    args = parser.parse_args()
+
+    metrics.start('get_game_data_async')
+    connection = connect_to_database()
+
+    if args.queue:
+        # Every process claims its own batches, the limit counts per process
+        job_queue = JobQueue(QUEUE_NAME)
+        job_queue.seed(connection, MISSING_GAMES_QUERY)
+        limiter_connection = connect_to_database()
+        try:
+            rate_limiters = create_rate_limiters(limiter_connection)
+            asyncio.run(fetch_games_from_queue(connection, job_queue, rate_limiters, args.batch_size, args.limit, args.concurrency))
+        finally:
+            limiter_connection.close()
+            connection.close()
+        return
+
+    rate_limiters = create_rate_limiters()
+
+    with connection.cursor() as cursor:
+        game_ids = select_missing_game_ids(cursor, args.limit)
+    connection.close()
+
+    asyncio.run(fetch_games(game_ids, rate_limiters, args.concurrency))
+
+
+# Allows the script to be imported without running main()
+if __name__ == '__main__':
+    main()
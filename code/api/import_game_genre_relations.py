@@ -1,9 +1,27 @@
 import psycopg2
 from dotenv import load_dotenv
 import os
+import sys
+import argparse
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.bulk_load import bulk_insert
+from common.metrics import metrics
+
+# Extract the genres inside Postgres, the responses never leave the database
+GAMES_GENRES_QUERY = '''INSERT INTO games_genres (game_id, genre_id)
+                        SELECT DISTINCT game_id, (genre->>'genre_id')::int
+                        FROM game_api_response, jsonb_array_elements(response->'genres') AS genre
+                        WHERE game_id > %s
+                        ON CONFLICT DO NOTHING'''
+
+parser = argparse.ArgumentParser(description='Import the genres of the games from the API responses.')
+parser.add_argument('--in-database', action='store_true',
+                    help='extract the genres with SQL in Postgres instead of loading the responses into Python')
+args = parser.parse_args()
 
 load_dotenv()
+metrics.start('import_game_genre_relations')
 
 connection = psycopg2.connect(
             database=os.getenv("DB_NAME"),
@@ -12,14 +30,31 @@ connection = psycopg2.connect(
             host=os.getenv("DB_HOST"),
         )
 cursor = connection.cursor()
-cursor.execute('''SELECT MAX(game_id) FROM games_genres''')
+cursor.execute('''SELECT COALESCE(MAX(game_id), 0) FROM games_genres''')
 last_game_id = cursor.fetchone()[0]
-cursor.execute('''SELECT game_id, response from game_api_response WHERE game_id > %s ORDER BY game_id''', (last_game_id,))
+
+if args.in_database:
+    with metrics.timer('db_insert', table='games_genres'):
+        cursor.execute(GAMES_GENRES_QUERY, (last_game_id,))
+    metrics.increment('rows', cursor.rowcount, stage='db_insert', table='games_genres')
+    with metrics.timer('db_commit'):
+        connection.commit()
+    connection.close()
+    sys.exit()
+
+with metrics.timer('db_fetch', table='game_api_response'):
+    cursor.execute('''SELECT game_id, response from game_api_response WHERE game_id > %s ORDER BY game_id''', (last_game_id,))
+    raw_responses = cursor.fetchall()
 #cursor.execute('''SELECT game_id, response from game_api_response ORDER BY game_id ''')
-raw_responses = cursor.fetchall()
+metrics.increment('rows', len(raw_responses), stage='db_fetch', table='game_api_response')
 
+games_genres = []
 for response in raw_responses:
     for genre in response[1]['genres']:
-        cursor.execute('''INSERT INTO games_genres (game_id, genre_id) VALUES (%s, %s)''', (response[0], genre['genre_id']))
+        games_genres.append((response[0], genre['genre_id']))
+
+# Load all rows at once, duplicates are skipped by the database
+bulk_insert(cursor, 'games_genres', ['game_id', 'genre_id'], games_genres)
+with metrics.timer('db_commit'):
     connection.commit()
 connection.close()
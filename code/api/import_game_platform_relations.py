@@ -1,9 +1,32 @@
 import psycopg2
 from dotenv import load_dotenv
 import os
+import sys
+import argparse
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.bulk_load import bulk_insert
+from common.metrics import metrics
+
+# Extract the platforms inside Postgres, the responses never leave the database
+PLATFORM_QUERY = '''INSERT INTO platform (platform_id, name)
+                    SELECT DISTINCT ON ((platform->>'platform_id')::int) (platform->>'platform_id')::int, platform->>'platform_name'
+                    FROM game_api_response, jsonb_array_elements(response->'platforms') AS platform
+                    WHERE game_id > %s
+                    ON CONFLICT DO NOTHING'''
+GAMES_PLATFORMS_QUERY = '''INSERT INTO games_platforms (game_id, platform_id)
+                           SELECT DISTINCT game_id, (platform->>'platform_id')::int
+                           FROM game_api_response, jsonb_array_elements(response->'platforms') AS platform
+                           WHERE game_id > %s
+                           ON CONFLICT DO NOTHING'''
+
+parser = argparse.ArgumentParser(description='Import the platforms of the games from the API responses.')
+parser.add_argument('--in-database', action='store_true',
+                    help='extract the platforms with SQL in Postgres instead of loading the responses into Python')
+args = parser.parse_args()
 
 load_dotenv()
+metrics.start('import_game_platform_relations')
 
 connection = psycopg2.connect(
             database=os.getenv("DB_NAME"),
@@ -12,15 +35,37 @@ connection = psycopg2.connect(
             host=os.getenv("DB_HOST"),
         )
 cursor = connection.cursor()
-cursor.execute('''SELECT MAX(game_id) FROM games_platforms''')
+cursor.execute('''SELECT COALESCE(MAX(game_id), 0) FROM games_platforms''')
 last_game_id = cursor.fetchone()[0]
-cursor.execute('''SELECT game_id, response from game_api_response WHERE game_id > %s ORDER BY game_id''', (last_game_id,))
+
+if args.in_database:
+    with metrics.timer('db_insert', table='platform'):
+        cursor.execute(PLATFORM_QUERY, (last_game_id,))
+    metrics.increment('rows', cursor.rowcount, stage='db_insert', table='platform')
+    with metrics.timer('db_insert', table='games_platforms'):
+        cursor.execute(GAMES_PLATFORMS_QUERY, (last_game_id,))
+    metrics.increment('rows', cursor.rowcount, stage='db_insert', table='games_platforms')
+    with metrics.timer('db_commit'):
+        connection.commit()
+    connection.close()
+    sys.exit()
+
+with metrics.timer('db_fetch', table='game_api_response'):
+    cursor.execute('''SELECT game_id, response from game_api_response WHERE game_id > %s ORDER BY game_id''', (last_game_id,))
+    raw_responses = cursor.fetchall()
 #cursor.execute('''SELECT game_id, response from game_api_response ORDER BY game_id ''')
-raw_responses = cursor.fetchall()
+metrics.increment('rows', len(raw_responses), stage='db_fetch', table='game_api_response')
 
+platforms = []
+games_platforms = []
 for response in raw_responses:
     for platform in response[1]['platforms']:
-        cursor.execute('''INSERT INTO platform(platform_id, name) VALUES (%s, %s) ON CONFLICT DO NOTHING ''', (platform['platform_id'], platform['platform_name']))
-        cursor.execute('''INSERT INTO games_platforms (game_id, platform_id) VALUES (%s, %s)''', (response[0], platform['platform_id']))
+        platforms.append((platform['platform_id'], platform['platform_name']))
+        games_platforms.append((response[0], platform['platform_id']))
+
+# Load all rows at once, duplicates are skipped by the database
+bulk_insert(cursor, 'platform', ['platform_id', 'name'], platforms)
+bulk_insert(cursor, 'games_platforms', ['game_id', 'platform_id'], games_platforms)
+with metrics.timer('db_commit'):
     connection.commit()
 connection.close()
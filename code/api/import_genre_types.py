@@ -1,11 +1,17 @@
-import requests
 import psycopg2
 from dotenv import load_dotenv
 import os
 import json
+import sys
 from time import sleep
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.bulk_load import bulk_insert
+from common.http_cache import cached_get
+from common.metrics import metrics
+
 load_dotenv()
+metrics.start('import_genre_types')
 
 API_URL = 'https://api.mobygames.com/v1/genres'
 
@@ -19,19 +25,13 @@ connection = psycopg2.connect(
 cursor = connection.cursor()
 
 params={'api_key':os.getenv("API_KEY")}
-response = requests.get(url=API_URL, params=params)
+response = cached_get(API_URL, params=params)
 genre_data = response.json()
 
-seen_ids = set()
-
-# Gehe durch die erhaltenen Genres und füge nicht-gesehene IDs ein
-for genre in genre_data['genres']:
-    genre_id = genre['genre_category_id']
-    genre_name = genre['genre_category']
-
-    if genre_id not in seen_ids:
-        cursor.execute('''INSERT INTO genre_type (genre_type_id, name) VALUES (%s, %s)''', (genre_id, genre_name))
-        seen_ids.add(genre_id)
+# Gehe durch die erhaltenen Genres, doppelte IDs werden von der Datenbank übersprungen
+genre_types = [(genre['genre_category_id'], genre['genre_category']) for genre in genre_data['genres']]
+bulk_insert(cursor, 'genre_type', ['genre_type_id', 'name'], genre_types)
 
-connection.commit()
+with metrics.timer('db_commit'):
+    connection.commit()
 connection.close()
\ No newline at end of file
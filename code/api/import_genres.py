@@ -1,10 +1,16 @@
-import requests
 import psycopg2
 from dotenv import load_dotenv
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.bulk_load import bulk_insert
+from common.http_cache import cached_get
+from common.metrics import metrics
 
 
 load_dotenv()
+metrics.start('import_genres')
 
 API_URL = 'https://api.mobygames.com/v1/genres'
 
@@ -18,21 +24,21 @@ connection = psycopg2.connect(
 cursor = connection.cursor()
 
 params={'api_key':os.getenv("API_KEY")}
-response = requests.get(url=API_URL, params=params)
+response = cached_get(API_URL, params=params)
 genre_data = response.json()
 
-seen_ids = set()
+genres = []
 
-# Gehe durch die erhaltenen Genres und füge nicht-gesehene IDs ein
+# Gehe durch die erhaltenen Genres, doppelte IDs werden von der Datenbank übersprungen
 for genre in genre_data['genres']:
     genre_id = genre['genre_id']
     genre_name = genre['genre_name']
     genre_type_id = genre['genre_category_id']
     genre_description = genre['genre_description']
+    genres.append((genre_id, genre_type_id, genre_name, genre_description))
 
-    if genre_id not in seen_ids:
-        cursor.execute('''INSERT INTO genre (genre_id, genre_type_id, name, description) VALUES (%s, %s, %s, %s)''', (genre_id, genre_type_id, genre_name, genre_description))
-        seen_ids.add(genre_id)
+bulk_insert(cursor, 'genre', ['genre_id', 'genre_type_id', 'name', 'description'], genres)
 
-connection.commit()
+with metrics.timer('db_commit'):
+    connection.commit()
 connection.close()
\ No newline at end of file
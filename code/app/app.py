@@ -1,27 +1,41 @@
-import os, requests, json
-from rdflib import Graph
+import os, sys, time
 from dotenv import load_dotenv
-from requests.auth import HTTPBasicAuth
-from flask import jsonify, request, render_template, Flask, redirect
+from flask import jsonify, request, render_template, Flask, redirect, abort, Response, g
+from game_catalogue import GameCatalogue
+from game_documents import build_game_document
+from serialization import serialize_document
+from render_cache import RenderCache
+from static_export import StaticExport
+from dataset_dump import stream_dump, dump_format_dict
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.metrics import metrics
 
 app = Flask(__name__)
 load_dotenv()
 format_dict = {"JSON-LD": "json", "Turtle": "turtle", "N-Triples": "turtle", "TriG": "trig", "RDF/XML": "xml"}
-serializer_dict = {"JSON-LD": "json-ld", "Turtle": "turtle", "N-Triples": "nt", "TriG": "trig", "RDF/XML": "pretty-xml"}
-loaded_games = []
-
-def load_games_from_db():
-    global loaded_games
-    try:
-        basic = HTTPBasicAuth(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
-        r = requests.post(f"{os.getenv('NEO4J_HTTP_URI')}/rdf/neo4j/cypher",
-                         auth=basic, json={"cypher": "MATCH (g:Game) RETURN g", "format": "JSON-LD"})
-        for game in r.json()["@graph"]:
-            loaded_games.append({"name":game['sch:name'], "score":game['sch:aggregateRating']['@value'], "id":game['@id']})
-        loaded_games.sort(key=lambda x: x['score'], reverse=True)
-
-    except Exception as e:
-        print(f"Error while loading the games: {e}")
+game_catalogue = GameCatalogue()
+render_cache = RenderCache()
+static_export = StaticExport()
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.observe("route_request", time.perf_counter() - g.request_start, route=route, method=request.method, status=response.status_code)
+    return response
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    # Metrics of the worker that answers, every gunicorn worker counts on its own
+    if request.args.get("format") == "json":
+        return Response(metrics.to_json(), mimetype="application/json")
+    return Response(metrics.to_prometheus(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/")
 def index():
@@ -29,109 +43,43 @@ def index():
 
 @app.route("/game/name/<name>", methods=["GET"])
 def get_game(name, game_id, format="JSON-LD"):
-    basic = HTTPBasicAuth(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
-    if game_id:
-        r = requests.get(f"{os.getenv('NEO4J_HTTP_URI')}/rdf/neo4j/describe/{game_id.replace('n4ind:', '')}?format=JSON-LD",
-                         auth=basic)
-    else:
-        r = requests.get(f"{os.getenv('NEO4J_HTTP_URI')}/rdf/neo4j/describe/find/Game/name/{name}?format=JSON-LD", auth=basic)
-
-    # Load json-ld data into an dict
-    request_data = json.loads(r.text)
-
-    # Retrieve the names for the ids
-    genres, platforms, developers, publishers = name_lookup_for_game(name)
-
-    # Add the new names to the request data
-    processed_request = process_response_for_game(request_data, genres, platforms, developers, publishers)
+    # Serve the page from the export or the cache, if they were created since the last transfer
+    cached_request = static_export.get(game_id, format, render_cache.graph_version())
+    if cached_request is None:
+        cached_request = render_cache.get(game_id or name, format)
+    if cached_request is not None:
+        return render_template("view.html", format_name=format, format=format_dict.get(format), data=cached_request)
 
-    # Parse the JSON-LD data into an RDF graph
-    if format.lower() != "json-ld":  
-        graph = Graph()
-        graph.parse(data=processed_request, format="json-ld", publicID="http://schema.org/")
+    # Retrieve the game together with the names of its genres, platforms and companies
+    processed_request = build_game_document(name, game_id)
+    if processed_request is None:
+        abort(404)
 
-        # Get the format to the serializer format
-        serializer_format = serializer_dict.get(format)
+    processed_request = serialize_document(processed_request, format)
 
-        # Serialize the graph into the requested format
-        processed_request = graph.serialize(format=serializer_format)
+    render_cache.put(game_id or name, format, processed_request)
 
     return render_template("view.html", format_name=format, format=format_dict.get(format), data=processed_request)
 
-def process_response_for_game(response, genres, platforms, developers, publishers):
-    response['sch:genre'] = genres
-    response['sch:gamePlatform'] = platforms
-    response['sch:publisher'] = publishers
-    response['sch:creator'] = developers
-    if response.get('sch:datePublished'):
-        response['sch:datePublished'] = response.get('sch:datePublished').get('@value')
-
-    # Drop n4sch prefix from @context, since obsolete
-    del response['@context']['n4sch']
-
-    processed_response = json.dumps(response, indent=4)
-
-    return processed_response
-
-def name_lookup_for_game(name):
-    queries = {
-        "genre": """
-            MATCH (v:Game)-[:HAS_GENRE]->(g:Genre)
-            WHERE v.name = "{name}"
-            RETURN g;
-        """,
-        "platform": """
-            MATCH (v:Game)-[:AVAILABLE_ON]->(p:Platform)
-            WHERE v.name = "{name}"
-            RETURN p;
-        """,
-        "developer": """
-            MATCH (v:Game)-[:developer]->(d:Company)
-            WHERE v.name = "{name}"
-            RETURN d;
-        """,
-        "publisher": """
-            MATCH (v:Game)-[:publisher]->(p:Company)
-            WHERE v.name = "{name}"
-            RETURN p;
-        """
-    }
-    
-    results = {}
-    basic = HTTPBasicAuth(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
-    url = f"{os.getenv('NEO4J_HTTP_URI')}/rdf/neo4j/cypher"
-
-    for key, query in queries.items():
-        cypher_query = query.format(name=name)
-        response = requests.post(url, auth=basic, json={"cypher": cypher_query, "format": "JSON-LD"})
-
-        if response.status_code == 200:
-            r_json = response.json()
-            del r_json["@context"]
-            if r_json.get("@graph"):
-                r_json = r_json["@graph"]
-
-            # To keep the standard from schema.org, genre only as a list of strings
-            if key == "genre":
-                r_json = [genre["sch:name"] for genre in r_json]
-
-            results[key] = r_json
-        else:
-            results[key] = {"error": response.text}
-
-    return results.get("genre", {}), results.get("platform", {}), results.get("developer", {}), results.get("publisher", {})
-
 @app.route("/autocomplete", methods=["GET"])
 def autocomplete():
-    input_text = request.args.get("q", "").lower()
+    input_text = request.args.get("q", "")
+    # A limit below one would slice from the end and return almost the whole catalogue
+    limit = max(1, min(request.args.get("limit", AUTOCOMPLETE_LIMIT, type=int), AUTOCOMPLETE_MAX_LIMIT))
 
-    suggestions = [
-        game for game in loaded_games
-        if input_text in game["name"].lower()
-    ]
+    suggestions = game_catalogue.get_index().search(input_text, limit)
 
     return jsonify(suggestions)
 
+@app.route("/dump", methods=["GET"])
+def dump_dataset():
+    format = request.args.get("format", "nt")
+    if format not in dump_format_dict:
+        abort(400)
+
+    headers = {"Content-Encoding": "gzip", "Content-Disposition": f"attachment; filename=games.{format}"}
+    return Response(stream_dump(format), mimetype=dump_format_dict[format], headers=headers)
+
 @app.route("/form", methods=["GET", "POST"])
 def show_form():
     if request.method == "POST":
@@ -143,8 +91,8 @@ def show_form():
     format_options = format_dict.keys()
     return render_template("form.html", format_options=format_options)
 
-with app.app_context():
-    load_games_from_db()
+# Only maps an existing catalogue, it is built by the background refresh on the first request
+game_catalogue.load()
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
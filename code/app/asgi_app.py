@@ -0,0 +1,100 @@
+import os, sys, time, asyncio
+from dotenv import load_dotenv
+from quart import Quart, jsonify, request, render_template, redirect, abort, Response, g
+from game_catalogue import GameCatalogue
+from async_neo4j_client import close_neo4j_session
+from game_documents import build_game_document_async
+from serialization import serialize_document
+from render_cache import RenderCache
+from static_export import StaticExport
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.metrics import metrics
+
+# Async variant of app.py, the lookups in Neo4j do not block the worker while waiting.
+# Run with: gunicorn -c gunicorn_async_config.py asgi_app:app
+
+app = Quart(__name__)
+load_dotenv()
+format_dict = {"JSON-LD": "json", "Turtle": "turtle", "N-Triples": "turtle", "TriG": "trig", "RDF/XML": "xml"}
+game_catalogue = GameCatalogue()
+render_cache = RenderCache()
+static_export = StaticExport()
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+def get_cached_game(name, game_id, format):
+    # The export and the cache read files and may ask Neo4j for the graph version, so they run on a thread
+    cached_request = static_export.get(game_id, format, render_cache.graph_version())
+    if cached_request is None:
+        cached_request = render_cache.get(game_id or name, format)
+    return cached_request
+
+@app.before_request
+async def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+async def record_request_time(response):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.observe("route_request", time.perf_counter() - g.request_start, route=route, method=request.method, status=response.status_code)
+    return response
+
+@app.route("/metrics", methods=["GET"])
+async def get_metrics():
+    # Metrics of the worker that answers, every worker counts on its own
+    if request.args.get("format") == "json":
+        return Response(metrics.to_json(), mimetype="application/json")
+    return Response(metrics.to_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/")
+async def index():
+    return redirect('/form')
+
+@app.route("/game/name/<name>", methods=["GET"])
+async def get_game(name, game_id=None, format="JSON-LD"):
+    cached_request = await asyncio.to_thread(get_cached_game, name, game_id, format)
+    if cached_request is not None:
+        return await render_template("view.html", format_name=format, format=format_dict.get(format), data=cached_request)
+
+    # Retrieve the game together with the names of its genres, platforms and companies
+    processed_request = await build_game_document_async(name, game_id)
+    if processed_request is None:
+        abort(404)
+
+    processed_request = await asyncio.to_thread(serialize_document, processed_request, format)
+
+    await asyncio.to_thread(render_cache.put, game_id or name, format, processed_request)
+
+    return await render_template("view.html", format_name=format, format=format_dict.get(format), data=processed_request)
+
+@app.route("/autocomplete", methods=["GET"])
+async def autocomplete():
+    input_text = request.args.get("q", "")
+    # A limit below one would slice from the end and return almost the whole catalogue
+    limit = max(1, min(request.args.get("limit", AUTOCOMPLETE_LIMIT, type=int), AUTOCOMPLETE_MAX_LIMIT))
+
+    suggestions = game_catalogue.get_index().search(input_text, limit)
+
+    return jsonify(suggestions)
+
+@app.route("/form", methods=["GET", "POST"])
+async def show_form():
+    if request.method == "POST":
+        form = await request.form
+        search_term = form.get("search_term")
+        format_option = form.get("format_dropdown")
+        game_id = form.get("game_id")
+        return await get_game(search_term, game_id, format_option)
+
+    format_options = format_dict.keys()
+    return await render_template("form.html", format_options=format_options)
+
+@app.after_serving
+async def close_clients():
+    await close_neo4j_session()
+
+game_catalogue.load()
+
+if __name__ == "__main__":
+    app.run(debug=True)
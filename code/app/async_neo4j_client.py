@@ -0,0 +1,30 @@
+import os, sys, asyncio, aiohttp
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.metrics import metrics
+
+# One session per event loop, it keeps the connections to Neo4j open between requests
+neo4j_sessions = {}
+
+NEO4J_MAX_CONNECTIONS = int(os.getenv("NEO4J_MAX_CONNECTIONS", 100))
+
+def get_neo4j_session():
+    loop = asyncio.get_running_loop()
+    session = neo4j_sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(auth=aiohttp.BasicAuth(os.getenv("NEO4J_USER", ""), os.getenv("NEO4J_PASSWORD", "")),
+                                        connector=aiohttp.TCPConnector(limit=NEO4J_MAX_CONNECTIONS))
+        neo4j_sessions[loop] = session
+    return session
+
+async def close_neo4j_session():
+    session = neo4j_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+async def cypher_to_rdf_async(cypher, params=None, format="JSON-LD"):
+    # Same as cypher_to_rdf, returns the status and the body of the response
+    with metrics.timer("upstream_request", endpoint="neosemantics"):
+        async with get_neo4j_session().post(f"{os.getenv('NEO4J_HTTP_URI')}/rdf/neo4j/cypher",
+                                            json={"cypher": cypher, "cypherParams": params or {}, "format": format}) as r:
+            return r.status, await r.text()
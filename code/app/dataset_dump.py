@@ -0,0 +1,106 @@
+import sys, json, zlib, argparse
+from dotenv import load_dotenv
+from neo4j_client import run_cypher
+
+DUMP_PAGE_SIZE = 500
+
+SCHEMA = "http://schema.org/"
+INDIVIDUALS = "neo4j://graph.individuals#"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+
+# One page of games with the names of their genres, platforms and companies
+DUMP_QUERY = """
+    MATCH (g:Game) WHERE id(g) > $last_id
+    WITH g ORDER BY id(g) LIMIT $limit
+    RETURN id(g), properties(g),
+           [(g)-[:HAS_GENRE]->(n) | n.name],
+           [(g)-[:AVAILABLE_ON]->(n) | {id: id(n), name: n.name}],
+           [(g)-[:developer]->(n) | {id: id(n), name: n.name}],
+           [(g)-[:publisher]->(n) | {id: id(n), name: n.name}]
+"""
+
+# Schema.org properties of the game properties, for graphs from both transfer scripts
+property_dict = {"name": "name", "identifier": "identifier", "aggregateRating": "aggregateRating", "score": "aggregateRating",
+                 "datePublished": "datePublished", "release_date": "datePublished"}
+datatype_dict = {"aggregateRating": "double", "datePublished": "date"}
+dump_format_dict = {"nt": "application/n-triples", "jsonl": "application/x-ndjson"}
+
+def iter_games(page_size=DUMP_PAGE_SIZE):
+    # Reads the games page by page, so only one page is held in memory
+    last_id = -1
+    while True:
+        rows = run_cypher(DUMP_QUERY, {"last_id": last_id, "limit": page_size})
+        if not rows:
+            break
+        yield rows
+        last_id = rows[-1][0]
+
+def get_game_properties(properties):
+    return {property_dict[key]: value for key, value in properties.items() if key in property_dict and value is not None}
+
+def escape_literal(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r")
+
+def literal(value, datatype=None):
+    # Integers get the same datatype as JSON-LD numbers
+    if datatype is None and isinstance(value, int) and not isinstance(value, bool):
+        datatype = "integer"
+    if datatype:
+        return f'"{escape_literal(value)}"^^<{XSD}{datatype}>'
+    return f'"{escape_literal(value)}"'
+
+def game_to_ntriples(row):
+    game_number, properties, genres, platforms, developers, publishers = row
+    game = f"<{INDIVIDUALS}{game_number}>"
+
+    lines = [f"{game} <{RDF_TYPE}> <{SCHEMA}VideoGame> ."]
+    for key, value in get_game_properties(properties).items():
+        lines.append(f"{game} <{SCHEMA}{key}> {literal(value, datatype_dict.get(key))} .")
+    for genre in genres:
+        lines.append(f"{game} <{SCHEMA}genre> {literal(genre)} .")
+    for key, nodes in (("gamePlatform", platforms), ("creator", developers), ("publisher", publishers)):
+        for node in nodes:
+            lines.append(f"{game} <{SCHEMA}{key}> <{INDIVIDUALS}{node['id']}> .")
+            if node["name"] is not None:
+                lines.append(f"<{INDIVIDUALS}{node['id']}> <{SCHEMA}name> {literal(node['name'])} .")
+
+    return "\n".join(lines) + "\n"
+
+def game_to_jsonld(row):
+    game_number, properties, genres, platforms, developers, publishers = row
+
+    document = {"@context": {"sch": SCHEMA, "n4ind": INDIVIDUALS, "xsd": XSD}, "@id": f"n4ind:{game_number}", "@type": "sch:VideoGame"}
+    for key, value in get_game_properties(properties).items():
+        document[f"sch:{key}"] = {"@value": str(value), "@type": f"xsd:{datatype_dict[key]}"} if key in datatype_dict else value
+    document["sch:genre"] = genres
+    for key, nodes in (("gamePlatform", platforms), ("creator", developers), ("publisher", publishers)):
+        document[f"sch:{key}"] = [{"@id": f"n4ind:{node['id']}", "sch:name": node["name"]} for node in nodes]
+
+    return json.dumps(document, ensure_ascii=False) + "\n"
+
+def stream_dump(format="nt", page_size=DUMP_PAGE_SIZE):
+    # Gzip compressed chunks of the dump, one chunk per page of games
+    serialize = game_to_ntriples if format == "nt" else game_to_jsonld
+    compressor = zlib.compressobj(wbits=31)
+
+    for rows in iter_games(page_size):
+        chunk = compressor.compress("".join(serialize(row) for row in rows).encode("utf-8"))
+        yield chunk + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Dumps every game with its genres, platforms and companies as gzip compressed RDF.")
+    parser.add_argument("--format", choices=dump_format_dict.keys(), default="nt", help="N-Triples or JSON-LD lines")
+    parser.add_argument("--output", default=None, help="output file, defaults to stdout")
+    args = parser.parse_args()
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in stream_dump(args.format):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
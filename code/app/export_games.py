@@ -0,0 +1,85 @@
+import os, gzip, json, uuid, shutil, argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from dotenv import load_dotenv
+from neo4j_client import run_cypher
+from game_documents import build_game_document
+from serialization import serialize_document
+from static_export import STATIC_EXPORT_DIR, export_format_dict, get_export_path, get_run_dir, get_manifest_path
+
+FETCH_WORKERS = 8
+
+# Prefix of the directories of the single exports
+RUN_DIR_PREFIX = "export-"
+
+def write_file(path, data):
+    # Write to a temporary file first, so the app never serves a partial file
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with gzip.open(temp_path, "wt", encoding="utf-8") as file:
+        file.write(data)
+    os.replace(temp_path, path)
+
+def export_game(game_number, document, export_dir):
+    # Runs in a worker process, serializes one game into every format
+    for format in export_format_dict:
+        write_file(get_export_path(export_dir, game_number, format), serialize_document(document, format))
+    return game_number
+
+def fetch_document(game_number):
+    return game_number, build_game_document(None, f"n4ind:{game_number}")
+
+def write_manifest(export_dir, manifest):
+    # Replaces the manifest in one step, which switches the app to the new export
+    temp_path = f"{get_manifest_path(export_dir)}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(manifest, file)
+    os.replace(temp_path, get_manifest_path(export_dir))
+
+def remove_old_exports(export_dir, directory):
+    # Removes the directories of earlier and failed exports, and the format directories of the former layout
+    for name in os.listdir(export_dir):
+        path = os.path.join(export_dir, name)
+        if os.path.isdir(path) and name != directory and (name.startswith(RUN_DIR_PREFIX) or name in export_format_dict.values()):
+            shutil.rmtree(path, ignore_errors=True)
+
+def export_games(export_dir, processes=None):
+    # The version is read first, a transfer during the export makes the export stale instead of wrong
+    rows = run_cypher("MATCH (v:GraphVersion) RETURN v.version")
+    graph_version = rows[0][0] if rows else 0
+
+    # The export is written into a new directory, the app serves the old one until the manifest is replaced
+    manifest = {"graph_version": graph_version, "directory": f"{RUN_DIR_PREFIX}{uuid.uuid4().hex}", "formats": list(export_format_dict)}
+    run_dir = get_run_dir(export_dir, manifest)
+    for extension in export_format_dict.values():
+        os.makedirs(os.path.join(run_dir, extension))
+
+    game_numbers = [row[0] for row in run_cypher("MATCH (g:Game) RETURN id(g) ORDER BY id(g)")]
+
+    # Documents are fetched on threads, the CPU-heavy serialization runs on processes
+    exported = 0
+    with ThreadPoolExecutor(FETCH_WORKERS) as fetch_pool, ProcessPoolExecutor(processes) as export_pool:
+        futures = []
+        for game_number, document in fetch_pool.map(fetch_document, game_numbers):
+            if document is None:
+                print(f"Game {game_number} not found")
+                continue
+            futures.append(export_pool.submit(export_game, game_number, document, run_dir))
+
+        for future in futures:
+            print(future.result())
+            exported += 1
+
+    # Games that were skipped have no file in the new directory, so no file of an earlier export is served for them
+    write_manifest(export_dir, {**manifest, "games": exported})
+    remove_old_exports(export_dir, manifest["directory"])
+
+    print(f"Exported {exported} games in {len(export_format_dict)} formats")
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Exports every game in all formats for the web app to serve directly.")
+    parser.add_argument("--export-dir", default=STATIC_EXPORT_DIR, help="directory of the export")
+    parser.add_argument("--processes", type=int, default=None, help="number of processes, defaults to the number of cores")
+    args = parser.parse_args()
+
+    export_games(args.export_dir, args.processes)
@@ -0,0 +1,242 @@
+import os, mmap, time, uuid, struct, tempfile, threading
+from array import array
+from neo4j_client import run_cypher
+from search_index import GameSearchIndex
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CATALOGUE_FILE = os.getenv("CATALOGUE_FILE", os.path.join(tempfile.gettempdir(), "lod_game_catalogue.bin"))
+
+# Seconds between two checks of the graph version
+CATALOGUE_REFRESH_INTERVAL = float(os.getenv("CATALOGUE_REFRESH_INTERVAL", 60))
+
+CATALOGUE_PAGE_SIZE = 10000
+
+# The games are read page by page, the score is named differently by the two transfer scripts
+CATALOGUE_QUERY = """
+    MATCH (g:Game) WHERE id(g) > $last_id
+    WITH g ORDER BY id(g) LIMIT $limit
+    RETURN id(g), g.name, coalesce(g.aggregateRating, g.score)
+"""
+
+# Magic, graph version, number of games, n-grams and postings
+HEADER = struct.Struct("<8sqqqq")
+MAGIC = b"LODCAT02"
+
+class StringView:
+    # Strings stored as one UTF-8 blob with the offsets of every string
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        return str(self.get_bytes(position), "utf-8")
+
+    def get_bytes(self, position):
+        return bytes(self.blob[self.offsets[position]:self.offsets[position + 1]])
+
+    def find(self, string):
+        # Binary search over sorted strings, UTF-8 bytes sort like the strings, so nothing is decoded
+        encoded = string.encode("utf-8")
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_bytes(middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < len(self) and self.get_bytes(low) == encoded else None
+
+class GameView:
+    # The games as the dictionaries the app returns, created when they are accessed
+    def __init__(self, ids, scores, names):
+        self.ids = ids
+        self.scores = scores
+        self.names = names
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        return {"name": self.names[position], "score": self.scores[position], "id": f"n4ind:{self.ids[position]}"}
+
+class PostingsView:
+    # The positions of the games for every n-gram, the n-grams are sorted and looked up in the file
+    def __init__(self, grams, offsets, postings):
+        self.grams = grams
+        self.offsets = offsets
+        self.postings = postings
+
+    def get(self, gram, default=None):
+        i = self.grams.find(gram)
+        if i is None:
+            return default
+        return self.postings[self.offsets[i]:self.offsets[i + 1]]
+
+def get_offsets(strings):
+    # The UTF-8 blob and the offsets of the strings
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = array("I", [0])
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+    return offsets, b"".join(encoded)
+
+def fetch_games():
+    games = []
+    last_id = -1
+    while True:
+        rows = run_cypher(CATALOGUE_QUERY, {"last_id": last_id, "limit": CATALOGUE_PAGE_SIZE})
+        if not rows:
+            break
+        games.extend(rows)
+        last_id = rows[-1][0]
+
+    # Sorted by score, so the search returns the best games first
+    games.sort(key=lambda game: game[2] or 0.0, reverse=True)
+    return games
+
+def write_catalogue(path, graph_version, games):
+    """
+    Writes the games and their search index as one file, so every worker can
+    map the same pages instead of holding its own copy. Numbers come first,
+    so the arrays are aligned, then the strings.
+    """
+    index = GameSearchIndex([{"name": name or ""} for _, name, _ in games])
+    # Sorted, so the workers can search the n-grams in the file without building a dict
+    grams = sorted(index.postings)
+
+    posting_offsets = array("I", [0])
+    postings = array("i")
+    for gram in grams:
+        postings.extend(index.postings[gram])
+        posting_offsets.append(len(postings))
+
+    name_offsets, name_blob = get_offsets(name or "" for _, name, _ in games)
+    normalized_offsets, normalized_blob = get_offsets(index.names)
+    gram_offsets, gram_blob = get_offsets(grams)
+
+    # Write to a temporary file first, so no worker maps a partial catalogue
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, graph_version, len(games), len(grams), len(postings)))
+        file.write(array("d", [score or 0.0 for _, _, score in games]).tobytes())
+        file.write(array("q", [game_id for game_id, _, _ in games]).tobytes())
+        for section in (name_offsets, normalized_offsets, gram_offsets, posting_offsets, postings):
+            file.write(section.tobytes())
+        for blob in (name_blob, normalized_blob, gram_blob):
+            file.write(blob)
+    os.replace(temp_path, path)
+
+def read_catalogue(path):
+    # Maps the file and returns its graph version and the search index over its views
+    with open(path, "rb") as file:
+        data = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    magic, graph_version, game_count, gram_count, posting_count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"Not a game catalogue: {path}")
+
+    position = HEADER.size
+    def take(format, count):
+        nonlocal position
+        size = array(format).itemsize * count
+        section = data[position:position + size].cast(format)
+        position += size
+        return section
+
+    scores = take("d", game_count)
+    ids = take("q", game_count)
+    name_offsets = take("I", game_count + 1)
+    normalized_offsets = take("I", game_count + 1)
+    gram_offsets = take("I", gram_count + 1)
+    posting_offsets = take("I", gram_count + 1)
+    postings = take("i", posting_count)
+    names = StringView(name_offsets, take("B", name_offsets[-1]))
+    normalized_names = StringView(normalized_offsets, take("B", normalized_offsets[-1]))
+    grams = StringView(gram_offsets, take("B", gram_offsets[-1]))
+
+    index = GameSearchIndex.from_parts(GameView(ids, scores, names), normalized_names, PostingsView(grams, posting_offsets, postings))
+    return graph_version, index
+
+class GameCatalogue:
+    """
+    The games for the autocomplete, kept in a file that all gunicorn workers
+    map, so the memory is shared and a worker starts without asking Neo4j.
+    Every process checks the graph version in a background thread and one
+    of them rebuilds the file once the transfer scripts changed the graph.
+    """
+
+    def __init__(self, path=CATALOGUE_FILE, refresh_interval=CATALOGUE_REFRESH_INTERVAL):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.index = GameSearchIndex([])
+        self.version = None
+        self.file_id = None
+        self.refresh_pid = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        # Maps the file again if it was replaced, returns whether a catalogue is loaded
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+
+        file_id = (stat.st_ino, stat.st_mtime_ns)
+        with self.lock:
+            if file_id != self.file_id:
+                try:
+                    self.version, self.index = read_catalogue(self.path)
+                    self.file_id = file_id
+                except (ValueError, struct.error) as e:
+                    print(f"Error while loading the game catalogue: {e}")
+                    return False
+        return True
+
+    def rebuild(self, graph_version):
+        # Only one process rebuilds, the others map its file on their next check
+        with open(f"{self.path}.lock", "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self.load()
+            if self.version != graph_version:
+                write_catalogue(self.path, graph_version, fetch_games())
+                print(f"Game catalogue rebuilt for graph version {graph_version}")
+
+        self.load()
+
+    def refresh(self):
+        try:
+            self.load()
+            rows = run_cypher("MATCH (v:GraphVersion) RETURN v.version")
+            graph_version = rows[0][0] if rows else 0
+            if graph_version != self.version:
+                self.rebuild(graph_version)
+        except Exception as e:
+            print(f"Error while refreshing the game catalogue: {e}")
+
+    def refresh_loop(self):
+        while True:
+            self.refresh()
+            time.sleep(self.refresh_interval)
+
+    def start_refresh(self):
+        # Threads do not survive the fork of the gunicorn workers, so every process starts its own on first use
+        if self.refresh_pid == os.getpid():
+            return
+        with self.lock:
+            if self.refresh_pid != os.getpid():
+                self.refresh_pid = os.getpid()
+                threading.Thread(target=self.refresh_loop, daemon=True).start()
+
+    def get_index(self):
+        self.start_refresh()
+        return self.index
@@ -0,0 +1,116 @@
+import json
+from neo4j_client import cypher_to_rdf
+from async_neo4j_client import cypher_to_rdf_async
+
+# The game with its genres, platforms, developers and publishers in a single query
+GAME_QUERY = """
+    MATCH (v:Game) WHERE {condition}
+    WITH v LIMIT 1
+    OPTIONAL MATCH (v)-[r:HAS_GENRE|AVAILABLE_ON|developer|publisher]->(n)
+    RETURN v, r, n
+"""
+
+# Keys of the relationships of a game in the JSON-LD of neosemantics, the schema.org
+# property if the relationship type is mapped, otherwise n4sch:<type>
+relationship_dict = {"genre": ("sch:genre", "n4sch:HAS_GENRE"), "platform": ("sch:gamePlatform", "n4sch:AVAILABLE_ON"),
+                     "developer": ("sch:creator", "n4sch:developer"), "publisher": ("sch:publisher", "n4sch:publisher")}
+
+def expand_keys(keys):
+    # Unmapped keys may also be returned as full IRIs
+    return [node_key for key in keys for node_key in (key, key.replace("n4sch:", "neo4j://graph.schema#"))]
+
+def get_links(node, keys):
+    # The linked node ids under any of the keys
+    links = []
+    for key in expand_keys(keys):
+        value = node.get(key, [])
+        links.extend(value if isinstance(value, list) else [value])
+    return [link["@id"] for link in links if isinstance(link, dict) and "@id" in link]
+
+def process_response_for_game(response, genres, platforms, developers, publishers):
+    response['sch:genre'] = genres
+    response['sch:gamePlatform'] = platforms
+    response['sch:publisher'] = publishers
+    response['sch:creator'] = developers
+    if response.get('sch:datePublished'):
+        response['sch:datePublished'] = response.get('sch:datePublished').get('@value')
+
+    # Drop n4sch prefix from @context, since obsolete
+    response['@context'].pop('n4sch', None)
+
+    processed_response = json.dumps(response, indent=4)
+
+    return processed_response
+
+def get_game_query(name, game_id):
+    if game_id:
+        return GAME_QUERY.format(condition="id(v) = $id"), {"id": int(game_id.replace('n4ind:', ''))}
+    return GAME_QUERY.format(condition="v.name = $name"), {"name": name}
+
+def split_game_response(r_json, game_id):
+    # Splits the response of the game query into the game and its genres, platforms, developers and publishers
+    context = r_json.pop("@context", {})
+    nodes = r_json.get("@graph", [r_json] if r_json else [])
+    nodes_by_id = {node["@id"]: node for node in nodes}
+
+    # Find the game by its id or, when searched by name, as the node that links to the others
+    if game_id:
+        game = nodes_by_id.get(game_id)
+    else:
+        game = next((node for node in nodes if any(get_links(node, keys) for keys in relationship_dict.values())),
+                    nodes[0] if nodes else None)
+    if game is None:
+        return None, {}, {}, {}, {}
+
+    results = {}
+    for key, keys in relationship_dict.items():
+        links = dict.fromkeys(get_links(game, keys))
+        r_json = [nodes_by_id[link] for link in links if link in nodes_by_id]
+
+        # To keep the standard from schema.org, genre only as a list of strings
+        if key == "genre":
+            r_json = [genre.get("sch:name", genre.get("n4sch:name")) for genre in r_json]
+        # Same shape as a single query per relationship, one node is returned without a list
+        elif len(r_json) == 1:
+            r_json = r_json[0]
+        elif not r_json:
+            r_json = {}
+
+        results[key] = r_json
+
+    # The relationships are set again under their schema.org keys by process_response_for_game
+    relationship_keys = {key for keys in relationship_dict.values() for key in expand_keys(keys)}
+    request_data = {"@context": context, **{key: value for key, value in game.items() if key not in relationship_keys}}
+
+    return request_data, results["genre"], results["platform"], results["developer"], results["publisher"]
+
+def fetch_game_with_neighbours(name, game_id):
+    r = cypher_to_rdf(*get_game_query(name, game_id))
+
+    if r.status_code != 200:
+        error = {"error": r.text}
+        return None, error, error, error, error
+
+    return split_game_response(r.json(), game_id)
+
+async def fetch_game_with_neighbours_async(name, game_id):
+    status, text = await cypher_to_rdf_async(*get_game_query(name, game_id))
+
+    if status != 200:
+        error = {"error": text}
+        return None, error, error, error, error
+
+    return split_game_response(json.loads(text), game_id)
+
+def build_game_document(name, game_id):
+    # The processed JSON-LD document of a game, None if the game does not exist
+    request_data, genres, platforms, developers, publishers = fetch_game_with_neighbours(name, game_id)
+    if request_data is None:
+        return None
+    return process_response_for_game(request_data, genres, platforms, developers, publishers)
+
+async def build_game_document_async(name, game_id):
+    request_data, genres, platforms, developers, publishers = await fetch_game_with_neighbours_async(name, game_id)
+    if request_data is None:
+        return None
+    return process_response_for_game(request_data, genres, platforms, developers, publishers)
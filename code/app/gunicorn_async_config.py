@@ -0,0 +1,5 @@
+bind = "0.0.0.0:8080"
+workers = 4
+# Every worker runs an event loop, so one worker serves many requests while they wait for Neo4j
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
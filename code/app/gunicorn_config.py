@@ -1,2 +1,4 @@
 bind = "0.0.0.0:8080"
-workers = 4
\ No newline at end of file
+workers = 4
+# Import the app once in the master, the workers share its memory and the mapped game catalogue
+preload_app = True
@@ -0,0 +1,35 @@
+import os, sys, requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.metrics import metrics
+
+neo4j_session = None
+
+def get_neo4j_session():
+    # Created on first use, so the environment is loaded. The session keeps the connections to Neo4j open between requests.
+    global neo4j_session
+    if neo4j_session is None:
+        neo4j_session = requests.Session()
+        neo4j_session.auth = HTTPBasicAuth(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
+        neo4j_session.mount("http://", HTTPAdapter(pool_maxsize=10))
+        neo4j_session.mount("https://", HTTPAdapter(pool_maxsize=10))
+    return neo4j_session
+
+def cypher_to_rdf(cypher, params=None, format="JSON-LD"):
+    # Runs a Cypher query on the neosemantics endpoint, which returns the matched nodes and relationships as RDF
+    with metrics.timer("upstream_request", endpoint="neosemantics"):
+        return get_neo4j_session().post(f"{os.getenv('NEO4J_HTTP_URI')}/rdf/neo4j/cypher",
+                                        json={"cypher": cypher, "cypherParams": params or {}, "format": format})
+
+def run_cypher(statement, params=None):
+    # Runs a Cypher query on the transactional HTTP endpoint of Neo4j and returns the rows as lists
+    with metrics.timer("upstream_request", endpoint="tx_commit"):
+        r = get_neo4j_session().post(f"{os.getenv('NEO4J_HTTP_URI')}/db/{os.getenv('NEO4J_DATABASE', 'neo4j')}/tx/commit",
+                                     json={"statements": [{"statement": statement, "parameters": params or {}}]})
+    r.raise_for_status()
+    r_json = r.json()
+    if r_json.get("errors"):
+        raise RuntimeError(r_json["errors"][0].get("message"))
+    return [row["row"] for row in r_json["results"][0]["data"]]
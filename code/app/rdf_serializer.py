@@ -0,0 +1,271 @@
+import re, sys, json, argparse
+from urllib.parse import urljoin
+
+# Writes the game documents as Turtle, N-Triples and TriG without building an rdflib graph.
+# Only the JSON-LD features the documents use are supported, anything else raises
+# UnsupportedDocumentError and the caller falls back to rdflib.
+
+BASE_IRI = "http://schema.org/"
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+# Characters not allowed in an IRI reference of N-Triples and Turtle
+INVALID_IRI = re.compile(r'[\x00-\x20<>"{}|^`\\]')
+# Local names written with a prefix, anything else is written as a full IRI
+LOCAL_NAME = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_-]*$")
+PREFIX_NAME = re.compile(r"^[A-Za-z][A-Za-z0-9_-]*$")
+ABSOLUTE_IRI = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*:")
+LITERAL_ESCAPES = {"\\": "\\\\", '"': '\\"', "\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+class UnsupportedDocumentError(ValueError):
+    pass
+
+def iri(value):
+    return ("iri", value)
+
+def literal(lexical, datatype=None, language=None):
+    return ("literal", lexical, datatype, language)
+
+def get_lexical(value):
+    # Same lexical forms as rdflib for the native JSON types
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+def get_native_datatype(value):
+    if isinstance(value, bool):
+        return XSD + "boolean"
+    if isinstance(value, int):
+        return XSD + "integer"
+    if isinstance(value, float):
+        return XSD + "double"
+    return None
+
+class DocumentExpander:
+    def __init__(self, context, base=BASE_IRI):
+        if not isinstance(context, dict) or any(key.startswith("@") or not isinstance(value, str) for key, value in context.items()):
+            raise UnsupportedDocumentError("Only prefix definitions are supported in @context")
+        self.context = context
+        self.base = base
+        self.triples = []
+        self.blank_nodes = {}
+
+    def new_blank_node(self, name=None):
+        if name is None or name not in self.blank_nodes:
+            label = ("bnode", f"b{len(self.blank_nodes)}")
+            self.blank_nodes[name if name is not None else object()] = label
+            return label
+        return self.blank_nodes[name]
+
+    def expand_compact(self, value):
+        # prefix:suffix or an absolute IRI, None if neither
+        if ":" not in value:
+            return None
+        prefix, suffix = value.split(":", 1)
+        if prefix in self.context and not suffix.startswith("//"):
+            return self.context[prefix] + suffix
+        return value if ABSOLUTE_IRI.match(value) else None
+
+    def expand_property(self, key):
+        # Properties not mapped by the context are dropped, like JSON-LD does
+        if key in self.context:
+            return self.context[key]
+        return self.expand_compact(key)
+
+    def expand_reference(self, value, vocab=False):
+        if value.startswith("_:"):
+            return self.new_blank_node(value)
+        if vocab and value in self.context:
+            return iri(self.context[value])
+        expanded = self.expand_compact(value)
+        if expanded is None:
+            expanded = urljoin(self.base, value)
+        if INVALID_IRI.search(expanded):
+            raise UnsupportedDocumentError(f"Invalid IRI: {expanded}")
+        return iri(expanded)
+
+    def expand_value(self, value):
+        # Returns the objects for a property value, nested nodes add their own triples
+        if value is None:
+            return []
+        if isinstance(value, list):
+            return [term for item in value for term in self.expand_value(item)]
+        if isinstance(value, str):
+            return [literal(value)]
+        if isinstance(value, (bool, int, float)):
+            return [literal(get_lexical(value), get_native_datatype(value))]
+        if not isinstance(value, dict):
+            raise UnsupportedDocumentError(f"Unsupported value: {value!r}")
+
+        if "@value" in value:
+            if set(value) - {"@value", "@type", "@language"} or ("@type" in value and "@language" in value):
+                raise UnsupportedDocumentError(f"Unsupported value object: {value!r}")
+            raw = value["@value"]
+            if raw is None:
+                return []
+            if "@language" in value:
+                return [literal(get_lexical(raw), language=value["@language"])]
+            if "@type" in value:
+                return [literal(get_lexical(raw), self.expand_reference(value["@type"], vocab=True)[1])]
+            return [literal(get_lexical(raw), get_native_datatype(raw))]
+        if "@set" in value:
+            return self.expand_value(value["@set"])
+        return [self.expand_node(value)]
+
+    def expand_node(self, node):
+        unsupported = {key for key in node if key.startswith("@")} - {"@id", "@type"}
+        if unsupported:
+            raise UnsupportedDocumentError(f"Unsupported keywords: {', '.join(sorted(unsupported))}")
+
+        subject = self.expand_reference(node["@id"]) if "@id" in node else self.new_blank_node()
+
+        types = node.get("@type", [])
+        for node_type in types if isinstance(types, list) else [types]:
+            self.triples.append((subject, iri(RDF_TYPE), self.expand_reference(node_type, vocab=True)))
+
+        for key, value in node.items():
+            if key.startswith("@"):
+                continue
+            predicate = self.expand_property(key)
+            if predicate is None:
+                continue
+            if INVALID_IRI.search(predicate):
+                raise UnsupportedDocumentError(f"Invalid IRI: {predicate}")
+            for term in self.expand_value(value):
+                self.triples.append((subject, iri(predicate), term))
+
+        return subject
+
+def document_to_triples(document):
+    # Expands a JSON-LD document (string or dict) into its prefixes and triples
+    if isinstance(document, str):
+        document = json.loads(document)
+    if not isinstance(document, dict):
+        raise UnsupportedDocumentError("The document has to be a JSON object")
+
+    document = dict(document)
+    expander = DocumentExpander(document.pop("@context", {}))
+
+    if "@graph" in document:
+        if set(document) != {"@graph"}:
+            raise UnsupportedDocumentError("Named graphs are not supported")
+        nodes = document["@graph"]
+        for node in nodes if isinstance(nodes, list) else [nodes]:
+            expander.expand_node(node)
+    elif document:
+        expander.expand_node(document)
+
+    # Duplicate triples are written once, as in a graph
+    return expander.context, list(dict.fromkeys(expander.triples))
+
+def format_literal(term, format_iri):
+    _, lexical, datatype, language = term
+    escaped = "".join(LITERAL_ESCAPES.get(char, char) for char in lexical)
+    if language:
+        return f'"{escaped}"@{language}'
+    if datatype:
+        return f'"{escaped}"^^{format_iri(datatype)}'
+    return f'"{escaped}"'
+
+def format_ntriples_term(term):
+    if term[0] == "iri":
+        return f"<{term[1]}>"
+    if term[0] == "bnode":
+        return f"_:{term[1]}"
+    return format_literal(term, lambda value: f"<{value}>")
+
+def to_ntriples(document):
+    _, triples = document_to_triples(document)
+    return "".join(" ".join(format_ntriples_term(term) for term in triple) + " .\n" for triple in triples)
+
+def get_prefixes(context):
+    prefixes = {prefix: namespace for prefix, namespace in context.items() if PREFIX_NAME.match(prefix)}
+    prefixes.setdefault("xsd", XSD)
+    return prefixes
+
+def get_turtle_body(context, triples, indent=""):
+    prefixes = get_prefixes(context)
+    # Longest namespace first, so nested namespaces get the most specific prefix
+    namespaces = sorted(prefixes.items(), key=lambda item: len(item[1]), reverse=True)
+
+    def format_iri(value):
+        for prefix, namespace in namespaces:
+            if value.startswith(namespace) and LOCAL_NAME.match(value[len(namespace):]):
+                return f"{prefix}:{value[len(namespace):]}"
+        return f"<{value}>"
+
+    def format_term(term):
+        if term[0] == "iri":
+            return format_iri(term[1])
+        if term[0] == "bnode":
+            return f"_:{term[1]}"
+        return format_literal(term, format_iri)
+
+    # Group the triples by subject and predicate, in document order
+    subjects = {}
+    for subject, predicate, obj in triples:
+        subjects.setdefault(subject, {}).setdefault(predicate, []).append(obj)
+
+    blocks = []
+    for subject, predicates in subjects.items():
+        lines = []
+        for predicate, objects in predicates.items():
+            name = "a" if predicate[1] == RDF_TYPE else format_iri(predicate[1])
+            lines.append(f"{name} {', '.join(format_term(obj) for obj in objects)}")
+        blocks.append(f"{indent}{format_term(subject)} " + f" ;\n{indent}    ".join(lines) + " .\n")
+
+    return prefixes, "\n".join(blocks)
+
+def format_prefixes(prefixes):
+    return "".join(f"@prefix {prefix}: <{namespace}> .\n" for prefix, namespace in prefixes.items())
+
+def to_turtle(document):
+    prefixes, body = get_turtle_body(*document_to_triples(document))
+    return f"{format_prefixes(prefixes)}\n{body}"
+
+def to_trig(document):
+    # A single default graph
+    prefixes, body = get_turtle_body(*document_to_triples(document), indent="    ")
+    return f"{format_prefixes(prefixes)}\n{{\n{body}}}\n"
+
+serializer_functions = {"Turtle": (to_turtle, "turtle"), "N-Triples": (to_ntriples, "nt"), "TriG": (to_trig, "trig")}
+
+def verify_against_rdflib(document):
+    # Compares the output of every format with the rdflib round trip, the graphs have to be isomorphic
+    from rdflib import Graph, Dataset
+    from rdflib.compare import isomorphic
+
+    expected = Graph()
+    expected.parse(data=document if isinstance(document, str) else json.dumps(document), format="json-ld", publicID=BASE_IRI)
+
+    results = {}
+    for format, (serialize, rdflib_format) in serializer_functions.items():
+        if rdflib_format == "trig":
+            dataset = Dataset()
+            dataset.parse(data=serialize(document), format="trig")
+            actual = Graph()
+            for triple in dataset.triples((None, None, None)):
+                actual.add(triple)
+        else:
+            actual = Graph()
+            actual.parse(data=serialize(document), format=rdflib_format)
+        results[format] = isomorphic(expected, actual)
+
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks the fast serializer against rdflib for JSON-LD documents.")
+    parser.add_argument("files", nargs="+", help="JSON-LD documents, as returned by the web app")
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.files:
+        with open(path, encoding="utf-8") as file:
+            results = verify_against_rdflib(file.read())
+        for format, isomorphic_graph in results.items():
+            print(f"{path} {format}: {'ok' if isomorphic_graph else 'DIFFERENT'}")
+            failed = failed or not isomorphic_graph
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,100 @@
+import os, gzip, time, uuid, hashlib, tempfile
+from neo4j_client import run_cypher
+
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "lod_render_cache"))
+RENDER_CACHE_MAX_ENTRIES = int(os.getenv("RENDER_CACHE_MAX_ENTRIES", 5000))
+
+# Seconds a worker trusts the graph version before asking Neo4j again
+GRAPH_VERSION_TTL = float(os.getenv("GRAPH_VERSION_TTL", 30))
+
+# The number of entries is checked after this many stored pages
+EVICTION_INTERVAL = 100
+
+class RenderCache:
+    """
+    Disk cache for rendered game pages, keyed by (game, format) and the graph
+    version. The directory is shared by all gunicorn workers. The transfer 
+    scripts bump the graph version, after which the old entries are never 
+    hit again and are evicted first.
+    """
+
+    def __init__(self, directory=RENDER_CACHE_DIR, max_entries=RENDER_CACHE_MAX_ENTRIES, version_ttl=GRAPH_VERSION_TTL):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self.version = None
+        self.version_checked = 0.0
+        self.stored_entries = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def graph_version(self):
+        # None if the version is unknown, then nothing is cached
+        if time.monotonic() - self.version_checked > self.version_ttl:
+            try:
+                rows = run_cypher("MATCH (v:GraphVersion) RETURN v.version")
+                self.version = rows[0][0] if rows else 0
+            except Exception as e:
+                print(f"Error while loading the graph version: {e}")
+                self.version = None
+            self.version_checked = time.monotonic()
+        return self.version
+
+    def entry_path(self, version, game, format):
+        digest = hashlib.sha1(f"{game}|{format}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{version}-{digest}.gz")
+
+    def get(self, game, format):
+        version = self.graph_version()
+        if version is None:
+            return None
+
+        path = self.entry_path(version, game, format)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                data = file.read()
+        except (FileNotFoundError, EOFError, gzip.BadGzipFile):
+            return None
+
+        # Mark the entry as recently used for the eviction
+        os.utime(path)
+        return data
+
+    def put(self, game, format, data):
+        version = self.graph_version()
+        if version is None:
+            return
+
+        # Write to a temporary file first, so other workers never read a partial entry
+        path = self.entry_path(version, game, format)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with gzip.open(temp_path, "wt", encoding="utf-8") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+        self.stored_entries += 1
+        if self.stored_entries % EVICTION_INTERVAL == 0:
+            self.evict(version)
+
+    def evict(self, version):
+        # Entries of older graph versions go first, then the least recently used ones
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".gz"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                continue
+            entries.append((name.startswith(f"{version}-"), mtime, path))
+
+        entries.sort()
+        remaining = len(entries)
+        for is_current, _, path in entries:
+            if is_current and remaining <= self.max_entries:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            remaining -= 1
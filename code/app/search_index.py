@@ -0,0 +1,79 @@
+import unicodedata
+from array import array
+
+# Longest n-gram in the index, longer queries are looked up by their n-grams of this length
+MAX_GRAM_LENGTH = 3
+
+
+def normalize_name(name):
+    """
+    Normalizes a name for searching: case-folded and without accents, so 
+    "pokemon" finds "Pokémon".
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+def get_grams(text, length):
+    return {text[i:i + length] for i in range(len(text) - length + 1)}
+
+class GameSearchIndex:
+    """
+    N-gram index over the game names, built once when the games are loaded.
+    Every n-gram of up to three characters points to the positions of the 
+    games that contain it. The games are sorted by score, so the positions
+    are already in ranking order.
+    """
+
+    def __init__(self, games):
+        self.games = games
+        self.names = [normalize_name(game["name"]) for game in games]
+        self.postings = {}
+
+        for position, name in enumerate(self.names):
+            for length in range(1, MAX_GRAM_LENGTH + 1):
+                for gram in get_grams(name, length):
+                    self.postings.setdefault(gram, array("i")).append(position)
+
+    @classmethod
+    def from_parts(cls, games, names, postings):
+        """
+        Creates the index from an already built one, e.g. the views of the
+        game catalogue file. The games and names only have to be sequences and
+        the postings a mapping with get().
+        """
+        index = cls.__new__(cls)
+        index.games = games
+        index.names = names
+        index.postings = postings
+        return index
+
+    def search(self, query, limit):
+        """
+        Returns the best games whose name contains the query. Names that start
+        with the query come first, then the other matches, both by score.
+        """
+        if limit <= 0:
+            return []
+
+        query = normalize_name(query)
+        if not query:
+            return self.games[:limit]
+
+        # Only games that contain every n-gram of the query can match, so the rarest n-gram is scanned
+        length = min(len(query), MAX_GRAM_LENGTH)
+        postings = [self.postings.get(gram) for gram in get_grams(query, length)]
+        if not all(postings):
+            return []
+        candidates = min(postings, key=len)
+
+        prefix_matches, other_matches = [], []
+        for position in candidates:
+            name = self.names[position]
+            if name.startswith(query):
+                prefix_matches.append(position)
+                if len(prefix_matches) >= limit:
+                    break
+            elif len(other_matches) < limit and query in name:
+                other_matches.append(position)
+
+        return [self.games[position] for position in (prefix_matches + other_matches)[:limit]]
@@ -0,0 +1,23 @@
+from rdflib import Graph
+from rdf_serializer import serializer_functions, UnsupportedDocumentError
+
+serializer_dict = {"JSON-LD": "json-ld", "Turtle": "turtle", "N-Triples": "nt", "TriG": "trig", "RDF/XML": "pretty-xml"}
+
+def serialize_document(document, format):
+    # The processed JSON-LD document is already the JSON-LD output
+    if format.lower() == "json-ld":
+        return document
+
+    # Turtle, N-Triples and TriG are written directly, without the rdflib graph
+    if format in serializer_functions:
+        try:
+            return serializer_functions[format][0](document)
+        except UnsupportedDocumentError as e:
+            print(f"Falling back to rdflib: {e}")
+
+    # Parse the JSON-LD data into an RDF graph
+    graph = Graph()
+    graph.parse(data=document, format="json-ld", publicID="http://schema.org/")
+
+    # Serialize the graph into the requested format
+    return graph.serialize(format=serializer_dict.get(format))
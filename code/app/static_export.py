@@ -0,0 +1,66 @@
+import os, gzip, json
+
+STATIC_EXPORT_DIR = os.getenv("STATIC_EXPORT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "export"))
+
+# File extensions of the exported formats
+export_format_dict = {"JSON-LD": "jsonld", "Turtle": "ttl", "N-Triples": "nt", "TriG": "trig", "RDF/XML": "rdf"}
+
+def get_game_number(game_id):
+    # Numeric part of a game id like "n4ind:123", None for other ids
+    game_number = (game_id or "").replace("n4ind:", "")
+    return game_number if game_number.isdigit() else None
+
+def get_export_path(export_dir, game_number, format):
+    return os.path.join(export_dir, export_format_dict[format], f"{game_number}.{export_format_dict[format]}.gz")
+
+def get_run_dir(export_dir, manifest):
+    # Every export writes its files into a directory of its own, the manifest names the current one
+    return os.path.join(export_dir, manifest["directory"])
+
+def get_manifest_path(export_dir):
+    return os.path.join(export_dir, "manifest.json")
+
+class StaticExport:
+    """
+    Reads the files written by export_games.py. The files are only served 
+    while the graph version of the export matches the current graph version,
+    so an export from before the last transfer is never used. Only the files
+    of the directory named by the manifest are read, so files of an earlier
+    export are never served.
+    """
+
+    def __init__(self, export_dir=STATIC_EXPORT_DIR):
+        self.export_dir = export_dir
+        self.manifest = None
+        self.manifest_id = None
+
+    def export_version(self):
+        # Reload the manifest only when a new export replaced it
+        path = get_manifest_path(self.export_dir)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.manifest, self.manifest_id = None, None
+            return None
+
+        # The manifest is replaced by a new file, so the inode changes even within the same mtime
+        manifest_id = (stat.st_ino, stat.st_mtime_ns)
+        if manifest_id != self.manifest_id:
+            with open(path, "r") as file:
+                self.manifest = json.load(file)
+            self.manifest_id = manifest_id
+        return self.manifest.get("graph_version")
+
+    def get(self, game_id, format, graph_version):
+        game_number = get_game_number(game_id)
+        if game_number is None or format not in export_format_dict:
+            return None
+        if graph_version is None or self.export_version() != graph_version or "directory" not in self.manifest:
+            return None
+
+        try:
+            # The directory may have been removed by a newer export in the meantime
+            with gzip.open(get_export_path(get_run_dir(self.export_dir, self.manifest), game_number, format), "rt", encoding="utf-8") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
@@ -0,0 +1,49 @@
+import os, sys, csv, random
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.csv_values import split_values
+
+GAMES_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "Top2500GamesbyRating.csv")
+
+def load_games_csv(path=GAMES_CSV):
+    with open(path, newline="", encoding="utf-8") as file:
+        return [{"title": row["title"], "release_date": row["release_date"], "score": float(row["moby_score"] or 0),
+                 "platforms": split_values(row["platforms"]), "genres": split_values(row["genres"]),
+                 "developers": split_values(row["developers"]), "publishers": split_values(row["publishers"])}
+                for row in csv.DictReader(file)]
+
+class BenchCatalogue:
+    """
+    A catalogue of games scaled from the CSV of the top 2500 games, with the
+    node ids Neo4j would assign. Copies of a game get a numbered title and a
+    slightly different score, so the search behaves like on real names.
+    """
+
+    def __init__(self, size, path=GAMES_CSV, seed=0):
+        source = load_games_csv(path)
+        random_generator = random.Random(seed)
+
+        self.games = []
+        for i in range(size):
+            game = dict(source[i % len(source)])
+            copy = i // len(source)
+            if copy:
+                game["title"] = f"{game['title']} {copy + 1}"
+                game["score"] = round(max(0.0, min(10.0, game["score"] + random_generator.uniform(-1, 1))), 2)
+            game["id"] = i
+            self.games.append(game)
+
+        self.by_title = {}
+        for game in self.games:
+            self.by_title.setdefault(game["title"], game)
+
+        # Genres, platforms and companies are nodes after the games, one per distinct name
+        self.node_ids = {}
+        for game in source:
+            for key in ("genres", "platforms", "developers", "publishers"):
+                for name in game[key]:
+                    label = "Company" if key in ("developers", "publishers") else key
+                    self.node_ids.setdefault((label, name), size + len(self.node_ids))
+
+    def get_node_id(self, key, name):
+        return self.node_ids[("Company" if key in ("developers", "publishers") else key, name)]
@@ -0,0 +1,148 @@
+import os, sys, json, math, time, random, asyncio, argparse, tempfile, threading, subprocess
+import aiohttp
+from urllib.parse import quote
+from aiohttp import web
+from bench_catalogue import BenchCatalogue
+from fake_neo4j import FakeNeo4j, load_recordings
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+# Module and gunicorn config of the two serving modes
+server_modes = {"sync": ("wsgi:app", "gunicorn_config.py"), "async": ("asgi_app:app", "gunicorn_async_config.py")}
+FORMATS = ["JSON-LD", "Turtle", "N-Triples", "TriG", "RDF/XML"]
+
+def start_fake_neo4j(fake_neo4j, port):
+    # Runs the stand-in on its own event loop, so it never competes with the load generator
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(fake_neo4j.create_app(), access_log=None)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop, runner
+
+def stop_fake_neo4j(loop, runner):
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+
+def start_app(mode, port, workers, neo4j_port, work_dir):
+    module, config = server_modes[mode]
+    env = dict(os.environ, NEO4J_HTTP_URI=f"http://127.0.0.1:{neo4j_port}",
+               CATALOGUE_FILE=os.path.join(work_dir, "catalogue.bin"), CATALOGUE_REFRESH_INTERVAL="1",
+               RENDER_CACHE_DIR=os.path.join(work_dir, "render_cache"), STATIC_EXPORT_DIR=os.path.join(work_dir, "export"))
+    return subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", config, "-b", f"127.0.0.1:{port}", "-w", str(workers), module],
+                            cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+async def wait_for_app(url, timeout):
+    # Ready once the autocomplete returns games, i.e. the workers mapped the catalogue
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{url}/autocomplete", params={"q": ""}) as r:
+                    if r.status == 200 and await r.json():
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"The app at {url} did not load the catalogue within {timeout} seconds")
+
+def get_percentile(latencies, percentile):
+    return latencies[max(0, math.ceil(percentile / 100 * len(latencies)) - 1)] if latencies else float("nan")
+
+async def run_scenario(url, make_request, requests, concurrency):
+    # Sends the requests with a fixed number of concurrent clients, returns the latencies and errors
+    latencies, errors = [], 0
+    queue = list(range(requests))
+
+    async def client(session):
+        nonlocal errors
+        while queue:
+            queue.pop()
+            method, path, data = make_request()
+            start = time.perf_counter()
+            try:
+                async with session.request(method, f"{url}{path}", data=data) as r:
+                    await r.read()
+                    if r.status != 200:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        await asyncio.gather(*[client(session) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {"requests": requests, "errors": errors, "requests_per_second": requests / elapsed,
+            "p50_ms": get_percentile(latencies, 50) * 1000, "p95_ms": get_percentile(latencies, 95) * 1000,
+            "p99_ms": get_percentile(latencies, 99) * 1000}
+
+def get_scenarios(catalogue, formats, random_generator):
+    def autocomplete():
+        title = random_generator.choice(catalogue.games)["title"]
+        return "GET", f"/autocomplete?q={quote(title[:random_generator.randint(1, 5)])}", None
+
+    def form(format):
+        def make_request():
+            game = random_generator.choice(catalogue.games)
+            return "POST", "/form", {"search_term": game["title"], "format_dropdown": format, "game_id": f"n4ind:{game['id']}"}
+        return make_request
+
+    return [("/autocomplete", "-", autocomplete)] + [("/form", format, form(format)) for format in formats]
+
+async def run_benchmark(url, catalogue, args):
+    random_generator = random.Random(0)
+    results = []
+    for endpoint, format, make_request in get_scenarios(catalogue, args.formats, random_generator):
+        result = await run_scenario(url, make_request, args.requests, args.concurrency)
+        results.append({"games": len(catalogue.games), "mode": args.mode, "endpoint": endpoint, "format": format, **result})
+        print(f"{len(catalogue.games):>8} {args.mode:>5} {endpoint:<13} {format:<9} {result['requests']:>6} {result['errors']:>6} "
+              f"{result['requests_per_second']:>9.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+    return results
+
+def main(args):
+    print(f"{'games':>8} {'mode':>5} {'endpoint':<13} {'format':<9} {'reqs':>6} {'errors':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    results = []
+    for size in args.games:
+        catalogue = BenchCatalogue(size)
+        fake_neo4j = FakeNeo4j(catalogue, args.latency, args.jitter, load_recordings(args.recording))
+        loop, runner = start_fake_neo4j(fake_neo4j, args.neo4j_port)
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            url = args.url
+            app_process = None
+            if url is None:
+                url = f"http://127.0.0.1:{args.port}"
+                app_process = start_app(args.mode, args.port, args.workers, args.neo4j_port, work_dir)
+            try:
+                asyncio.run(wait_for_app(url, args.startup_timeout))
+                results.extend(asyncio.run(run_benchmark(url, catalogue, args)))
+            finally:
+                if app_process is not None:
+                    app_process.terminate()
+                    app_process.wait()
+                stop_fake_neo4j(loop, runner)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures latency and throughput of the web app against a local stand-in for Neo4j.")
+    parser.add_argument("--games", type=int, nargs="+", default=[2500], help="catalogue sizes, e.g. 2500 50000 500000")
+    parser.add_argument("--mode", choices=server_modes, default="sync", help="serve the Flask app or the ASGI app")
+    parser.add_argument("--workers", type=int, default=4, help="number of gunicorn workers")
+    parser.add_argument("--url", default=None, help="benchmark an already running app instead of starting gunicorn")
+    parser.add_argument("--port", type=int, default=8090, help="port of the started app")
+    parser.add_argument("--neo4j-port", type=int, default=7491, help="port of the Neo4j stand-in, an app given by --url has to use it")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint and format")
+    parser.add_argument("--concurrency", type=int, default=16, help="number of concurrent clients")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds every Neo4j response waits")
+    parser.add_argument("--jitter", type=float, default=0.0, help="additional random seconds every Neo4j response waits")
+    parser.add_argument("--recording", action="append", help="recorded JSON-LD response to replay, named cypher.json or describe.json")
+    parser.add_argument("--formats", nargs="+", default=FORMATS, choices=FORMATS, help="formats of /form")
+    parser.add_argument("--startup-timeout", type=float, default=300, help="seconds to wait for the catalogue")
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    main(parser.parse_args())
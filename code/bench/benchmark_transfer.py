@@ -0,0 +1,361 @@
+import os, io, sys, json, time, argparse, tempfile, threading, subprocess
+from functools import wraps
+import psycopg2
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.bulk_load import format_copy_value
+
+DBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "dbs")
+
+# Approximate row counts of the current dataset, scaled by --scale
+BASE_ROW_COUNTS = {"game": 2500, "company": 4000, "genre": 350, "genre_type": 10, "platform": 200}
+
+# Links per game in the bridge tables
+GENRES_PER_GAME = 6
+PLATFORMS_PER_GAME = 3
+
+# Rows per COPY while generating
+COPY_BATCH_SIZE = 100000
+
+# The static script reads title and company_name, the dynamic scripts name, so the tables have both
+SYNTHETIC_TABLES = """
+    DROP TABLE IF EXISTS games_companies, games_genres, games_platforms, game, company, genre, genre_type, platform CASCADE;
+    DO $$ BEGIN
+        CREATE TYPE company_type AS ENUM ('publisher', 'developer');
+    EXCEPTION WHEN duplicate_object THEN NULL;
+    END $$;
+    CREATE TABLE game(game_id int, title varchar, name varchar, score float, release_date date);
+    CREATE TABLE company(company_id int, company_name varchar, name varchar);
+    CREATE TABLE genre(genre_id int, genre_type_id int, name varchar);
+    CREATE TABLE genre_type(genre_type_id int, name varchar);
+    CREATE TABLE platform(platform_id int, name varchar);
+    CREATE TABLE games_companies(game_id int, company_id int, type company_type);
+    CREATE TABLE games_genres(game_id int, genre_id int);
+    CREATE TABLE games_platforms(game_id int, platform_id int);
+"""
+
+# Keys are added after the rows are copied, which is faster than checking every row
+SYNTHETIC_KEYS = """
+    ALTER TABLE game ADD PRIMARY KEY (game_id);
+    ALTER TABLE company ADD PRIMARY KEY (company_id);
+    ALTER TABLE genre ADD PRIMARY KEY (genre_id);
+    ALTER TABLE genre_type ADD PRIMARY KEY (genre_type_id);
+    ALTER TABLE platform ADD PRIMARY KEY (platform_id);
+    ALTER TABLE games_companies ADD PRIMARY KEY (game_id, company_id, type);
+    ALTER TABLE games_genres ADD PRIMARY KEY (game_id, genre_id);
+    ALTER TABLE games_platforms ADD PRIMARY KEY (game_id, platform_id);
+    ANALYZE;
+"""
+
+# Strategy name: (module in code/dbs, function)
+strategies = {
+    "static": ("neon_to_neo4j_static", "transfer_data_dynamically"),
+    "dynamic": ("neon_to_neo4j_dynamic", "transfer_data"),
+    "pipelined": ("transfer_engine", "transfer_data_pipelined"),
+    "incremental": ("neon_to_neo4j_dynamic", "sync_data"),
+}
+
+# Transaction functions of the transfer scripts and the phase they belong to
+phase_dict = {
+    "create_node": "node write", "create_batch_nodes": "node write", "merge_batch_nodes": "node write",
+    "delete_batch_nodes": "node write", "delete_all_nodes": "node write",
+    "create_relationship": "edge write", "create_batch_relationships": "edge write", "delete_batch_relationships": "edge write",
+}
+PHASES = ["fetch", "map", "node write", "edge write"]
+
+def get_bench_connection():
+    # A separate database, the benchmark drops and recreates its tables
+    return psycopg2.connect(database=os.getenv("BENCH_DB_NAME"), user=os.getenv("BENCH_DB_USER"),
+                            password=os.getenv("BENCH_DB_PASSWORD"), host=os.getenv("BENCH_DB_HOST", "localhost"))
+
+def get_bench_env(state_file):
+    # The transfer scripts read DB_* and NEO4J_*, they are pointed at the benchmark databases
+    return dict(os.environ, DB_NAME=os.getenv("BENCH_DB_NAME", ""), DB_USER=os.getenv("BENCH_DB_USER", ""),
+                DB_PASSWORD=os.getenv("BENCH_DB_PASSWORD", ""), DB_HOST=os.getenv("BENCH_DB_HOST", "localhost"),
+                NEO4J_URI=os.getenv("BENCH_NEO4J_URI", "bolt://localhost:7687"), NEO4J_USER=os.getenv("BENCH_NEO4J_USER", "neo4j"),
+                NEO4J_PASSWORD=os.getenv("BENCH_NEO4J_PASSWORD", ""), SYNC_STATE_FILE=state_file)
+
+def copy_rows(cursor, table_name, rows):
+    buffer = io.StringIO()
+    count = 0
+    for row in rows:
+        buffer.write('\t'.join(format_copy_value(value) for value in row) + '\n')
+        count += 1
+        if count % COPY_BATCH_SIZE == 0:
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {table_name} FROM STDIN", buffer)
+            buffer = io.StringIO()
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table_name} FROM STDIN", buffer)
+    return count
+
+def generate_data(connection, scale):
+    """
+    Creates the tables with synthetic rows, scale times the current row
+    counts. Ids are consecutive and the links are spread evenly, so two runs
+    with the same scale generate the same data.
+    """
+    counts = {table_name: max(1, count * scale) for table_name, count in BASE_ROW_COUNTS.items()}
+    games, companies, genres, genre_types, platforms = (counts[name] for name in ("game", "company", "genre", "genre_type", "platform"))
+
+    with connection.cursor() as cursor:
+        cursor.execute(SYNTHETIC_TABLES)
+        copy_rows(cursor, "game", ((i, f"Game {i}", f"Game {i}", round((i * 37 % 1000) / 100, 2), f"{1980 + i % 45}-{1 + i % 12:02d}-{1 + i % 28:02d}") for i in range(games)))
+        copy_rows(cursor, "company", ((i, f"Company {i}", f"Company {i}") for i in range(companies)))
+        copy_rows(cursor, "genre", ((i, i % genre_types, f"Genre {i}") for i in range(genres)))
+        copy_rows(cursor, "genre_type", ((i, f"Genre type {i}") for i in range(genre_types)))
+        copy_rows(cursor, "platform", ((i, f"Platform {i}") for i in range(platforms)))
+
+        # Offsets of one step per link keep the linked ids of a game distinct
+        genre_step = max(1, genres // GENRES_PER_GAME)
+        platform_step = max(1, platforms // PLATFORMS_PER_GAME)
+        copy_rows(cursor, "games_genres", ((i, (i * 31 + j * genre_step) % genres) for i in range(games) for j in range(min(GENRES_PER_GAME, genres))))
+        copy_rows(cursor, "games_platforms", ((i, (i * 17 + j * platform_step) % platforms) for i in range(games) for j in range(min(PLATFORMS_PER_GAME, platforms))))
+        copy_rows(cursor, "games_companies", ((i, (i * 7) % companies, company_type) for i in range(games) for company_type in ("developer", "publisher")))
+
+        cursor.execute(SYNTHETIC_KEYS)
+    connection.commit()
+
+    return counts
+
+def change_data(connection, fraction):
+    # Updates and deletes a fraction of the rows, for the incremental sync
+    step = max(1, round(1 / fraction))
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE game SET score = score + 0.01 WHERE game_id %% %s = 0", (step,))
+        cursor.execute("DELETE FROM games_platforms WHERE game_id %% %s = 1", (step,))
+    connection.commit()
+
+def clear_graph():
+    from neo4j import GraphDatabase
+    driver = GraphDatabase.driver(os.getenv("BENCH_NEO4J_URI", "bolt://localhost:7687"),
+                                  auth=(os.getenv("BENCH_NEO4J_USER", "neo4j"), os.getenv("BENCH_NEO4J_PASSWORD", "")))
+    with driver.session() as session:
+        session.run("MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS").consume()
+    driver.close()
+
+def get_rss():
+    # Current resident memory in bytes
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class PhaseProfiler:
+    """
+    Measures the time, rows and peak memory of the phases of a transfer. The
+    functions of the transfer scripts are wrapped, so the scripts run
+    unchanged. Times are summed over threads, so phases of the pipelined
+    transfer can add up to more than the wall time.
+    """
+
+    def __init__(self, sample_interval=0.05):
+        self.lock = threading.Lock()
+        self.seconds = {phase: 0.0 for phase in PHASES}
+        self.rows = {phase: 0 for phase in PHASES}
+        self.peak_rss = {phase: 0 for phase in PHASES}
+        self.active = {phase: 0 for phase in PHASES}
+        self.overall_peak_rss = 0
+        self.sample_interval = sample_interval
+        self.running = True
+
+    def record(self, phase, rows, seconds):
+        with self.lock:
+            self.seconds[phase] += seconds
+            self.rows[phase] += rows
+
+    def enter(self, phase, sample=True):
+        with self.lock:
+            self.active[phase] += 1
+        if sample:
+            self.sample()
+
+    def leave(self, phase, sample=True):
+        if sample:
+            self.sample()
+        with self.lock:
+            self.active[phase] -= 1
+
+    def sample(self):
+        rss = get_rss()
+        with self.lock:
+            self.overall_peak_rss = max(self.overall_peak_rss, rss)
+            for phase, active in self.active.items():
+                if active:
+                    self.peak_rss[phase] = max(self.peak_rss[phase], rss)
+
+    def sample_loop(self):
+        while self.running:
+            self.sample()
+            time.sleep(self.sample_interval)
+
+    def wrap_stream(self, stream):
+        @wraps(stream)
+        def wrapper(*args, **kwargs):
+            batches = stream(*args, **kwargs)
+            while True:
+                self.enter("fetch")
+                start = time.perf_counter()
+                try:
+                    rows = next(batches)
+                except StopIteration:
+                    return
+                finally:
+                    self.leave("fetch")
+                    elapsed = time.perf_counter() - start
+                self.record("fetch", len(rows), elapsed)
+                yield rows
+        return wrapper
+
+    def wrap_map(self, map_function):
+        @wraps(map_function)
+        def wrapper(*args, **kwargs):
+            # Called per row, the memory is only sampled by the background thread
+            self.enter("map", sample=False)
+            start = time.perf_counter()
+            try:
+                return map_function(*args, **kwargs)
+            finally:
+                self.leave("map", sample=False)
+                self.record("map", 1, time.perf_counter() - start)
+        return wrapper
+
+    def wrap_execute_write(self, execute_write):
+        @wraps(execute_write)
+        def wrapper(session, transaction_function, *args, **kwargs):
+            phase = phase_dict.get(getattr(transaction_function, "__name__", ""))
+            if phase is None:
+                return execute_write(session, transaction_function, *args, **kwargs)
+
+            rows = next((len(arg) for arg in args if isinstance(arg, list)), 1)
+            self.enter(phase)
+            start = time.perf_counter()
+            try:
+                return execute_write(session, transaction_function, *args, **kwargs)
+            finally:
+                self.leave(phase)
+                self.record(phase, rows, time.perf_counter() - start)
+        return wrapper
+
+    def install(self, modules):
+        import neo4j
+        neo4j.Session.execute_write = self.wrap_execute_write(neo4j.Session.execute_write)
+        for module in modules:
+            if hasattr(module, "stream_data_from_neon"):
+                module.stream_data_from_neon = self.wrap_stream(module.stream_data_from_neon)
+            if hasattr(module, "map_nodes_to_schema_org"):
+                module.map_nodes_to_schema_org = self.wrap_map(module.map_nodes_to_schema_org)
+        threading.Thread(target=self.sample_loop, daemon=True).start()
+
+    def report(self, wall_seconds):
+        self.running = False
+        return {"wall_seconds": wall_seconds, "peak_rss_mb": self.overall_peak_rss / 2**20,
+                "phases": {phase: {"seconds": self.seconds[phase], "rows": self.rows[phase],
+                                   "rows_per_second": self.rows[phase] / self.seconds[phase] if self.seconds[phase] else 0.0,
+                                   "peak_rss_mb": self.peak_rss[phase] / 2**20} for phase in PHASES}}
+
+def run_strategy(name, report_path):
+    # Runs in its own process, so the memory of one strategy does not count for the next
+    sys.path.insert(0, DBS_DIR)
+    os.chdir(DBS_DIR)
+    import importlib
+    import neon_reader
+    module_name, function_name = strategies[name]
+    module = importlib.import_module(module_name)
+    modules = [neon_reader] + [sys.modules[name] for name in ("neon_to_neo4j_dynamic", "transfer_engine", "neon_to_neo4j_static") if name in sys.modules]
+
+    profiler = PhaseProfiler()
+    profiler.install(modules)
+    start = time.perf_counter()
+    try:
+        getattr(module, function_name)()
+    finally:
+        module.neo4j_driver.close()
+        neon_reader.close_neon_pool()
+    report = profiler.report(time.perf_counter() - start)
+
+    with open(report_path, "w") as file:
+        json.dump(report, file)
+
+def run_strategy_process(name, env):
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as file:
+        report_path = file.name
+    try:
+        subprocess.run([sys.executable, os.path.abspath(__file__), "strategy", name, "--report", report_path], env=env, check=True)
+        with open(report_path) as file:
+            return json.load(file)
+    finally:
+        os.remove(report_path)
+
+def print_report(scale, name, report):
+    print(f"{scale:>6}x {name:<12} {'wall':<11} {report['wall_seconds']:>10.1f} {'':>10} {'':>12} {report['peak_rss_mb']:>10.1f}")
+    for phase, result in report["phases"].items():
+        print(f"{'':>7} {'':<12} {phase:<11} {result['seconds']:>10.1f} {result['rows']:>10} {result['rows_per_second']:>12.1f} {result['peak_rss_mb']:>10.1f}")
+
+def main(args):
+    print(f"{'scale':>7} {'strategy':<12} {'phase':<11} {'seconds':>10} {'rows':>10} {'rows/s':>12} {'peak MB':>10}")
+    results = []
+    for scale in args.scale:
+        connection = get_bench_connection()
+        try:
+            counts = generate_data(connection, scale)
+            print(f"Generated {', '.join(f'{count} {name}' for name, count in counts.items())}")
+
+            for name in args.strategies:
+                with tempfile.TemporaryDirectory() as work_dir:
+                    env = get_bench_env(os.path.join(work_dir, "sync_state.json"))
+                    clear_graph()
+
+                    # The incremental sync is measured after a full transfer and a change of some rows
+                    if name == "incremental":
+                        run_strategy_process("dynamic", env)
+                        change_data(connection, args.change_fraction)
+
+                    report = run_strategy_process(name, env)
+                    print_report(scale, name, report)
+                    results.append({"scale": scale, "strategy": name, **report})
+
+                    if name == "incremental":
+                        generate_data(connection, scale)
+        finally:
+            connection.close()
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Measures the transfer strategies from Postgres to Neo4j on synthetic data. "
+                                                 "Uses the databases of BENCH_DB_* and BENCH_NEO4J_*, which are overwritten.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="generate the data and run the strategies")
+    run_parser.add_argument("--scale", type=int, nargs="+", default=[10], help="multiples of the current row counts, e.g. 10 100 1000")
+    run_parser.add_argument("--strategies", nargs="+", choices=strategies, default=["dynamic", "pipelined", "incremental"],
+                            help="the static script writes one row per transaction, only use it on small scales")
+    run_parser.add_argument("--change-fraction", type=float, default=0.01, help="fraction of the rows changed before the incremental sync")
+    run_parser.add_argument("--output", default=None, help="write the results as JSON")
+
+    generate_parser = subparsers.add_parser("generate", help="only generate the data")
+    generate_parser.add_argument("--scale", type=int, default=10)
+
+    strategy_parser = subparsers.add_parser("strategy", help="run one strategy and write its report, used by run")
+    strategy_parser.add_argument("name", choices=strategies)
+    strategy_parser.add_argument("--report", required=True)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        main(args)
+    elif args.command == "generate":
+        connection = get_bench_connection()
+        try:
+            print(generate_data(connection, args.scale))
+        finally:
+            connection.close()
+    else:
+        run_strategy(args.name, args.report)
@@ -0,0 +1,123 @@
+import re, json, random, asyncio, argparse
+from aiohttp import web
+from bench_catalogue import BenchCatalogue
+
+# Context as returned by neosemantics
+CONTEXT = {"sch": "http://schema.org/", "n4ind": "neo4j://graph.individuals#", "n4sch": "neo4j://graph.schema#",
+           "xsd": "http://www.w3.org/2001/XMLSchema#"}
+
+# Keys of the relationships with the schema.org mapping and without, as returned by a plain neosemantics setup
+relationship_dict = {"genres": ("sch:genre", "n4sch:HAS_GENRE", "sch:Genre"), "platforms": ("sch:gamePlatform", "n4sch:AVAILABLE_ON", "sch:GamePlatform"),
+                     "developers": ("sch:creator", "n4sch:developer", "sch:Organization"), "publishers": ("sch:publisher", "n4sch:publisher", "sch:Organization")}
+
+class FakeNeo4j:
+    """
+    Stand-in for the neosemantics and transactional HTTP endpoints of Neo4j,
+    answering the queries of the web app from a scaled catalogue. Recorded
+    responses, if given, are replayed instead of the generated documents.
+    Every response waits the configured latency first. Relationships are
+    returned under their unmapped n4sch keys unless mapped is set.
+    """
+
+    def __init__(self, catalogue, latency=0.0, jitter=0.0, recordings=None, graph_version=1, mapped=False):
+        self.catalogue = catalogue
+        self.mapped = mapped
+        self.latency = latency
+        self.jitter = jitter
+        self.recordings = recordings or {}
+        self.graph_version = graph_version
+
+    async def wait(self):
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def get_game_node(self, game):
+        return {"@id": f"n4ind:{game['id']}", "@type": "sch:VideoGame", "sch:name": game["title"], "sch:identifier": game["id"],
+                "sch:aggregateRating": {"@type": "xsd:double", "@value": game["score"]},
+                "sch:datePublished": {"@type": "xsd:date", "@value": game["release_date"]}}
+
+    def get_game_document(self, game):
+        node = self.get_game_node(game)
+        neighbours = {}
+        for key, (mapped_relationship, unmapped_relationship, node_type) in relationship_dict.items():
+            relationship = mapped_relationship if self.mapped else unmapped_relationship
+            links = []
+            for name in game[key]:
+                node_id = f"n4ind:{self.catalogue.get_node_id(key, name)}"
+                neighbours[node_id] = {"@id": node_id, "@type": node_type, "sch:name": name}
+                links.append({"@id": node_id})
+            if links:
+                node[relationship] = links if len(links) > 1 else links[0]
+        return {"@context": CONTEXT, "@graph": [node, *neighbours.values()]}
+
+    async def cypher(self, request):
+        await self.wait()
+        body = await request.json()
+        if "cypher" in self.recordings:
+            return web.json_response(self.recordings["cypher"])
+
+        params = body.get("cypherParams", {})
+        if "id" in params:
+            game = self.catalogue.games[params["id"]] if 0 <= params["id"] < len(self.catalogue.games) else None
+        elif "name" in params:
+            game = self.catalogue.by_title.get(params["name"])
+        else:
+            # MATCH (g:Game) RETURN g
+            return web.json_response({"@context": CONTEXT, "@graph": [self.get_game_node(game) for game in self.catalogue.games]})
+
+        return web.json_response(self.get_game_document(game) if game else {})
+
+    async def describe(self, request):
+        await self.wait()
+        if "describe" in self.recordings:
+            return web.json_response(self.recordings["describe"])
+
+        game_id = int(re.sub(r"\D", "", request.match_info["node"]) or -1)
+        game = self.catalogue.games[game_id] if 0 <= game_id < len(self.catalogue.games) else None
+        return web.json_response(self.get_game_document(game) if game else {})
+
+    async def commit(self, request):
+        await self.wait()
+        body = await request.json()
+        statement = body["statements"][0]
+        query, params = statement["statement"], statement.get("parameters", {})
+
+        if "GraphVersion" in query:
+            rows = [[self.graph_version]]
+        elif "MATCH (g:Game)" in query and "$last_id" in query:
+            # The pages of the game catalogue
+            games = self.catalogue.games[params["last_id"] + 1:params["last_id"] + 1 + params["limit"]]
+            rows = [[game["id"], game["title"], game["score"]] for game in games]
+        else:
+            rows = []
+
+        return web.json_response({"results": [{"columns": [], "data": [{"row": row} for row in rows]}], "errors": []})
+
+    def create_app(self):
+        app = web.Application()
+        app.router.add_post("/rdf/neo4j/cypher", self.cypher)
+        app.router.add_get("/rdf/neo4j/describe/{node}", self.describe)
+        app.router.add_post("/db/{database}/tx/commit", self.commit)
+        return app
+
+def load_recordings(paths):
+    # Files named after the endpoint, e.g. cypher.json and describe.json
+    recordings = {}
+    for path in paths or []:
+        with open(path, encoding="utf-8") as file:
+            recordings[re.sub(r"\.json$", "", path.replace("\\", "/").split("/")[-1])] = json.load(file)
+    return recordings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves the neosemantics and HTTP endpoints of Neo4j from a generated catalogue.")
+    parser.add_argument("--games", type=int, default=2500, help="number of games in the catalogue")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds every response waits")
+    parser.add_argument("--jitter", type=float, default=0.0, help="additional random seconds every response waits")
+    parser.add_argument("--recording", action="append", help="recorded JSON-LD response to replay, named cypher.json or describe.json")
+    parser.add_argument("--port", type=int, default=7474)
+    parser.add_argument("--mapped", action="store_true", help="return the relationships under their schema.org keys")
+    args = parser.parse_args()
+
+    fake_neo4j = FakeNeo4j(BenchCatalogue(args.games), args.latency, args.jitter, load_recordings(args.recording), mapped=args.mapped)
+    web.run_app(fake_neo4j.create_app(), port=args.port)
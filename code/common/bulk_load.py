@@ -0,0 +1,63 @@
+import io
+import json
+from common.metrics import metrics
+
+
+def format_copy_value(value):
+    """
+    Formats a value for the text format of COPY. None becomes NULL, dicts 
+    and lists are stored as JSON.
+
+    :param value: Value of a column
+    :return: Escaped value as string
+    """
+    if value is None:
+        return '\\N'
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+
+    value = str(value)
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+def bulk_insert(cursor, table_name, columns, rows, conflict_columns=None, update_columns=None):
+    """
+    Inserts rows with one COPY into a temporary staging table and a single 
+    INSERT ... SELECT into the target table. Rows that already exist, or 
+    occur twice in the given rows, are skipped by ON CONFLICT DO NOTHING 
+    instead of failing the transaction. If update columns are given, 
+    existing rows are updated instead. The caller commits.
+
+    :param cursor: Cursor of the database connection
+    :param table_name: Name of the target table
+    :param columns: Columns of the rows
+    :param rows: Iterable of tuples, one value per column
+    :param conflict_columns: Unique columns that identify a row, required for updates
+    :param update_columns: Columns to update on existing rows
+    :return: Number of inserted or updated rows
+    """
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(format_copy_value(value) for value in row) + '\n')
+    buffer.seek(0)
+    metrics.increment('bytes', len(buffer.getvalue()), stage='db_copy', table=table_name)
+
+    column_list = ', '.join(columns)
+    staging_table = f'staging_{table_name}'
+
+    cursor.execute(f'''CREATE TEMP TABLE {staging_table} (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP''')
+    with metrics.timer('db_copy', table=table_name):
+        cursor.copy_expert(f'''COPY {staging_table} ({column_list}) FROM STDIN''', buffer)
+    with metrics.timer('db_insert', table=table_name):
+        if update_columns:
+            # A row can only be updated once per statement, so duplicates are removed first
+            conflict_list = ', '.join(conflict_columns)
+            update_list = ', '.join(f'{column} = EXCLUDED.{column}' for column in update_columns)
+            cursor.execute(f'''INSERT INTO {table_name} ({column_list}) SELECT DISTINCT ON ({conflict_list}) {column_list} FROM {staging_table}
+                               ON CONFLICT ({conflict_list}) DO UPDATE SET {update_list}''')
+        else:
+            cursor.execute(f'''INSERT INTO {table_name} ({column_list}) SELECT {column_list} FROM {staging_table} ON CONFLICT DO NOTHING''')
+    inserted_rows = cursor.rowcount
+    cursor.execute(f'''DROP TABLE {staging_table}''')
+    metrics.increment('rows', inserted_rows, stage='db_insert', table=table_name)
+
+    return inserted_rows
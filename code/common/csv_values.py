@@ -0,0 +1,27 @@
+import re
+
+# Legal forms that follow a comma in company names, e.g. "Nintendo Co., Ltd." or "Chinese Room, The"
+COMPANY_SUFFIX = re.compile(r"^(inc|ltd|llc|l\.l\.c|co|corp|corporation|limited|gmbh|ag|kg|s\.a|sa|s\.a\.s|sas|s\.l|s\.r\.l|srl|"
+                            r"s\.r\.o|s\.p\.a|spa|b\.v|bv|n\.v|nv|ab|a/s|a\.s|oy|ooo|pty|plc|k\.k|lp|l\.p|the)\.?$", re.IGNORECASE)
+
+
+def split_values(value):
+    """
+    Splits a comma separated cell of the games CSV into its values. Company
+    names contain commas before their legal form, such fragments are joined
+    to the preceding value again.
+
+    :param value: Cell of a multi-valued column, e.g. the developers
+    :return: List of the values in order, without empty values and duplicates
+    """
+    values = []
+    for fragment in (value or "").split(","):
+        fragment = fragment.strip()
+        if not fragment:
+            continue
+        if values and COMPANY_SUFFIX.match(fragment):
+            values[-1] = f"{values[-1]}, {fragment}"
+        else:
+            values.append(fragment)
+
+    return list(dict.fromkeys(values))
@@ -0,0 +1,237 @@
+import os
+import gzip
+import json
+import time
+import uuid
+import hashlib
+import requests
+from urllib.parse import urlencode, urlparse
+from common.metrics import metrics
+
+CACHE_DIR = os.getenv('HTTP_CACHE_DIR', os.path.expanduser('~/.cache/mobygames_http'))
+CACHE_TTL = float(os.getenv('HTTP_CACHE_TTL', 7 * 24 * 3600))
+CACHE_MAX_BYTES = int(float(os.getenv('HTTP_CACHE_MAX_MB', 1024)) * 1024 * 1024)
+
+# Serve only from the cache, never from the network
+OFFLINE = os.getenv('HTTP_CACHE_OFFLINE', '0') == '1'
+
+# Parameters that do not change the response and must not end up on disk
+EXCLUDED_PARAMS = {'api_key'}
+
+# The size of the cache is checked after this many stored responses
+EVICTION_INTERVAL = 100
+
+
+class CacheMissError(requests.RequestException):
+    """
+    Raised in offline mode for requests that are not in the cache.
+    """
+
+
+class CachedResponse:
+    """
+    Response served from the cache, with the parts of requests.Response the 
+    scripts use.
+    """
+
+    def __init__(self, url, status_code, content, headers, from_cache):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class HTTPCache:
+    """
+    Content-addressed cache for GET responses, keyed by URL and parameters. 
+    Bodies are stored gzip compressed next to a metadata file with the 
+    ETag and Last-Modified headers, which are used to revalidate expired 
+    entries. The least recently used entries are evicted once the cache 
+    exceeds its size.
+    """
+
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES, offline=OFFLINE):
+        """
+        :param directory: Directory of the cache
+        :param ttl: Seconds until an entry is revalidated
+        :param max_bytes: Maximum size of the cache on disk
+        :param offline: Serve only from the cache
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.stored_responses = 0
+
+    def cache_key(self, url, params=None):
+        """
+        Key of a request, independent of the order of the parameters.
+
+        :param url: URL of the request
+        :param params: Query parameters of the request
+        :return: SHA-256 hex digest
+        """
+        params = sorted((key, str(value)) for key, value in (params or {}).items() if key not in EXCLUDED_PARAMS)
+        return hashlib.sha256(f'{url}?{urlencode(params)}'.encode('utf-8')).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def write_file(self, path, data):
+        # Write to a temporary file first, so readers never see a partial file
+        temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+    def load(self, key):
+        """
+        Load an entry of the cache.
+
+        :param key: Key of the request
+        :return: Tuple of (metadata, body), None if the entry does not exist
+        """
+        path = self.entry_path(key)
+        try:
+            with open(f'{path}.json', 'r') as file:
+                metadata = json.load(file)
+            with gzip.open(f'{path}.gz', 'rb') as file:
+                body = file.read()
+        except (FileNotFoundError, json.JSONDecodeError, EOFError, gzip.BadGzipFile):
+            return None
+
+        # Mark the entry as recently used for the eviction
+        os.utime(f'{path}.gz')
+        return metadata, body
+
+    def store(self, key, response):
+        """
+        Store a response in the cache.
+
+        :param key: Key of the request
+        :param response: Response with status code 200
+        :return: Metadata of the entry
+        """
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        metadata = {
+            'url': response.url.split('?')[0],
+            'status_code': response.status_code,
+            'headers': {name: response.headers[name] for name in ('Content-Type', 'ETag', 'Last-Modified')
+                        if name in response.headers},
+            'fetched_at': time.time(),
+        }
+        self.write_file(f'{path}.gz', gzip.compress(response.content))
+        self.write_file(f'{path}.json', json.dumps(metadata).encode('utf-8'))
+
+        self.stored_responses += 1
+        if self.stored_responses % EVICTION_INTERVAL == 0:
+            self.evict()
+
+        return metadata
+
+    def touch(self, key, metadata):
+        """
+        Mark an entry as fresh after the server confirmed it is unchanged.
+
+        :param key: Key of the request
+        :param metadata: Metadata of the entry
+        """
+        metadata['fetched_at'] = time.time()
+        self.write_file(f'{self.entry_path(key)}.json', json.dumps(metadata).encode('utf-8'))
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits its size.
+        """
+        entries = []
+        total_bytes = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.gz'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path[:-3]))
+                total_bytes += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            for suffix in ('.gz', '.json'):
+                try:
+                    os.remove(path + suffix)
+                except FileNotFoundError:
+                    pass
+            total_bytes -= size
+
+    def get(self, url, params=None, session=None, before_request=None, **kwargs):
+        """
+        GET a URL through the cache. Fresh entries are served from disk, 
+        expired entries are revalidated with a conditional request.
+
+        :param url: URL of the request
+        :param params: Query parameters of the request
+        :param session: HTTP session for the request, requests itself if None
+        :param before_request: Function called before a request goes to the network, e.g. a rate limiter
+        :param kwargs: Further arguments for the request
+        :return: CachedResponse
+        """
+        key = self.cache_key(url, params)
+        entry = self.load(key)
+
+        if entry:
+            metadata, body = entry
+            if self.offline or time.time() - metadata['fetched_at'] < self.ttl:
+                metrics.increment('http_cache', result='hit')
+                return CachedResponse(metadata['url'], metadata['status_code'], body, metadata['headers'], True)
+        elif self.offline:
+            raise CacheMissError(f'{url} is not in the cache')
+
+        # Ask the server if the expired entry is still valid
+        headers = dict(kwargs.pop('headers', {}))
+        if entry:
+            if 'ETag' in metadata['headers']:
+                headers['If-None-Match'] = metadata['headers']['ETag']
+            if 'Last-Modified' in metadata['headers']:
+                headers['If-Modified-Since'] = metadata['headers']['Last-Modified']
+
+        if before_request:
+            before_request()
+        with metrics.timer('http_request', host=urlparse(url).netloc):
+            response = (session or requests).get(url, params=params, headers=headers, **kwargs)
+        metrics.increment('bytes', len(response.content), stage='http')
+
+        if response.status_code == 304 and entry:
+            metrics.increment('http_cache', result='revalidated')
+            self.touch(key, metadata)
+            return CachedResponse(metadata['url'], metadata['status_code'], body, metadata['headers'], True)
+
+        metrics.increment('http_cache', result='miss')
+        if response.status_code == 200:
+            self.store(key, response)
+
+        return CachedResponse(response.url, response.status_code, response.content, response.headers, False)
+
+
+# Shared cache of the scripts, configured by the environment
+http_cache = HTTPCache()
+
+
+def cached_get(url, params=None, session=None, before_request=None, **kwargs):
+    """
+    GET a URL through the shared cache, see HTTPCache.get.
+    """
+    return http_cache.get(url, params=params, session=session, before_request=before_request, **kwargs)
@@ -0,0 +1,183 @@
+import os
+import socket
+import argparse
+import psycopg2
+from dotenv import load_dotenv
+
+# Leases of claimed jobs expire, so jobs of crashed workers are claimed again
+LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 600))
+MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+RETRY_DELAY_SECONDS = int(os.getenv('JOB_RETRY_DELAY_SECONDS', 60))
+
+
+class JobQueue:
+    """
+    Queue of item IDs in the scrape_job table, shared by any number of
+    scraper processes on any number of machines. Jobs are claimed with
+    FOR UPDATE SKIP LOCKED, so two workers never claim the same job. Claimed
+    jobs are leased, a job whose lease expires is claimed again. Failed jobs
+    are retried after a delay until they run out of attempts.
+
+    Jobs are processed at least once, the scrapers skip rows that already
+    exist, so a job that is processed twice does no harm.
+    """
+
+    def __init__(self, queue, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY_SECONDS):
+        """
+        :param queue: Name of the queue, e.g. game_api_response
+        :param lease_seconds: Seconds a claimed job belongs to its worker
+        :param max_attempts: Attempts before a job is marked as failed
+        :param retry_delay: Seconds before a failed job is claimed again
+        """
+        self.queue = queue
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+
+    def seed(self, connection, query, params=()):
+        """
+        Add the IDs selected by a query as jobs. Existing jobs keep their
+        status, so seeding again only adds new IDs.
+
+        :param connection: Database connection
+        :param query: Query that selects one column of item IDs
+        :param params: Parameters of the query
+        :return: Number of new jobs
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f'''INSERT INTO scrape_job (queue, item_id) SELECT %s, item_id FROM ({query}) AS items(item_id)
+                               ON CONFLICT DO NOTHING''', (self.queue, *params))
+            new_jobs = cursor.rowcount
+        connection.commit()
+        return new_jobs
+
+    def claim(self, connection, limit):
+        """
+        Claim up to limit jobs and commit, so other workers skip them.
+
+        :param connection: Database connection
+        :param limit: Maximum number of jobs
+        :return: List of item IDs in ascending order
+        """
+        with connection.cursor() as cursor:
+            # Jobs whose worker crashed on the last attempt will not be claimed again
+            cursor.execute('''UPDATE scrape_job SET status = 'failed', last_error = COALESCE(last_error, 'lease expired'), updated_at = now()
+                              WHERE queue = %s AND status = 'running' AND lease_until < now() AND attempts >= %s''',
+                           (self.queue, self.max_attempts))
+            cursor.execute('''UPDATE scrape_job SET status = 'running', attempts = attempts + 1, worker = %s,
+                                                    lease_until = now() + %s * interval '1 second', updated_at = now()
+                              WHERE (queue, item_id) IN (SELECT queue, item_id FROM scrape_job
+                                                         WHERE queue = %s AND status IN ('pending', 'running')
+                                                           AND (lease_until IS NULL OR lease_until < now()) AND attempts < %s
+                                                         ORDER BY item_id LIMIT %s
+                                                         FOR UPDATE SKIP LOCKED)
+                              RETURNING item_id''',
+                           (self.worker, self.lease_seconds, self.queue, self.max_attempts, limit))
+            item_ids = sorted(row[0] for row in cursor.fetchall())
+        connection.commit()
+        return item_ids
+
+    def complete(self, cursor, item_ids):
+        """
+        Mark jobs as done. The caller commits, together with the scraped data.
+
+        :param cursor: Cursor of the database connection
+        :param item_ids: IDs of the finished items
+        """
+        cursor.execute('''UPDATE scrape_job SET status = 'done', lease_until = NULL, updated_at = now()
+                          WHERE queue = %s AND item_id = ANY(%s)''', (self.queue, list(item_ids)))
+
+    def fail(self, cursor, errors):
+        """
+        Release failed jobs for a retry after the retry delay, or mark them as
+        failed if they are out of attempts. The caller commits.
+
+        :param cursor: Cursor of the database connection
+        :param errors: Dict of item ID and error message
+        """
+        for item_id, error in errors.items():
+            cursor.execute('''UPDATE scrape_job SET status = CASE WHEN attempts >= %s THEN 'failed'::job_status ELSE 'pending'::job_status END,
+                                                    last_error = %s, lease_until = now() + %s * interval '1 second', updated_at = now()
+                              WHERE queue = %s AND item_id = %s''',
+                           (self.max_attempts, str(error), self.retry_delay, self.queue, item_id))
+
+    def run(self, connection, batch_size, process_batch, limit=None):
+        """
+        Claim and process batches until the queue is empty or the limit is
+        reached. An exception fails the whole batch, the next batch is
+        processed anyway.
+
+        :param connection: Database connection
+        :param batch_size: Number of jobs claimed at once, must be done within the lease
+        :param process_batch: Function that takes a list of item IDs and returns a dict of failed item IDs and errors, the data it writes on the connection is committed with the job status
+        :param limit: Maximum number of jobs, None for all
+        :return: Number of processed jobs
+        """
+        processed = 0
+        while limit is None or processed < limit:
+            size = batch_size if limit is None else min(batch_size, limit - processed)
+            item_ids = self.claim(connection, size)
+            if not item_ids:
+                break
+
+            try:
+                errors = process_batch(item_ids)
+            except Exception as e:
+                connection.rollback()
+                print(f"Failed to process the batch {item_ids[0]}-{item_ids[-1]}. Error: {e}")
+                errors = {item_id: e for item_id in item_ids}
+
+            with connection.cursor() as cursor:
+                self.complete(cursor, [item_id for item_id in item_ids if item_id not in errors])
+                self.fail(cursor, errors)
+            connection.commit()
+            processed += len(item_ids)
+
+        return processed
+
+    def status(self, connection):
+        """
+        :param connection: Database connection
+        :return: Dict of status and number of jobs
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('''SELECT status, COUNT(*) FROM scrape_job WHERE queue = %s GROUP BY status''', (self.queue,))
+            return dict(cursor.fetchall())
+
+    def retry_failed(self, connection):
+        """
+        Reset the attempts of failed jobs, so they are claimed again.
+
+        :param connection: Database connection
+        :return: Number of reset jobs
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('''UPDATE scrape_job SET status = 'pending', attempts = 0, lease_until = NULL, updated_at = now()
+                              WHERE queue = %s AND status = 'failed' ''', (self.queue,))
+            reset_jobs = cursor.rowcount
+        connection.commit()
+        return reset_jobs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Show or reset the jobs of a scrape queue.')
+    parser.add_argument('command', choices=['status', 'retry-failed'])
+    parser.add_argument('queue', help='name of the queue, e.g. game_api_response')
+    args = parser.parse_args()
+
+    load_dotenv()
+    connection = psycopg2.connect(
+        database=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+    )
+    job_queue = JobQueue(args.queue)
+
+    if args.command == 'status':
+        for status, count in sorted(job_queue.status(connection).items()):
+            print(f'{status}: {count}')
+    else:
+        print(f'Reset {job_queue.retry_failed(connection)} failed jobs')
+    connection.close()
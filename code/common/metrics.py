@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+
+# Seconds between two printed summaries while a script runs, 0 only prints the final summary
+METRICS_INTERVAL = float(os.getenv('METRICS_INTERVAL', 0))
+
+# File the metrics are written to when the script ends, JSON for .json and Prometheus text otherwise
+METRICS_EXPORT = os.getenv('METRICS_EXPORT')
+
+# Counters shown with their throughput in the summary
+THROUGHPUT_COUNTERS = ('rows', 'bytes')
+
+
+def format_labels(labels):
+    return ','.join(f'{key}="{value}"' for key, value in labels)
+
+
+class Metrics:
+    """
+    Collects counters and timers of a script, e.g. the rows written per
+    table, the bytes downloaded, retries, and the time spent in HTTP
+    requests, parsing or database round trips. Every metric has a name and
+    optional labels. Safe to use from several threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.timers = {}
+        self.name = None
+        self.started = time.monotonic()
+        self.last_summary = (self.started, {})
+        self.reporter = None
+
+    def increment(self, name, value=1, /, **labels):
+        """
+        Adds to a counter.
+
+        :param name: Name of the counter, e.g. rows, bytes or retries
+        :param value: Value to add
+        :param labels: Labels of the counter, e.g. stage or table
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, /, **labels):
+        """
+        Records one measured duration of a timer.
+
+        :param name: Name of the timer, e.g. http_request or db_commit
+        :param seconds: Measured duration
+        :param labels: Labels of the timer
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            count, total, maximum = self.timers.get(key, (0, 0.0, 0.0))
+            self.timers[key] = (count + 1, total + seconds, max(maximum, seconds))
+
+    @contextmanager
+    def timer(self, name, /, **labels):
+        """
+        Measures the duration of the with block, also if it raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counters), dict(self.timers)
+
+    def summary(self):
+        """
+        Returns the counters and timers as readable lines, with the rows and
+        bytes per second since the previous summary.
+
+        :return: Summary as string
+        """
+        counters, timers = self.snapshot()
+        now = time.monotonic()
+        last_time, last_counters = self.last_summary
+        self.last_summary = (now, counters)
+
+        lines = [f'[metrics{f" {self.name}" if self.name else ""}] {now - self.started:.1f}s elapsed']
+        for (name, labels), value in sorted(counters.items()):
+            line = f'  {name}{{{format_labels(labels)}}} {value:g}'
+            if name in THROUGHPUT_COUNTERS and now > last_time:
+                line += f' ({(value - last_counters.get((name, labels), 0)) / (now - last_time):.1f}/s)'
+            lines.append(line)
+        for (name, labels), (count, total, maximum) in sorted(timers.items()):
+            lines.append(f'  {name}{{{format_labels(labels)}}} {count} x {total / count * 1000:.1f} ms avg, '
+                         f'{maximum * 1000:.1f} ms max, {total:.1f}s total')
+        return '\n'.join(lines)
+
+    def to_json(self):
+        counters, timers = self.snapshot()
+        return json.dumps({
+            'name': self.name,
+            'elapsed_seconds': time.monotonic() - self.started,
+            'counters': [{'name': name, 'labels': dict(labels), 'value': value} for (name, labels), value in sorted(counters.items())],
+            'timers': [{'name': name, 'labels': dict(labels), 'count': count, 'total_seconds': total, 'max_seconds': maximum}
+                       for (name, labels), (count, total, maximum) in sorted(timers.items())],
+        }, indent=4)
+
+    def to_prometheus(self):
+        """
+        Returns the metrics in the Prometheus text format, counters as
+        lod_<name>_total and timers as lod_<name>_seconds summaries.
+
+        :return: Metrics as string
+        """
+        counters, timers = self.snapshot()
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f'# TYPE lod_{name}_total counter')
+            lines.extend(f'lod_{name}_total{{{format_labels(labels)}}} {value}'
+                         for (counter, labels), value in sorted(counters.items()) if counter == name)
+        for name in sorted({name for name, _ in timers}):
+            lines.append(f'# TYPE lod_{name}_seconds summary')
+            for (timer, labels), (count, total, maximum) in sorted(timers.items()):
+                if timer == name:
+                    lines.append(f'lod_{name}_seconds_count{{{format_labels(labels)}}} {count}')
+                    lines.append(f'lod_{name}_seconds_sum{{{format_labels(labels)}}} {total}')
+                    lines.append(f'lod_{name}_seconds_max{{{format_labels(labels)}}} {maximum}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path):
+        """
+        Writes the metrics to a file, as JSON if the path ends with .json.
+
+        :param path: Path of the file
+        """
+        with open(path, 'w') as file:
+            file.write(self.to_json() if path.endswith('.json') else self.to_prometheus())
+
+    def report_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            print(self.summary(), flush=True)
+
+    def start(self, name, interval=METRICS_INTERVAL, export_path=METRICS_EXPORT):
+        """
+        Names the metrics after the script, prints a summary every interval
+        seconds and a final one when the script ends, then exports the
+        metrics if a path is given.
+
+        :param name: Name of the script
+        :param interval: Seconds between two summaries, 0 for only the final one
+        :param export_path: File the metrics are written to at the end
+        """
+        self.name = name
+        if interval > 0 and self.reporter is None:
+            self.reporter = threading.Thread(target=self.report_loop, args=(interval,), daemon=True)
+            self.reporter.start()
+        atexit.register(self.finish, export_path)
+
+    def finish(self, export_path=None):
+        print(self.summary(), flush=True)
+        if export_path:
+            self.export(export_path)
+
+
+# Metrics of the running script
+metrics = Metrics()
@@ -0,0 +1,170 @@
+import time
+import asyncio
+import threading
+from urllib.parse import urlparse
+from common.metrics import metrics
+
+
+class AsyncTokenBucket:
+    """
+    Token bucket rate limiter for asyncio. Tokens are refilled continuously 
+    at the given rate, up to the capacity, and every request takes one. 
+    Waiting requests are served in order.
+    """
+
+    def __init__(self, rate, capacity=1):
+        """
+        :param rate: Tokens refilled per second
+        :param capacity: Maximum number of tokens, i.e. the allowed burst
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """
+        Waits until a token is available and takes it.
+        """
+        start = time.monotonic()
+        async with self.lock:
+            self.refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.refill()
+            self.tokens -= 1
+        metrics.observe('rate_limit_wait', time.monotonic() - start)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter, the blocking counterpart of 
+    AsyncTokenBucket for thread pools.
+    """
+
+    def __init__(self, rate, capacity=1):
+        """
+        :param rate: Tokens refilled per second
+        :param capacity: Maximum number of tokens, i.e. the allowed burst
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """
+        Blocks until a token is available and takes it.
+        """
+        start = time.monotonic()
+        with self.lock:
+            self.refill()
+            while self.tokens < 1:
+                time.sleep((1 - self.tokens) / self.rate)
+                self.refill()
+            self.tokens -= 1
+        metrics.observe('rate_limit_wait', time.monotonic() - start)
+
+
+class SharedRateLimiter:
+    """
+    Rate limiter shared by all processes that use the same name, on any 
+    machine, e.g. the --queue workers of the scrapers. The rate_limit table 
+    stores when the next request is due. Every request moves it on by one 
+    interval with a single UPDATE and sleeps until its own slot, so no lock 
+    is held while waiting. The clock of the database is used, so the clocks 
+    of the machines do not matter.
+    """
+
+    def __init__(self, connection, name, rate, capacity=1):
+        """
+        :param connection: Database connection for the rate limiters only, it is switched to autocommit
+        :param name: Name of the limit, the same in all processes
+        :param rate: Requests per second of all processes together
+        :param capacity: Maximum burst of all processes together
+        """
+        self.connection = connection
+        self.connection.autocommit = True
+        self.name = name
+        self.interval = 1 / rate
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        with self.lock, connection.cursor() as cursor:
+            cursor.execute('''INSERT INTO rate_limit (name) VALUES (%s) ON CONFLICT DO NOTHING''', (name,))
+
+    def reserve(self):
+        """
+        Reserves the next free slot of the limit.
+
+        :return: Seconds until the slot
+        """
+        with self.lock, self.connection.cursor() as cursor:
+            cursor.execute('''UPDATE rate_limit SET due = GREATEST(due, now()) + %s * interval '1 second'
+                              WHERE name = %s RETURNING EXTRACT(EPOCH FROM due - now())''', (self.interval, self.name))
+            return max(0.0, float(cursor.fetchone()[0]) - self.capacity * self.interval)
+
+    def acquire(self):
+        """
+        Blocks until the reserved slot.
+        """
+        start = time.monotonic()
+        time.sleep(self.reserve())
+        metrics.observe('rate_limit_wait', time.monotonic() - start)
+
+
+class AsyncSharedRateLimiter(SharedRateLimiter):
+    """
+    SharedRateLimiter for asyncio, the slot is reserved on a thread.
+    """
+
+    async def acquire(self):
+        """
+        Waits until the reserved slot.
+        """
+        start = time.monotonic()
+        await asyncio.sleep(await asyncio.to_thread(self.reserve))
+        metrics.observe('rate_limit_wait', time.monotonic() - start)
+
+
+class HostRateLimiter:
+    """
+    Keeps a separate token bucket per host, so requests to one host do not 
+    slow down requests to another.
+    """
+
+    def __init__(self, rate, capacity=1, create_bucket=None):
+        """
+        :param rate: Requests per second per host
+        :param capacity: Maximum burst per host
+        :param create_bucket: Function that creates the limiter of a host, e.g. a SharedRateLimiter, defaults to a TokenBucket
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.create_bucket = create_bucket or (lambda host: TokenBucket(self.rate, self.capacity))
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url):
+        """
+        Blocks until a request to the host of the URL is allowed.
+
+        :param url: URL of the request
+        """
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = self.create_bucket(host)
+            bucket = self.buckets[host]
+        bucket.acquire()
@@ -0,0 +1,189 @@
+import os
+import re
+import sys
+import csv
+import argparse
+from datetime import date
+from dotenv import load_dotenv
+from provision_schema import provision_schema
+from graph_version import bump_graph_version
+from neon_to_neo4j_dynamic import neo4j_driver, delete_all_nodes, merge_batch_nodes, execute_timed_write, NODE_BATCH_SIZE
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.metrics import metrics
+from common.csv_values import split_values
+
+# Load environment variables
+load_dotenv()
+
+CSV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "Top2500GamesbyRating.csv")
+
+# Labels loaded by the CSV, the nodes of all of them are deleted with reset
+LABELS = ("Game", "Company", "Genre", "GenreType", "Platform")
+
+# Multi-valued columns of the CSV and the label and relationship type of their values, like in neon_to_neo4j_static.py
+MULTI_VALUED_COLUMNS = [
+    ("platforms", "Platform", "platform_id", "AVAILABLE_ON"),
+    ("genres", "Genre", "genre_id", "HAS_GENRE"),
+    ("developers", "Company", "company_id", "developer"),
+    ("publishers", "Company", "company_id", "publisher"),
+]
+
+
+def parse_release_date(value):
+    """
+    Parses the release date of a game. Dates with only a year or a month
+    are completed to the first day, like in import_top_2500_games.py.
+
+    Parameters:
+        value (str): The release date as YYYY, YYYY-MM or YYYY-MM-DD.
+
+    Returns:
+        datetime.date: The release date, None if the value is empty.
+    """
+    if not value:
+        return None
+    if re.search(r"^[12]\d{3}$", value):
+        value += "-01-01"
+    elif re.search(r"^[12]\d{3}-[0-3]\d$", value):
+        value += "-01"
+    return date.fromisoformat(value)
+
+def merge_batch_relationships(tx, node1_label, node1_key, node2_label, node2_key, relationship_type, rows):
+    """
+    Creates a batch of relationships between nodes with different key
+    properties in Neo4j.
+
+    Parameters:
+        tx (neo4j.Session): The Neo4j transaction.
+        node1_label (str): The label of the start nodes.
+        node1_key (str): The key property of the start nodes.
+        node2_label (str): The label of the end nodes.
+        node2_key (str): The key property of the end nodes.
+        relationship_type (str): The type of the relationships.
+        rows (list): The relationships as dicts with a "start" and an "end" key.
+
+    Returns:
+        None
+    """
+    query = (f"UNWIND $rows AS row "
+             f"MATCH (a:{node1_label} {{ {node1_key}: row.start }}) "
+             f"MATCH (b:{node2_label} {{ {node2_key}: row.end }}) "
+             f"MERGE (a)-[:{relationship_type}]->(b)")  # Using MERGE to avoid creating duplicate relationships
+    tx.run(query, rows=rows)
+
+def has_nodes(tx, labels):
+    """
+    Checks whether Neo4j has any node of the given labels.
+
+    Parameters:
+        tx (neo4j.Session): The Neo4j transaction.
+        labels (tuple): The labels of the nodes.
+
+    Returns:
+        bool: Whether a node exists.
+    """
+    query = "MATCH (n) WHERE any(label IN labels(n) WHERE label IN $labels) RETURN n LIMIT 1"
+    return tx.run(query, labels=list(labels)).single() is not None
+
+def stream_csv_batches(path, batch_size):
+    """
+    Streams the rows of the CSV in batches, so only one batch is held in
+    memory at a time.
+
+    Parameters:
+        path (str): The path of the CSV file.
+        batch_size (int): The number of rows per batch.
+
+    Returns:
+        generator: Lists of rows as dicts.
+    """
+    with open(path, newline="", encoding="utf-8") as csv_file:
+        batch = []
+        for row in csv.DictReader(csv_file):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+def transfer_csv(path=CSV_FILE, batch_size=NODE_BATCH_SIZE, reset=False):
+    """
+    Loads the games of the CSV into Neo4j in one pass, without the neon
+    database. The CSV has no IDs for platforms, genres and companies, so
+    they are deduplicated by name in memory and numbered sequentially. The
+    IDs differ from the MobyGames IDs in the neon database and would
+    overwrite their nodes, so the loader refuses a graph with nodes unless
+    reset is given. The CSV has no genre types, so no GenreType nodes and
+    IS_TYPE relationships are created.
+
+    Parameters:
+        path (str): The path of the CSV file.
+        batch_size (int): The number of games per batch.
+        reset (bool): Deletes the nodes of all labels first.
+
+    Returns:
+        None
+    """
+    # Sequential IDs per label {Label: {Name: ID}}
+    node_ids = {label: {} for _, label, _, _ in MULTI_VALUED_COLUMNS}
+
+    with neo4j_driver.session() as session:
+        if reset:
+            for label in LABELS:
+                session.execute_write(delete_all_nodes, label)
+        elif session.execute_read(has_nodes, LABELS):
+            raise ValueError("The graph already has nodes, their IDs would be overwritten, run with --reset to replace them")
+
+        # Create the constraints and indexes before any node is written
+        provision_schema(session)
+
+        for rows in stream_csv_batches(path, batch_size):
+            new_nodes = {label: [] for label in node_ids}
+            relationships = {}
+            games = []
+
+            for row in rows:
+                game_id = int(row["id"])
+                games.append({"game_id": game_id, "name": row["title"],
+                              "score": float(row["moby_score"]) if row["moby_score"] else None,
+                              "release_date": parse_release_date(row["release_date"])})
+
+                for column, label, key_property, relationship_type in MULTI_VALUED_COLUMNS:
+                    for name in split_values(row[column]):
+                        ids = node_ids[label]
+                        if name not in ids:
+                            ids[name] = len(ids) + 1
+                            new_nodes[label].append({key_property: ids[name], "name": name})
+                        relationships.setdefault((label, key_property, relationship_type), []).append({"start": game_id, "end": ids[name]})
+
+            # The nodes of a batch are written before its relationships
+            for label, nodes in new_nodes.items():
+                if nodes:
+                    execute_timed_write(session, merge_batch_nodes, label, label, next(iter(nodes[0])), nodes)
+            execute_timed_write(session, merge_batch_nodes, "Game", "Game", "game_id", games)
+
+            for (label, key_property, relationship_type), relationship_rows in relationships.items():
+                execute_timed_write(session, merge_batch_relationships, relationship_type,
+                                    "Game", "game_id", label, key_property, relationship_type, relationship_rows)
+
+            print(f"Loaded {len(games)} games, last ID: {games[-1]['game_id']}")
+
+        # Invalidate the cached pages of the web app
+        session.execute_write(bump_graph_version)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Loads the games of a CSV export directly into the neo4j database.")
+    parser.add_argument("--csv", default=CSV_FILE, help="path of the CSV file")
+    parser.add_argument("--batch-size", type=int, default=NODE_BATCH_SIZE, help="number of games per transaction")
+    parser.add_argument("--reset", action="store_true", help="delete all games, companies, genres and platforms first")
+    args = parser.parse_args()
+
+    metrics.start("csv_to_neo4j")
+    try:
+        transfer_csv(args.csv, args.batch_size, args.reset)
+        print("Data transfer successful")
+    finally:
+        neo4j_driver.close()
@@ -1,10 +1,15 @@
 import os
+import sys
 import psycopg2
 import csv
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.metrics import metrics
+
 # Load environment variables
 load_dotenv()
+metrics.start("get_db_statistics")
 
 # Connect to PostgreSQL database
 try:
@@ -43,8 +48,9 @@ except Exception as e:
 all_counts = []
 for (table_name,) in tables:
     try:
-        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-        row_count = cursor.fetchone()[0]
+        with metrics.timer("db_count", table=table_name):
+            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+            row_count = cursor.fetchone()[0]
         all_counts.append((table_name, row_count))
     except Exception as e:
         print(f"Error counting rows in table {table_name}: {e}")
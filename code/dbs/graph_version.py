@@ -0,0 +1,13 @@
+def bump_graph_version(tx):
+    """
+    Increments the version stamp of the graph. The web app includes the 
+    version in the keys of its response cache, so bumping it after a 
+    transfer invalidates all cached pages.
+
+    Parameters:
+        tx (neo4j.Session): The Neo4j transaction.
+
+    Returns:
+        None
+    """
+    tx.run("MERGE (v:GraphVersion) SET v.version = coalesce(v.version, 0) + 1, v.updated_at = datetime()")
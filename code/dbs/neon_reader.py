@@ -0,0 +1,135 @@
+import os
+import sys
+import uuid
+from contextlib import contextmanager
+from psycopg2.pool import ThreadedConnectionPool
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.metrics import metrics
+
+# Load environment variables
+load_dotenv()
+
+# Number of rows fetched from the server per round trip and yielded per batch
+FETCH_BATCH_SIZE = int(os.getenv("FETCH_BATCH_SIZE", 2000))
+
+# Maximum number of open connections to the neon database
+MAX_CONNECTIONS = int(os.getenv("NEON_MAX_CONNECTIONS", 8))
+
+neon_pool = None
+
+
+def get_neon_pool():
+    """
+    Gets the connection pool of the neon database, creates it on first use. 
+    TCP keepalives prevent idle connections from being closed after five 
+    minutes of inactivity, so connections can be reused between tables.
+
+    Parameters:
+        None
+
+    Returns:
+        psycopg2.pool.ThreadedConnectionPool: The connection pool.
+    """
+    global neon_pool
+    if neon_pool is None:
+        neon_pool = ThreadedConnectionPool(
+            1, MAX_CONNECTIONS,
+            database=os.getenv("DB_NAME"),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD"),
+            host=os.getenv("DB_HOST"),
+            keepalives=1,
+            keepalives_idle=30,
+            keepalives_interval=10,
+            keepalives_count=5,
+        )
+
+    return neon_pool
+
+@contextmanager
+def neon_connection():
+    """
+    Borrows a connection from the pool and returns it afterwards. Connections
+    that were closed in the meantime are discarded and replaced.
+
+    Parameters:
+        None
+
+    Returns:
+        psycopg2.connection: The borrowed connection.
+    """
+    pool = get_neon_pool()
+    connection = pool.getconn()
+    if connection.closed:
+        pool.putconn(connection, close=True)
+        connection = pool.getconn()
+
+    try:
+        yield connection
+    finally:
+        pool.putconn(connection, close=bool(connection.closed))
+
+def stream_data_from_neon(table_name, columns, batch_size=FETCH_BATCH_SIZE):
+    """
+    Streams data from the neon database in batches. Uses a named server-side
+    cursor, so only one batch is held in memory at a time.
+
+    Parameters:
+        table_name (str): The name of the table to fetch data from.
+        columns (list): The columns to fetch data from.
+        batch_size (int): The number of rows per batch.
+
+    Returns:
+        generator: The fetched rows as lists of tuples.
+    """
+    column_list = ", ".join(columns)
+    query = f"SELECT {column_list} FROM {table_name}"
+
+    with neon_connection() as connection:
+        try:
+            # Named cursors are executed on the server and fetched in chunks of itersize rows
+            with connection.cursor(name=f"stream_{table_name}_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(query)
+
+                while True:
+                    with metrics.timer("neon_fetch", table=table_name):
+                        rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    metrics.increment("rows", len(rows), stage="neon_fetch", table=table_name)
+                    yield rows
+        finally:
+            # End the read transaction, so the connection can be reused
+            if not connection.closed:
+                connection.rollback()
+
+def fetch_data_from_neon(table_name, columns):
+    """
+    Fetches all data of a table from the neon database.
+
+    Parameters:
+        table_name (str): The name of the table to fetch data from.
+        columns (list): The columns to fetch data from.
+
+    Returns:
+        list: The fetched data.
+    """
+    return [row for rows in stream_data_from_neon(table_name, columns) for row in rows]
+
+def close_neon_pool():
+    """
+    Closes all connections of the pool.
+
+    Parameters:
+        None
+
+    Returns:
+        None
+    """
+    global neon_pool
+    if neon_pool is not None:
+        neon_pool.closeall()
+        neon_pool = None
@@ -1,8 +1,16 @@
 import os
-import psycopg2
+import sys
+import argparse
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
 from schema_definitions import TABLES, RELATIONSHIP_TABLES, SCHEMA_MAPPING
+from provision_schema import provision_schema, get_node_property
+from graph_version import bump_graph_version
+from neon_reader import stream_data_from_neon, close_neon_pool
+from sync_state import load_sync_state, save_sync_state, encode_key, decode_key, hash_row, diff_table_state
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.metrics import metrics
 
 # Load environment variables
 load_dotenv()
@@ -13,6 +21,23 @@ neo4j_driver = GraphDatabase.driver(
     auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
 )
 
+# Maximum number of nodes and relationships written per transaction
+NODE_BATCH_SIZE = int(os.getenv("NODE_BATCH_SIZE", 5000))
+RELATIONSHIP_BATCH_SIZE = int(os.getenv("RELATIONSHIP_BATCH_SIZE", 5000))
+
+def delete_all_nodes(tx, label):
+    """
+    Deletes all nodes of a label and their relationships in Neo4j.
+
+    Parameters:
+        tx (neo4j.Session): The Neo4j transaction.
+        label (str): The label of the nodes.
+
+    Returns:
+        None
+    """
+    tx.run(f"MATCH (n:{label}) DETACH DELETE n")
+
 def create_batch_nodes(tx, label, data_list):
     """
     Creates a batch of nodes in Neo4j.
@@ -25,64 +50,155 @@ def create_batch_nodes(tx, label, data_list):
     Returns:
         None
     """
-    # Delete all nodes on the database
-    tx.run(f"MATCH (n:{label}) DETACH DELETE n")
-
-    # Create the new nodes
     query = f"UNWIND $properties AS row CREATE (n:{label}) SET n = row"
     tx.run(query, properties=data_list)
 
-def create_relationship(tx, node1_label, node1_property, node2_label, node2_property, relationship_type):
+def merge_batch_nodes(tx, label, key_property, data_list):
     """
-    Creates a relationship between two nodes in Neo4j.
-    
+    Creates or updates a batch of nodes in Neo4j, matched by their key 
+    property. Unlike create_batch_nodes, the other nodes of the label and 
+    their relationships are kept.
+
     Parameters:
         tx (neo4j.Session): The Neo4j transaction.
-        node1_label (str): The label of the first node.
-        node1_property (tuple): The property of the first node.
-        node2_label (str): The label of the second node.
-        node2_property (tuple): The property of the second node.
-        relationship_type (str): The type of the relationship.
+        label (str): The label of the nodes.
+        key_property (str): The key property of the nodes.
+        data_list (list): The data of the nodes.
 
     Returns:
         None
     """
-    query = (f"MATCH (a:{node1_label} {{ {node1_property[0]}: ${node1_property[0]} }}), "
-             f"(b:{node2_label} {{ {node2_property[0]}: ${node2_property[0]} }}) "
+    query = f"UNWIND $properties AS row MERGE (n:{label} {{ {key_property}: row.{key_property} }}) SET n = row"
+    tx.run(query, properties=data_list)
+
+def delete_batch_nodes(tx, label, key_property, keys):
+    """
+    Deletes a batch of nodes and their relationships in Neo4j.
+
+    Parameters:
+        tx (neo4j.Session): The Neo4j transaction.
+        label (str): The label of the nodes.
+        key_property (str): The key property of the nodes.
+        keys (list): The keys of the nodes to delete.
+
+    Returns:
+        None
+    """
+    query = f"UNWIND $keys AS key MATCH (n:{label} {{ {key_property}: key }}) DETACH DELETE n"
+    tx.run(query, keys=keys)
+
+def create_batch_relationships(tx, node1_label, node2_label, relationship_type, key_property, rows):
+    """
+    Creates a batch of relationships between two node labels in Neo4j. All
+    rows are sent in a single query, instead of one transaction per edge.
+
+    Parameters:
+        tx (neo4j.Session): The Neo4j transaction.
+        node1_label (str): The label of the start nodes.
+        node2_label (str): The label of the end nodes.
+        relationship_type (str): The type of the relationships.
+        key_property (str): The property used to match both nodes.
+        rows (list): The relationships as dicts with a "start" and an "end" key.
+
+    Returns:
+        None
+    """
+    query = (f"UNWIND $rows AS row "
+             f"MATCH (a:{node1_label} {{ {key_property}: row.start }}) "
+             f"MATCH (b:{node2_label} {{ {key_property}: row.end }}) "
              f"MERGE (a)-[:{relationship_type}]->(b)")  # Using MERGE to avoid creating duplicate relationships
-    params = {node1_property[0]: node1_property[1], node2_property[0]: node2_property[1]}
-    tx.run(query, **params)
+    tx.run(query, rows=rows)
 
-def fetch_data_from_neon(table_name, columns):
+def delete_batch_relationships(tx, node1_label, node2_label, relationship_type, key_property, rows):
     """
-    Fetches data from the neon database. Connects to the database inside the 
-    function to create a new session each time. This prevents the connection 
-    from being closed after five minutes of inactivity.
-    
+    Deletes a batch of relationships between two node labels in Neo4j.
+
     Parameters:
-        table_name (str): The name of the table to fetch data from.
-        columns (list): The columns to fetch data from.
+        tx (neo4j.Session): The Neo4j transaction.
+        node1_label (str): The label of the start nodes.
+        node2_label (str): The label of the end nodes.
+        relationship_type (str): The type of the relationships.
+        key_property (str): The property used to match both nodes.
+        rows (list): The relationships as dicts with a "start" and an "end" key.
+
+    Returns:
+        None
+    """
+    query = (f"UNWIND $rows AS row "
+             f"MATCH (a:{node1_label} {{ {key_property}: row.start }})"
+             f"-[r:{relationship_type}]->"
+             f"(b:{node2_label} {{ {key_property}: row.end }}) "
+             f"DELETE r")
+    tx.run(query, rows=rows)
+
+def chunk_list(data_list, chunk_size):
+    """
+    Splits a list into chunks of a given size.
+
+    Parameters:
+        data_list (list): The list to split.
+        chunk_size (int): The maximum size of each chunk.
+
+    Returns:
+        generator: The chunks of the list.
+    """
+    for i in range(0, len(data_list), chunk_size):
+        yield data_list[i:i + chunk_size]
+
+def group_relationships(relationship_rows):
+    """
+    Groups relationships by their start label, end label, relationship type 
+    and key property, so each group can be created with one query.
+
+    Parameters:
+        relationship_rows (list): Tuples of (node1_label, node2_label, relationship_type, key_property, start, end).
+
+    Returns:
+        dict: The relationship rows grouped by (node1_label, node2_label, relationship_type, key_property).
+    """
+    groups = {}
+    for node1_label, node2_label, relationship_type, key_property, start, end in relationship_rows:
+        group = (node1_label, node2_label, relationship_type, key_property)
+        groups.setdefault(group, []).append({"start": start, "end": end})
+
+    return groups
+
+def execute_timed_write(session, write_function, name, *args):
+    """
+    Runs a write transaction and records its time and number of rows in the metrics.
+
+    Parameters:
+        session (neo4j.Session): The Neo4j session.
+        write_function (function): The transaction function, its last argument are the rows.
+        name (str): The label or relationship type that is written.
+        *args: The arguments of the transaction function.
 
     Returns:
-        list: The fetched data.
+        None
     """
-    neon_connection = psycopg2.connect(
-        database=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        host=os.getenv("DB_HOST"),
-    )
-    neon_cursor = neon_connection.cursor()
-    
-    column_list = ", ".join(columns)
-    query = f"SELECT {column_list} FROM {table_name}"
-    neon_cursor.execute(query)
-    data = neon_cursor.fetchall()
+    with metrics.timer("neo4j_write", function=write_function.__name__, name=name):
+        session.execute_write(write_function, *args)
+    metrics.increment("rows", len(args[-1]), stage="neo4j_write", function=write_function.__name__, name=name)
 
-    neon_cursor.close()
-    neon_connection.close()
+def load_relationships(session, relationship_rows, batch_size=RELATIONSHIP_BATCH_SIZE, write_function=create_batch_relationships):
+    """
+    Loads relationships into Neo4j, one transaction per chunk of each group.
 
-    return data
+    Parameters:
+        session (neo4j.Session): The Neo4j session.
+        relationship_rows (list): Tuples of (node1_label, node2_label, relationship_type, key_property, start, end).
+        batch_size (int): The maximum number of relationships per transaction.
+        write_function (function): The function that writes a chunk, e.g. delete_batch_relationships.
+
+    Returns:
+        None
+    """
+    for group, rows in group_relationships(relationship_rows).items():
+        node1_label, node2_label, relationship_type, key_property = group
+        for chunk in chunk_list(rows, batch_size):
+            execute_timed_write(
+                session, write_function, relationship_type, node1_label, node2_label, relationship_type, key_property, chunk
+            )
 
 def map_nodes_to_schema_org(node_label, row_data):
     """
@@ -108,9 +224,109 @@ def map_nodes_to_schema_org(node_label, row_data):
     else:
         return row_data
 
+def stream_nodes(table_name, columns, label):
+    """
+    Streams the rows of a table in batches and maps them to the schema.org 
+    properties.
+
+    Parameters:
+        table_name (str): The name of the table to fetch data from.
+        columns (list): The columns to fetch data from.
+        label (str): The label of the nodes.
+
+    Returns:
+        generator: The mapped data of the nodes as lists of dicts.
+    """
+    for rows in stream_data_from_neon(table_name, columns):
+        yield [map_nodes_to_schema_org(label, dict(zip(columns, row))) for row in rows]
+
+def stream_relationship_table(table_name, columns, table1, table2, column, type):
+    """
+    Streams the relationships of a bridge table in batches.
+
+    Parameters:
+        table_name (str): The name of the bridge table.
+        columns (list): The columns of the bridge table.
+        table1 (str): The label of the start nodes.
+        table2 (str): The label of the end nodes.
+        column (str): The property used to match both nodes.
+        type (str): The type of the relationships, None if stored in the third column.
+
+    Returns:
+        generator: Lists of (node1_label, node2_label, relationship_type, key_property, start, end) tuples.
+    """
+    for rows in stream_data_from_neon(table_name, columns):
+        relationship_rows = []
+        for row in rows:
+            data = dict(zip(columns, row))
+            relationship_type = type if type else data[columns[2]]
+            relationship_rows.append((table1, table2, relationship_type, column, data[columns[0]], data[columns[1]]))
+        yield relationship_rows
+
+def stream_genre_type_relationships():
+    """
+    Streams the relationships between genres and genre types in batches.
+
+    Parameters:
+        None
+
+    Returns:
+        generator: Lists of (node1_label, node2_label, relationship_type, key_property, start, end) tuples.
+    """
+    # TODO: Refactor this to be more dynamic, currently hardcoded since its the only relation that is one-to-many
+    for genres in stream_data_from_neon("genre", ["genre_id", "genre_type_id"]):
+        yield [("Genre", "GenreType", "IS_TYPE", "identifier", genre[0], genre[1]) for genre in genres]
+
+def stream_relationships():
+    """
+    Streams the relationships of all bridge tables and the genre to genre 
+    type link in batches.
+
+    Parameters:
+        None
+
+    Returns:
+        generator: Tuples of (table_name, relationship_rows), relationship_rows being tuples of 
+                   (node1_label, node2_label, relationship_type, key_property, start, end).
+    """
+    for row in RELATIONSHIP_TABLES:
+        for relationship_rows in stream_relationship_table(*row):
+            yield row[0], relationship_rows
+
+    for relationship_rows in stream_genre_type_relationships():
+        yield "genre.genre_type_id", relationship_rows
+
+def get_node_state(label, key_property, data_list):
+    """
+    Gets the sync state of a list of nodes.
+
+    Parameters:
+        label (str): The label of the nodes.
+        key_property (str): The key property of the nodes.
+        data_list (list): The mapped data of the nodes.
+
+    Returns:
+        dict: The state of the nodes {Key: Hash}.
+    """
+    return {encode_key(data[key_property]): hash_row(data) for data in data_list}
+
+def get_relationship_state(relationship_rows):
+    """
+    Gets the sync state of a list of relationships. Relationships have no 
+    properties, so the key is the whole row.
+
+    Parameters:
+        relationship_rows (list): Tuples of (node1_label, node2_label, relationship_type, key_property, start, end).
+
+    Returns:
+        dict: The state of the relationships {Key: Hash}.
+    """
+    return {encode_key(row): "" for row in relationship_rows}
+
 def transfer_data():
     """
-    Transfers data from the neon database to the neo4j database.
+    Transfers data from the neon database to the neo4j database. Records 
+    the transferred rows in the sync state, so later runs can use sync_data.
 
     Parameters:
         None
@@ -118,48 +334,120 @@ def transfer_data():
     Returns:
         None
     """
+    state = {}
+
     with neo4j_driver.session() as session:
-        data_list = [] # List to store the data to create nodes
-        
-        # Create nodes based on the tables
+        # Create the constraints and indexes before any node is written
+        provision_schema(session, SCHEMA_MAPPING)
+
+        # Create nodes based on the tables, one batch at a time
         for row in TABLES:
             table_name, columns, label = row
+            key_property = get_node_property(label, columns[0], SCHEMA_MAPPING)
 
-            data = fetch_data_from_neon(table_name, columns)
-            for row in data:
-                data = dict(zip(columns, row))
-                schema_data = map_nodes_to_schema_org(label, data)
-                data_list.append(schema_data)
-
-            session.execute_write(create_batch_nodes, label, data_list)
-            data_list = []
-
-        # TODO: This part is somewhow insanenly slow, i dont know why
-        for row in RELATIONSHIP_TABLES:
-            table_name, columns, table1, table2, column, type = row
-
-            data = fetch_data_from_neon(table_name, columns)
-            for row in data:
-                data = dict(zip(columns, row))
-                relationship_type = type if type else data[columns[2]]
-
-                session.execute_write(
-                    create_relationship,
-                    table1, (column, data[columns[0]]),
-                    table2, (column, data[columns[1]]),
-                    relationship_type
-                )
- 
-        # TODO: Refactor this to be more dynamic, currently hardcoded since its the only relation that is one-to-many
-        genres = fetch_data_from_neon("genre", ["genre_id", "genre_type_id"])
-        for genre in genres:
-            session.execute_write(
-                create_relationship, "Genre", ("identifier", genre[0]), "identifier", ("genre_type_id", genre[1]), "IS_TYPE"
-            )
+            session.execute_write(delete_all_nodes, label)
+            state[table_name] = {}
+            for data_list in stream_nodes(table_name, columns, label):
+                execute_timed_write(session, create_batch_nodes, label, label, data_list)
+                state[table_name].update(get_node_state(label, key_property, data_list))
+
+        # Create the relationships of all bridge tables in batches
+        for table_name, relationship_rows in stream_relationships():
+            load_relationships(session, relationship_rows)
+            state.setdefault(table_name, {}).update(get_relationship_state(relationship_rows))
+
+        # Invalidate the cached pages of the web app
+        session.execute_write(bump_graph_version)
+
+    save_sync_state(state)
+
+def sync_data():
+    """
+    Synchronizes the neo4j database with the neon database incrementally. 
+    Only the rows that were inserted, updated or deleted since the last 
+    sync are written, the rest of the graph stays untouched.
+
+    Parameters:
+        None
+
+    Returns:
+        None
+    """
+    state = load_sync_state()
+
+    with neo4j_driver.session() as session:
+        # Create the constraints and indexes before any node is written
+        provision_schema(session, SCHEMA_MAPPING)
+
+        # Merge the inserted and updated nodes, delete the removed ones
+        for row in TABLES:
+            table_name, columns, label = row
+            key_property = get_node_property(label, columns[0], SCHEMA_MAPPING)
+            previous_state = state.get(table_name, {})
+            current_state = {}
+            inserted_count, updated_count = 0, 0
+
+            for data_list in stream_nodes(table_name, columns, label):
+                batch_state = get_node_state(label, key_property, data_list)
+                inserted, updated, _ = diff_table_state(previous_state, batch_state)
+
+                changed_keys = set(inserted + updated)
+                changed_nodes = [data for data in data_list if encode_key(data[key_property]) in changed_keys]
+                for chunk in chunk_list(changed_nodes, NODE_BATCH_SIZE):
+                    execute_timed_write(session, merge_batch_nodes, label, label, key_property, chunk)
+
+                current_state.update(batch_state)
+                inserted_count += len(inserted)
+                updated_count += len(updated)
+
+            _, _, deleted = diff_table_state(previous_state, current_state)
+            deleted_keys = [decode_key(key) for key in deleted]
+            for chunk in chunk_list(deleted_keys, NODE_BATCH_SIZE):
+                execute_timed_write(session, delete_batch_nodes, label, label, key_property, chunk)
+
+            # Save the state after each table, so an interrupted sync resumes where it stopped
+            state[table_name] = current_state
+            save_sync_state(state)
+            print(f"{table_name}: {inserted_count} inserted, {updated_count} updated, {len(deleted)} deleted")
+
+        # Create the inserted relationships, delete the removed ones
+        relationship_states = {row[0]: {} for row in RELATIONSHIP_TABLES}
+        relationship_states["genre.genre_type_id"] = {}
+        for table_name, relationship_rows in stream_relationships():
+            previous_state = state.get(table_name, {})
+            batch_state = get_relationship_state(relationship_rows)
+            inserted, _, _ = diff_table_state(previous_state, batch_state)
+
+            load_relationships(session, [tuple(decode_key(key)) for key in inserted])
+            relationship_states[table_name].update(batch_state)
+
+        for table_name, current_state in relationship_states.items():
+            previous_state = state.get(table_name, {})
+            inserted, _, deleted = diff_table_state(previous_state, current_state)
+
+            load_relationships(session, [tuple(decode_key(key)) for key in deleted], write_function=delete_batch_relationships)
+
+            state[table_name] = current_state
+            save_sync_state(state)
+            print(f"{table_name}: {len(inserted)} inserted, {len(deleted)} deleted")
+
+        # Invalidate the cached pages of the web app
+        session.execute_write(bump_graph_version)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transfers data from the neon database to the neo4j database.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only transfer the rows that changed since the last run, instead of reloading the graph")
+    args = parser.parse_args()
+
+    metrics.start("neon_to_neo4j_dynamic incremental" if args.incremental else "neon_to_neo4j_dynamic")
     try:
-        transfer_data()
-        print("Data transfer successful")
+        if args.incremental:
+            sync_data()
+            print("Data sync successful")
+        else:
+            transfer_data()
+            print("Data transfer successful")
     finally:
-        neo4j_driver.close()
\ No newline at end of file
+        neo4j_driver.close()
+        close_neon_pool()
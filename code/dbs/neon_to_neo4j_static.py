@@ -1,22 +1,18 @@
 import os
-import psycopg2
+import sys
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
+from provision_schema import provision_schema
+from graph_version import bump_graph_version
+from neon_reader import fetch_data_from_neon, close_neon_pool
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.metrics import metrics
 
 # Load environment variables
 load_dotenv()
 
 
-# Connect to neon database 
-neon_connection = psycopg2.connect(
-    database=os.getenv("DB_NAME"),
-    user=os.getenv("DB_USER"),
-    password=os.getenv("DB_PASSWORD"),
-    host=os.getenv("DB_HOST")
-)
-neon_cursor = neon_connection.cursor()
-
-
 # Connect to neo4j database
 neo4j_driver = GraphDatabase.driver(
     os.getenv("NEO4J_URI"),
@@ -24,12 +20,11 @@ neo4j_driver = GraphDatabase.driver(
 )
 
 
-# Function to create nodes in Neo4j 
+# Function to create nodes in Neo4j, the first property is the unique key of the node
 def create_node(tx, label, properties):
-    query = f"MERGE (n:{label} {{" # Using MERGE to avoid creating duplicate relationships
-    query += ", ".join([f"{key}: ${key}" for key in properties.keys()])
-    query += "})"
-    tx.run(query, **properties)
+    key = next(iter(properties))
+    query = f"MERGE (n:{label} {{{key}: ${key}}}) SET n += $properties" # Using MERGE to avoid creating duplicate nodes
+    tx.run(query, properties=properties, **{key: properties[key]})
 
 
 # Function to create relationships in Neo4j
@@ -42,103 +37,77 @@ def create_relationship(tx, node1_label, node1_property, node2_label, node2_prop
 
 
 
-# Function to fetch data from neon database
-def fetch_data_from_neon(table_name, columns):
-
-    # Connect to neon database inside the function to create a new session each time
-    # This prevents the connection from being closed after five minutes of inactivity
-    neon_connection = psycopg2.connect(
-        database=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        host=os.getenv("DB_HOST"),
-    )
-    neon_cursor = neon_connection.cursor()
-    
-    column_list = ", ".join(columns)
-    query = f"SELECT {column_list} FROM {table_name}"
-    neon_cursor.execute(query)
-    data = neon_cursor.fetchall()
-
-    neon_cursor.close()
-    neon_connection.close()
-
-    return data
+# Function to write rows one transaction each, the time and number of rows are recorded in the metrics
+def write_rows(session, write_function, name, rows, get_arguments):
+    with metrics.timer("neo4j_write", function=write_function.__name__, name=name):
+        for row in rows:
+            session.execute_write(write_function, *get_arguments(row))
+    metrics.increment("rows", len(rows), stage="neo4j_write", function=write_function.__name__, name=name)
 
 
 # Function to transfer data from neon to neo4j
 def transfer_data_dynamically():
     with neo4j_driver.session() as session:
-        
+
+        # Create the constraints and indexes before any node is written
+        provision_schema(session)
+
         # Transfer data for companies
         companies = fetch_data_from_neon("company", ["company_id", "company_name"])
-        for company in companies:
-            session.execute_write(
-                create_node, "Company", {"company_id": company[0], "name": company[1]}
-            )
+        write_rows(session, create_node, "Company", companies,
+                   lambda company: ("Company", {"company_id": company[0], "name": company[1]}))
 
         # Transfer data for games
         games = fetch_data_from_neon("game", ["game_id", "title", "score", "release_date"])
-        for game in games:
-            session.execute_write(
-                create_node, "Game", {"game_id": game[0], "name": game[1], "score": game[2], "release_date": game[3]}
-            )
+        write_rows(session, create_node, "Game", games,
+                   lambda game: ("Game", {"game_id": game[0], "name": game[1], "score": game[2], "release_date": game[3]}))
 
         # Transfer data for genres
         genres = fetch_data_from_neon("genre", ["genre_id", "genre_type_id", "name"]) #  TODO: Description is left out, maybe add it?
-        for genre in genres:
-            session.execute_write(
-                create_node, "Genre", {"genre_id": genre[0], "genre_type_id": genre[1], "name": genre[2]}
-            )
+        write_rows(session, create_node, "Genre", genres,
+                   lambda genre: ("Genre", {"genre_id": genre[0], "genre_type_id": genre[1], "name": genre[2]}))
 
         # Transfer data for genres types
         genre_types = fetch_data_from_neon("genre_type", ["genre_type_id", "name"])
-        for genre_type in genre_types:
-            session.execute_write(
-                create_node, "GenreType", {"genre_type_id": genre_type[0], "name": genre_type[1]}
-            )
+        write_rows(session, create_node, "GenreType", genre_types,
+                   lambda genre_type: ("GenreType", {"genre_type_id": genre_type[0], "name": genre_type[1]}))
 
         # Transfer data for platforms
         platforms = fetch_data_from_neon("platform", ["platform_id", "name"])
-        for platform in platforms:
-            session.execute_write(
-                create_node, "Platform", {"platform_id": platform[0], "name": platform[1]}
-            )
+        write_rows(session, create_node, "Platform", platforms,
+                   lambda platform: ("Platform", {"platform_id": platform[0], "name": platform[1]}))
 
         # TODO: Maybe rename the relationship to "DEVELOPED_BY" or "PUBLISHED_BY", to fit the other relationships?
         # Link games to companies using the bridge table
         games_companies = fetch_data_from_neon("games_companies", ["game_id", "company_id", "type"])
-        for game_company in games_companies:
-            session.execute_write(
-                create_relationship, "Game", ("game_id", game_company[0]), "Company", ("company_id", game_company[1]), game_company[2] 
-            )
+        write_rows(session, create_relationship, "games_companies", games_companies,
+                   lambda game_company: ("Game", ("game_id", game_company[0]), "Company", ("company_id", game_company[1]), game_company[2]))
 
         # Link games to genres using the bridge table
         games_genres = fetch_data_from_neon("games_genres", ["game_id", "genre_id"])
-        for game_genre in games_genres:
-            session.execute_write(
-                create_relationship, "Game", ("game_id", game_genre[0]), "Genre", ("genre_id", game_genre[1]), "HAS_GENRE"
-            )
+        write_rows(session, create_relationship, "HAS_GENRE", games_genres,
+                   lambda game_genre: ("Game", ("game_id", game_genre[0]), "Genre", ("genre_id", game_genre[1]), "HAS_GENRE"))
 
         # Link games to platforms using the bridge table
         games_platforms = fetch_data_from_neon("games_platforms", ["game_id", "platform_id"])
-        for game_platform in games_platforms:
-            session.execute_write(
-                create_relationship, "Game", ("game_id", game_platform[0]), "Platform", ("platform_id", game_platform[1]), "AVAILABLE_ON"
-            )
+        write_rows(session, create_relationship, "AVAILABLE_ON", games_platforms,
+                   lambda game_platform: ("Game", ("game_id", game_platform[0]), "Platform", ("platform_id", game_platform[1]), "AVAILABLE_ON"))
 
         # Link genres to genre types
         genres = fetch_data_from_neon("genre", ["genre_id", "genre_type_id"])
-        for genre in genres:
-            session.execute_write(
-                create_relationship, "Genre", ("genre_id", genre[0]), "GenreType", ("genre_type_id", genre[1]), "IS_TYPE"
-            )
+        write_rows(session, create_relationship, "IS_TYPE", genres,
+                   lambda genre: ("Genre", ("genre_id", genre[0]), "GenreType", ("genre_type_id", genre[1]), "IS_TYPE"))
+
+        # Invalidate the cached pages of the web app
+        session.execute_write(bump_graph_version)
 
 
 # run the script
 if __name__ == "__main__":
+    metrics.start("neon_to_neo4j_static")
     try:
         transfer_data_dynamically()
         print("Data transfer successful")
     finally:
-        neo4j_driver.close()
\ No newline at end of file
+        neo4j_driver.close()
+        close_neon_pool()
\ No newline at end of file
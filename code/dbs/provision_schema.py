@@ -0,0 +1,80 @@
+from schema_definitions import TABLES, INDEXES
+
+
+def get_node_property(label, column, mapping=None):
+    """
+    Gets the name of the node property that stores the given column. If a 
+    schema mapping is given, the column is translated to its mapped property.
+
+    Parameters:
+        label (str): The label of the node.
+        column (str): The column of the relational database.
+        mapping (dict): The optional schema mapping {Label: {Property: Column}}.
+
+    Returns:
+        str: The name of the node property.
+    """
+    if mapping and label in mapping:
+        for key, schema_key in mapping[label].items():
+            if schema_key == column:
+                return key
+
+    return column
+
+def create_unique_constraint(tx, label, key_property):
+    """
+    Creates a uniqueness constraint on the key property of a label, if it 
+    does not exist yet. The constraint is backed by an index, so matching 
+    nodes by their key does not require a label scan.
+
+    Parameters:
+        tx (neo4j.Session): The Neo4j transaction.
+        label (str): The label of the nodes.
+        key_property (str): The key property of the nodes.
+
+    Returns:
+        None
+    """
+    tx.run(f"CREATE CONSTRAINT {label.lower()}_{key_property}_unique IF NOT EXISTS "
+           f"FOR (n:{label}) REQUIRE n.{key_property} IS UNIQUE")
+
+def create_lookup_index(tx, label, node_property):
+    """
+    Creates an index on a property of a label, if it does not exist yet.
+
+    Parameters:
+        tx (neo4j.Session): The Neo4j transaction.
+        label (str): The label of the nodes.
+        node_property (str): The property to index.
+
+    Returns:
+        None
+    """
+    tx.run(f"CREATE INDEX {label.lower()}_{node_property}_index IF NOT EXISTS "
+           f"FOR (n:{label}) ON (n.{node_property})")
+
+def provision_schema(session, mapping=None):
+    """
+    Creates the constraints and indexes defined by TABLES and INDEXES. The 
+    first column of each table is used as the key property of its label. 
+    Safe to run before every transfer, since existing constraints and indexes
+    are left untouched.
+
+    Parameters:
+        session (neo4j.Session): The Neo4j session.
+        mapping (dict): The optional schema mapping {Label: {Property: Column}}.
+
+    Returns:
+        None
+    """
+    # Schema changes can not be mixed with data changes, so each runs in its own transaction
+    for table_name, columns, label in TABLES:
+        key_property = get_node_property(label, columns[0], mapping)
+        session.execute_write(create_unique_constraint, label, key_property)
+
+    for label, column in INDEXES:
+        node_property = get_node_property(label, column, mapping)
+        session.execute_write(create_lookup_index, label, node_property)
+
+    # Wait until all indexes are online, otherwise the first writes would still scan
+    session.run("CALL db.awaitIndexes()").consume()
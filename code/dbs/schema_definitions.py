@@ -12,4 +12,18 @@ RELATIONSHIP_TABLES = [
     ("games_companies", ["game_id", "company_id", "type"], "Game", "Company", "identifier", None),
     ("games_genres", ["game_id", "genre_id"], "Game", "Genre", "identifier", "HAS_GENRE"),
     ("games_platforms", ["game_id", "platform_id"], "Game", "Platform", "identifier", "AVAILABLE_ON"),
-]
\ No newline at end of file
+]
+
+# Additional lookup indexes on the nodes [Label, Column]
+INDEXES = [
+    ("Game", "name")  # Used to find games by name in the web app
+]
+
+# Mapping from the node properties (schema.org) to the columns of the relational database {Label: {Property: Column}}
+SCHEMA_MAPPING = {
+    "Company": {"identifier": "company_id", "name": "name"},
+    "Game": {"identifier": "game_id", "name": "name", "aggregateRating": "score", "datePublished": "release_date"},
+    "Genre": {"identifier": "genre_id", "name": "name"},
+    "GenreType": {"identifier": "genre_type_id", "name": "name"},
+    "Platform": {"identifier": "platform_id", "name": "name"}
+}
@@ -0,0 +1,97 @@
+import os
+import json
+import hashlib
+
+# Local file that stores the state of the last sync {Table: {Key: Hash}}
+SYNC_STATE_FILE = os.getenv("SYNC_STATE_FILE", "neo4j_sync_state.json")
+
+
+def load_sync_state(path=SYNC_STATE_FILE):
+    """
+    Loads the state of the last sync. Returns an empty state if no sync has 
+    been recorded yet, so the first sync transfers every row.
+
+    Parameters:
+        path (str): The path of the state file.
+
+    Returns:
+        dict: The state of the last sync {Table: {Key: Hash}}.
+    """
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, "r") as state_file:
+        return json.load(state_file)
+
+def save_sync_state(state, path=SYNC_STATE_FILE):
+    """
+    Saves the state of the sync. The file is replaced atomically, so an 
+    interrupted sync never leaves a half-written state behind.
+
+    Parameters:
+        state (dict): The state of the sync {Table: {Key: Hash}}.
+        path (str): The path of the state file.
+
+    Returns:
+        None
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as state_file:
+        json.dump(state, state_file)
+    os.replace(temp_path, path)
+
+def encode_key(key):
+    """
+    Encodes a key as a string, since the keys of the state file must be 
+    strings. The key can be restored with decode_key.
+
+    Parameters:
+        key (any): The key of a row, e.g. an id or a list of ids.
+
+    Returns:
+        str: The encoded key.
+    """
+    return json.dumps(key, default=str)
+
+def decode_key(encoded_key):
+    """
+    Decodes a key that was encoded with encode_key.
+
+    Parameters:
+        encoded_key (str): The encoded key.
+
+    Returns:
+        any: The key of the row.
+    """
+    return json.loads(encoded_key)
+
+def hash_row(row):
+    """
+    Creates a content hash of a row, to detect if it changed since the last sync.
+
+    Parameters:
+        row (dict): The data of the row.
+
+    Returns:
+        str: The hash of the row.
+    """
+    content = json.dumps(row, sort_keys=True, default=str)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+def diff_table_state(previous_state, current_state):
+    """
+    Compares the state of a table from the last sync with its current state.
+
+    Parameters:
+        previous_state (dict): The state of the last sync {Key: Hash}.
+        current_state (dict): The current state {Key: Hash}.
+
+    Returns:
+        tuple: The encoded keys of the (inserted, updated, deleted) rows.
+    """
+    inserted = [key for key in current_state if key not in previous_state]
+    updated = [key for key, row_hash in current_state.items()
+               if key in previous_state and previous_state[key] != row_hash]
+    deleted = [key for key in previous_state if key not in current_state]
+
+    return inserted, updated, deleted
@@ -0,0 +1,282 @@
+import os
+import sys
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from schema_definitions import TABLES, RELATIONSHIP_TABLES, SCHEMA_MAPPING
+from provision_schema import provision_schema, get_node_property
+from neon_reader import MAX_CONNECTIONS, close_neon_pool
+from sync_state import save_sync_state
+from graph_version import bump_graph_version
+from neon_to_neo4j_dynamic import (
+    neo4j_driver, delete_all_nodes, create_batch_nodes, execute_timed_write, load_relationships, stream_nodes,
+    stream_relationship_table, stream_genre_type_relationships, get_node_state, get_relationship_state
+)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.metrics import metrics
+
+# Number of batches that may wait between the reader and the writer of a table
+QUEUE_SIZE = int(os.getenv("TRANSFER_QUEUE_SIZE", 4))
+
+# Number of tables loaded at the same time, each worker holds one neon connection while reading
+NODE_WORKERS = int(os.getenv("TRANSFER_NODE_WORKERS", 4))
+RELATIONSHIP_WORKERS = int(os.getenv("TRANSFER_RELATIONSHIP_WORKERS", 4))
+
+# Seconds a reader waits for room in a full queue before it checks whether the writer stopped
+PUT_TIMEOUT = 0.5
+
+# Marks the end of the batches in a queue
+END_OF_BATCHES = object()
+
+
+class TransferStats:
+    """
+    Collects the number of rows and the time spent per stage, e.g. reading 
+    or writing a table. Safe to use from several threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.start_time = time.perf_counter()
+
+    def add(self, stage, rows, seconds):
+        """
+        Adds processed rows and the time spent on them to a stage.
+
+        Parameters:
+            stage (str): The name of the stage.
+            rows (int): The number of processed rows.
+            seconds (float): The time spent on the rows.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            stage_rows, stage_seconds = self.stages.get(stage, (0, 0.0))
+            self.stages[stage] = (stage_rows + rows, stage_seconds + seconds)
+
+    def report(self):
+        """
+        Prints the rows and rows per second of each stage.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        print(f"{'Stage':<36} {'Rows':>10} {'Seconds':>10} {'Rows/sec':>12}")
+        with self.lock:
+            for stage, (rows, seconds) in sorted(self.stages.items()):
+                rows_per_second = rows / seconds if seconds else 0.0
+                print(f"{stage:<36} {rows:>10} {seconds:>10.2f} {rows_per_second:>12.1f}")
+        print(f"Total wall time: {time.perf_counter() - self.start_time:.2f} seconds")
+
+def put_batch(batch_queue, item, stop):
+    """
+    Puts an item into a queue, blocks while the queue is full until the 
+    writer takes a batch or stops.
+
+    Parameters:
+        batch_queue (queue.Queue): The queue to put the item into.
+        item (object): The batch, END_OF_BATCHES or an error.
+        stop (threading.Event): Set once the writer stopped.
+
+    Returns:
+        bool: Whether the item was put into the queue.
+    """
+    while not stop.is_set():
+        try:
+            batch_queue.put(item, timeout=PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def read_batches(batches, batch_queue, stats, stage, stop):
+    """
+    Reads batches and puts them into a queue, runs in its own thread. Errors
+    are passed through the queue, so the writer can raise them. Stops once 
+    the writer stopped and closes the batches, so their neon connection is 
+    returned to the pool.
+
+    Parameters:
+        batches (generator): The batches to read.
+        batch_queue (queue.Queue): The queue to put the batches into.
+        stats (TransferStats): The stats to record the reading time in.
+        stage (str): The name of the reading stage.
+        stop (threading.Event): Set once the writer stopped.
+
+    Returns:
+        None
+    """
+    try:
+        start = time.perf_counter()
+        for batch in batches:
+            stats.add(stage, len(batch), time.perf_counter() - start)
+            # Blocks while the queue is full, so the reader never runs too far ahead
+            if not put_batch(batch_queue, batch, stop):
+                return
+            start = time.perf_counter()
+        put_batch(batch_queue, END_OF_BATCHES, stop)
+    except Exception as e:
+        put_batch(batch_queue, e, stop)
+    finally:
+        # Closes the server-side cursor and returns the connection, also if the writer stopped early
+        batches.close()
+
+def run_pipeline(batches, write_batch, stats, name):
+    """
+    Reads batches in a background thread while writing them in the current 
+    thread, connected by a bounded queue. If writing fails, the reader is 
+    stopped before the error is raised.
+
+    Parameters:
+        batches (generator): The batches to read.
+        write_batch (function): The function that writes a batch.
+        stats (TransferStats): The stats to record the times in.
+        name (str): The name of the table, used for the stage names.
+
+    Returns:
+        None
+    """
+    batch_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    stop = threading.Event()
+    reader = threading.Thread(target=read_batches, args=(batches, batch_queue, stats, f"read {name}", stop), daemon=True)
+    reader.start()
+
+    try:
+        while True:
+            batch = batch_queue.get()
+            if batch is END_OF_BATCHES:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+
+            start = time.perf_counter()
+            write_batch(batch)
+            stats.add(f"write {name}", len(batch), time.perf_counter() - start)
+    finally:
+        stop.set()
+        reader.join()
+
+def load_label(table_name, columns, label, stats):
+    """
+    Replaces all nodes of a label with the rows of its table.
+
+    Parameters:
+        table_name (str): The name of the table to fetch data from.
+        columns (list): The columns to fetch data from.
+        label (str): The label of the nodes.
+        stats (TransferStats): The stats to record the times in.
+
+    Returns:
+        dict: The sync state of the nodes {Key: Hash}.
+    """
+    key_property = get_node_property(label, columns[0], SCHEMA_MAPPING)
+    state = {}
+
+    with neo4j_driver.session() as session:
+        session.execute_write(delete_all_nodes, label)
+
+        def write_batch(data_list):
+            execute_timed_write(session, create_batch_nodes, label, label, data_list)
+            state.update(get_node_state(label, key_property, data_list))
+
+        run_pipeline(stream_nodes(table_name, columns, label), write_batch, stats, table_name)
+
+    return state
+
+def load_relationship_table(table_name, batches, node_futures, stats):
+    """
+    Loads the relationships of a table, as soon as the nodes of both labels 
+    are committed.
+
+    Parameters:
+        table_name (str): The name of the table, used for the stage names.
+        batches (generator): The batches of relationship rows.
+        node_futures (list): The futures of the labels the relationships connect.
+        stats (TransferStats): The stats to record the times in.
+
+    Returns:
+        dict: The sync state of the relationships {Key: Hash}.
+    """
+    # Raises the error of a failed label, the relationships would have no nodes to connect
+    try:
+        for future in node_futures:
+            future.result()
+    except Exception:
+        batches.close()
+        raise
+
+    state = {}
+
+    with neo4j_driver.session() as session:
+        def write_batch(relationship_rows):
+            load_relationships(session, relationship_rows)
+            state.update(get_relationship_state(relationship_rows))
+
+        run_pipeline(batches, write_batch, stats, table_name)
+
+    return state
+
+def transfer_data_pipelined():
+    """
+    Transfers data from the neon database to the neo4j database. Reading and
+    writing of each table overlap, the labels are loaded in parallel and the
+    relationships of a table are loaded once both of their labels are done.
+
+    Parameters:
+        None
+
+    Returns:
+        None
+    """
+    if NODE_WORKERS + RELATIONSHIP_WORKERS > MAX_CONNECTIONS:
+        raise ValueError(f"{NODE_WORKERS + RELATIONSHIP_WORKERS} workers need more than the {MAX_CONNECTIONS} neon connections")
+
+    stats = TransferStats()
+
+    with neo4j_driver.session() as session:
+        # Create the constraints and indexes before any node is written
+        provision_schema(session, SCHEMA_MAPPING)
+
+    with ThreadPoolExecutor(NODE_WORKERS) as node_pool, ThreadPoolExecutor(RELATIONSHIP_WORKERS) as relationship_pool:
+        node_futures = {}
+        for table_name, columns, label in TABLES:
+            node_futures[label] = (table_name, node_pool.submit(load_label, table_name, columns, label, stats))
+
+        relationship_futures = {}
+        for row in RELATIONSHIP_TABLES:
+            table_name, columns, table1, table2, column, type = row
+            relationship_futures[table_name] = relationship_pool.submit(
+                load_relationship_table, table_name, stream_relationship_table(*row),
+                [node_futures[table1][1], node_futures[table2][1]], stats
+            )
+        relationship_futures["genre.genre_type_id"] = relationship_pool.submit(
+            load_relationship_table, "genre.genre_type_id", stream_genre_type_relationships(),
+            [node_futures["Genre"][1], node_futures["GenreType"][1]], stats
+        )
+
+        # Record the loaded rows, so later runs can use the incremental sync
+        state = {table_name: future.result() for table_name, future in node_futures.values()}
+        state.update({table_name: future.result() for table_name, future in relationship_futures.items()})
+
+    with neo4j_driver.session() as session:
+        # Invalidate the cached pages of the web app
+        session.execute_write(bump_graph_version)
+
+    save_sync_state(state)
+    stats.report()
+
+if __name__ == "__main__":
+    metrics.start("transfer_engine")
+    try:
+        transfer_data_pipelined()
+        print("Data transfer successful")
+    finally:
+        neo4j_driver.close()
+        close_neon_pool()
@@ -0,0 +1,40 @@
+import re
+import lxml.html
+
+COMPANY_LINK_PATTERN = re.compile(r'/company/(\d+)/')
+
+
+def extract_companies_fast(html_content):
+    """
+    Extract the developers and publishers of a game page with lxml. Same 
+    result as extract_companies, without building a BeautifulSoup tree.
+
+    :param html_content: HTML string
+    :return: Set of (company ID, company name, role) tuples, the name is None for links without text
+    """
+    tree = lxml.html.fromstring(html_content)
+
+    companies = set()
+    for section, role in (('Developers', 'developer'), ('Publishers', 'publisher')):
+        # Links in the <dd> element that follows the section's <dt> element
+        links = tree.xpath(f"//dt[normalize-space()='{section}'][1]/following-sibling::dd[1]//a")
+
+        for link in links:
+            match = COMPANY_LINK_PATTERN.search(link.get('href', ''))
+            if match:
+                companies.add((match.group(1), link.text_content().strip() or None, role))
+
+    return companies
+
+def extract_company_name_fast(html_content):
+    """
+    Extract the company name of a company page with lxml. Same result as 
+    extract_company_name, without building a BeautifulSoup tree.
+
+    :param html_content: HTML string
+    :return: Name of the company, None if the page has no name
+    """
+    tree = lxml.html.fromstring(html_content)
+    headings = tree.xpath("//h1[contains(concat(' ', normalize-space(@class), ' '), ' mb-0 ')]")
+
+    return headings[0].text_content().strip() if headings else None
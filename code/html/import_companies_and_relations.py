@@ -1,54 +1,46 @@
-import requests
 import psycopg2
 from dotenv import load_dotenv
 import os
+import sys
 import json
 from time import sleep
 from bs4 import BeautifulSoup
 import re
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.http_cache import cached_get
+from common.metrics import metrics
+
 SLEEP_DURATION = 0.1
 API_URL = 'https://mobygames.com/game/'
 FETCH_LIMIT = 1000
 
-def extract_company_ids(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
-
-
-    # Find the 'Developers' section specifically
-    developers_dt = soup.find('dt', string='Developers')
-    developer_ids = set()
-
-    if developers_dt:
-        # Find the developer links in the next <dd> element
-        developers_dd = developers_dt.find_next_sibling('dd')
-
-        if developers_dd:
-            # Find all developer links
-            developer_links = developers_dd.find_all('a', href=re.compile(r'/company/\d+/'))
+def extract_companies(html_content):
+    """
+    Extract the developers and publishers of a game page together with the 
+    names in their links, so the companies need no request of their own.
 
-            for developer_link in developer_links:
-                match = re.search(r'/company/(\d+)/', developer_link.get('href', ''))
-                developer_id = match.group(1) if match else None
-                developer_ids.add(developer_id)
+    :param html_content: HTML string
+    :return: Set of (company ID, company name, role) tuples, the name is None for links without text
+    """
+    soup = BeautifulSoup(html_content, 'html.parser')
 
-    # Find the 'Publishers' section
-    publishers_dt = soup.find('dt', string='Publishers')
-    publisher_ids = set()
-    if publishers_dt:
-        # Find the developer links in the next <dd> element
-        publishers_dd = publishers_dt.find_next_sibling('dd')
+    companies = set()
+    for section, role in (('Developers', 'developer'), ('Publishers', 'publisher')):
+        section_dt = soup.find('dt', string=section)
+        if not section_dt:
+            continue
 
-        if publishers_dd:
-                # Find all developer links
-            publisher_links = publishers_dd.find_all('a', href=re.compile(r'/company/\d+/'))
+        # Find the company links in the next <dd> element
+        section_dd = section_dt.find_next_sibling('dd')
+        if not section_dd:
+            continue
 
-            for publisher_link in publisher_links:
-                match = re.search(r'/company/(\d+)/', publisher_link.get('href', ''))
-                publisher_id = match.group(1) if match else None
-                publisher_ids.add(publisher_id)
+        for company_link in section_dd.find_all('a', href=re.compile(r'/company/\d+/')):
+            match = re.search(r'/company/(\d+)/', company_link.get('href', ''))
+            companies.add((match.group(1), company_link.get_text(strip=True) or None, role))
 
-    return [developer_ids, publisher_ids]
+    return companies
 
 def parse_html_from_url(url):
     """
@@ -57,18 +49,20 @@ def parse_html_from_url(url):
     :param url: URL of the webpage
     :return: Extracted game information
     """
-    # Send a request to the URL
-    response = requests.get(url)
+    # Send a request to the URL, pages that were already downloaded are read from the cache
+    response = cached_get(url)
 
     # Check if the request was successful
     if response.status_code == 200:
-        return extract_company_ids(response.text)
+        with metrics.timer('html_parse'):
+            return extract_companies(response.text)
     else:
         print(f"Failed to retrieve the webpage. Status code: {response.status_code}")
         return None
 
 def main():
     load_dotenv()
+    metrics.start('import_companies_and_relations')
 
     connection = psycopg2.connect(
         database=os.getenv("DB_NAME"),
@@ -84,16 +78,21 @@ def main():
 
 
     for id in game_ids:
-        company_ids = parse_html_from_url(API_URL+str(id[0]))
-        for developer_id in company_ids[0]:
-            cursor.execute('''INSERT INTO company (company_id) VALUES (%s) ON CONFLICT DO NOTHING''', (developer_id,))
-            cursor.execute('''INSERT INTO games_companies (game_id, company_id, type) VALUES (%s, %s, %s) ON CONFLICT DO NOTHING''', (id[0], developer_id, 'developer'))
-        for publisher_id in company_ids[1]:
-            cursor.execute('''INSERT INTO company (company_id) VALUES (%s) ON CONFLICT DO NOTHING''', (publisher_id,))
-            cursor.execute('''INSERT INTO games_companies (game_id, company_id, type) VALUES (%s, %s, %s) ON CONFLICT DO NOTHING''', (id[0], publisher_id, 'publisher'))
-        connection.commit()
+        companies = parse_html_from_url(API_URL+str(id[0]))
+        if companies is None:
+            continue
+        for company_id, company_name, role in companies:
+            # The name comes with the link, import_company_names.py only backfills companies without one
+            cursor.execute('''INSERT INTO company (company_id, company_name) VALUES (%s, %s)
+                              ON CONFLICT (company_id) DO UPDATE SET company_name = COALESCE(EXCLUDED.company_name, company.company_name)''',
+                           (company_id, company_name))
+            cursor.execute('''INSERT INTO games_companies (game_id, company_id, type) VALUES (%s, %s, %s) ON CONFLICT DO NOTHING''', (id[0], company_id, role))
+        with metrics.timer('db_commit'):
+            connection.commit()
+        metrics.increment('rows', stage='game_companies')
         print(id[0])
-        sleep(SLEEP_DURATION)
+        with metrics.timer('rate_limit_wait'):
+            sleep(SLEEP_DURATION)
     connection.close()
 
 
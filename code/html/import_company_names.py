@@ -1,23 +1,17 @@
-import requests
 import psycopg2
 from dotenv import load_dotenv
 import os
+import sys
 import json
 from time import sleep
 from bs4 import BeautifulSoup
 
-load_dotenv()
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.http_cache import cached_get
+from common.metrics import metrics
 
 API_URL = 'https://mobygames.com/company/'
 
-connection = psycopg2.connect(
-            database=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-        )
-cursor = connection.cursor()
-
 def extract_company_name(html_content):
     """
     Extract all developers' names, IDs, and URLs from the given HTML content.
@@ -33,19 +27,40 @@ def extract_company_name(html_content):
 
     return company_name
 
-cursor.execute('''SELECT company_id FROM company WHERE company_name is null''')
-missing_company_ids = cursor.fetchall()
+def main():
+    load_dotenv()
+    metrics.start('import_company_names')
+
+    connection = psycopg2.connect(
+                database=os.getenv("DB_NAME"),
+                user=os.getenv("DB_USER"),
+                password=os.getenv("DB_PASSWORD"),
+                host=os.getenv("DB_HOST"),
+            )
+    cursor = connection.cursor()
+
+    # The names are stored while scraping the game pages, only companies that never had a name are left
+    cursor.execute('''SELECT company_id FROM company WHERE company_name is null''')
+    missing_company_ids = cursor.fetchall()
+
+    for id in missing_company_ids:
+        response = cached_get(API_URL+str(id[0]))
+
+        # Check if the request was successful
+        if response.status_code == 200:
+            with metrics.timer('html_parse'):
+                company_name = extract_company_name(response.text)
+            cursor.execute('''UPDATE company SET company_name = %s WHERE company_id = %s''',(company_name, id[0]))
+            with metrics.timer('db_commit'):
+                connection.commit()
+            metrics.increment('rows', stage='company_names')
+            print(f'ID: {id[0]} | Name: {company_name}')
 
-for id in missing_company_ids:
-    response = requests.get(API_URL+str(id[0]))
+        else:
+            print(f"Failed to retrieve the webpage for ID {id[0]}. Status code: {response.status_code}")
+    connection.close()
 
-    # Check if the request was successful
-    if response.status_code == 200:
-        company_name = extract_company_name(response.text)
-        cursor.execute('''UPDATE company SET company_name = %s WHERE company_id = %s''',(company_name, id[0]))
-        connection.commit()
-        print(f'ID: {id[0]} | Name: {company_name}')
 
-    else:
-        print(f"Failed to retrieve the webpage for ID {id[0]}. Status code: {response.status_code}")
-connection.close()
\ No newline at end of file
+# Allows the script to be imported without running main()
+if __name__ == '__main__':
+    main()
\ No newline at end of file
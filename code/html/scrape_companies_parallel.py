@@ -0,0 +1,269 @@
+import requests
+import psycopg2
+from dotenv import load_dotenv
+import os
+import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from requests.adapters import HTTPAdapter
+from company_parsing import extract_companies_fast, extract_company_name_fast
+from import_companies_and_relations import API_URL as GAME_URL, FETCH_LIMIT
+from import_company_names import API_URL as COMPANY_URL
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.bulk_load import bulk_insert
+from common.rate_limit import HostRateLimiter, SharedRateLimiter
+from common.http_cache import cached_get
+from common.metrics import metrics
+from common.job_queue import JobQueue
+
+# Requests per second per host, the serial scrapers sleep 0.1 seconds between requests
+REQUESTS_PER_SECOND = float(os.getenv('SCRAPE_REQUESTS_PER_SECOND', 10))
+MAX_WORKERS = 8
+
+# Number of pages fetched, parsed and committed together
+CHUNK_SIZE = 50
+
+# Name of the job queue and the query that seeds it per mode
+QUEUES = {
+    'games': ('games_companies', '''SELECT game_id FROM game g WHERE NOT EXISTS (SELECT 1 FROM games_companies c WHERE c.game_id = g.game_id)'''),
+    'names': ('company_names', '''SELECT company_id FROM company WHERE company_name is null'''),
+}
+
+
+def create_session(workers):
+    """
+    Create a HTTP session whose connection pool fits the number of workers.
+
+    :param workers: Number of threads sharing the session
+    :return: HTTP session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def fetch_page(session, rate_limiter, url):
+    """
+    Fetch a page within the rate limit of its host. Pages in the cache are 
+    served without a request and do not count against the rate limit.
+
+    :param session: Shared HTTP session
+    :param rate_limiter: Rate limiter per host
+    :param url: URL of the page
+    :return: HTML of the page, None if the request failed
+    """
+    try:
+        response = cached_get(url, session=session, before_request=lambda: rate_limiter.acquire(url), timeout=30)
+    except requests.RequestException as e:
+        print(f"Failed to retrieve the webpage {url}. Error: {e}")
+        return None
+
+    if response.status_code != 200:
+        print(f"Failed to retrieve the webpage {url}. Status code: {response.status_code}")
+        return None
+
+    return response.text
+
+def scrape_pages(urls, parse_function, fetch_pool, parse_pool, session, rate_limiter):
+    """
+    Fetch pages on the thread pool and parse them, on the process pool if given.
+
+    :param urls: URLs of the pages
+    :param parse_function: Function that extracts the data of a page, must be picklable for the process pool
+    :param fetch_pool: Thread pool for the requests
+    :param parse_pool: Process pool for parsing, None to parse in the current process
+    :param session: Shared HTTP session
+    :param rate_limiter: Rate limiter per host
+    :return: Parsed data per URL, None for failed pages
+    """
+    with metrics.timer('fetch_chunk'):
+        pages = list(fetch_pool.map(lambda url: fetch_page(session, rate_limiter, url), urls))
+
+    fetched = [page for page in pages if page is not None]
+    metrics.increment('rows', len(fetched), stage='fetch')
+    metrics.increment('failed_pages', len(pages) - len(fetched))
+    with metrics.timer('html_parse_chunk'):
+        if parse_pool:
+            parsed = list(parse_pool.map(parse_function, fetched))
+        else:
+            parsed = list(map(parse_function, fetched))
+    parsed = iter(parsed)
+
+    return [next(parsed) if page is not None else None for page in pages]
+
+def scrape_game_chunk(cursor, chunk, fetch_pool, parse_pool, session, rate_limiter):
+    """
+    Scrape the developers and publishers of a chunk of games, with the 
+    company names found in their links. The caller commits.
+
+    :param cursor: Cursor of the database connection
+    :param chunk: IDs of the games
+    :param fetch_pool: Thread pool for the requests
+    :param parse_pool: Process pool for parsing, None to parse in the current process
+    :param session: Shared HTTP session
+    :param rate_limiter: Rate limiter per host
+    :return: Dict of the games whose page could not be scraped and the error
+    """
+    results = scrape_pages([GAME_URL + str(id) for id in chunk], extract_companies_fast,
+                           fetch_pool, parse_pool, session, rate_limiter)
+
+    named_companies = []
+    unnamed_companies = []
+    games_companies = []
+    for id, companies in zip(chunk, results):
+        if companies is None:
+            continue
+        for company_id, company_name, role in companies:
+            if company_name:
+                named_companies.append((company_id, company_name))
+            else:
+                unnamed_companies.append((company_id,))
+            games_companies.append((id, company_id, role))
+
+    # Names are upserted right away, the names mode only backfills companies without one
+    bulk_insert(cursor, 'company', ['company_id', 'company_name'], named_companies,
+                conflict_columns=['company_id'], update_columns=['company_name'])
+    bulk_insert(cursor, 'company', ['company_id'], unnamed_companies)
+    bulk_insert(cursor, 'games_companies', ['game_id', 'company_id', 'type'], games_companies)
+
+    return {id: 'Failed to retrieve the webpage' for id, companies in zip(chunk, results) if companies is None}
+
+def scrape_games(connection, limit, chunk_size, fetch_pool, parse_pool, session, rate_limiter):
+    """
+    Scrape the companies of the games after the last scraped game. Chunks 
+    are committed in order of the game IDs, so an interrupted run resumes 
+    from MAX(game_id) like the serial scraper.
+
+    :param connection: Database connection
+    :param limit: Maximum number of games to scrape
+    :param chunk_size: Number of games per commit
+    :param fetch_pool: Thread pool for the requests
+    :param parse_pool: Process pool for parsing, None to parse in the current process
+    :param session: Shared HTTP session
+    :param rate_limiter: Rate limiter per host
+    """
+    cursor = connection.cursor()
+    cursor.execute('''SELECT MAX(game_id) FROM games_companies''')
+    last_game_id = cursor.fetchone()[0]
+    cursor.execute('''SELECT game_id FROM game WHERE game_id > %s ORDER BY game_id  LIMIT %s''', (last_game_id, limit))
+    game_ids = [row[0] for row in cursor.fetchall()]
+
+    for start in range(0, len(game_ids), chunk_size):
+        chunk = game_ids[start:start + chunk_size]
+        scrape_game_chunk(cursor, chunk, fetch_pool, parse_pool, session, rate_limiter)
+        with metrics.timer('db_commit'):
+            connection.commit()
+        print(chunk[-1])
+
+def scrape_name_chunk(cursor, chunk, fetch_pool, parse_pool, session, rate_limiter):
+    """
+    Scrape the names of a chunk of companies. The caller commits.
+
+    :param cursor: Cursor of the database connection
+    :param chunk: IDs of the companies
+    :param fetch_pool: Thread pool for the requests
+    :param parse_pool: Process pool for parsing, None to parse in the current process
+    :param session: Shared HTTP session
+    :param rate_limiter: Rate limiter per host
+    :return: Dict of the companies without a name and the error
+    """
+    names = scrape_pages([COMPANY_URL + str(id) for id in chunk], extract_company_name_fast,
+                         fetch_pool, parse_pool, session, rate_limiter)
+
+    company_names = [(id, name) for id, name in zip(chunk, names) if name]
+    bulk_insert(cursor, 'company', ['company_id', 'company_name'], company_names,
+                conflict_columns=['company_id'], update_columns=['company_name'])
+    for id, name in company_names:
+        print(f'ID: {id} | Name: {name}')
+
+    return {id: 'No company name on the webpage' for id, name in zip(chunk, names) if not name}
+
+def scrape_company_names(connection, chunk_size, fetch_pool, parse_pool, session, rate_limiter):
+    """
+    Scrape the names of all companies without a name. The games mode already 
+    stores the names from the game pages, so only companies whose links had 
+    no text are left.
+
+    :param connection: Database connection
+    :param chunk_size: Number of companies per commit
+    :param fetch_pool: Thread pool for the requests
+    :param parse_pool: Process pool for parsing, None to parse in the current process
+    :param session: Shared HTTP session
+    :param rate_limiter: Rate limiter per host
+    """
+    cursor = connection.cursor()
+    cursor.execute('''SELECT company_id FROM company WHERE company_name is null''')
+    missing_company_ids = [row[0] for row in cursor.fetchall()]
+
+    for start in range(0, len(missing_company_ids), chunk_size):
+        chunk = missing_company_ids[start:start + chunk_size]
+        scrape_name_chunk(cursor, chunk, fetch_pool, parse_pool, session, rate_limiter)
+        with metrics.timer('db_commit'):
+            connection.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description='Scrape companies from MobyGames with concurrent requests.')
+    parser.add_argument('mode', choices=['games', 'names'],
+                        help='games: developers and publishers of the games with their names, names: backfill companies without a name')
+    parser.add_argument('--limit', type=int, default=FETCH_LIMIT, help='maximum number of games to scrape')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help='number of concurrent requests')
+    parser.add_argument('--parse-processes', type=int, default=0,
+                        help='number of processes for parsing, 0 parses in the main process')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='number of pages per commit')
+    parser.add_argument('--queue', action='store_true',
+                        help='claim the pages from the shared job queue, several processes can run at once and share the rate limit')
+    args = parser.parse_args()
+
+    load_dotenv()
+    metrics.start(f'scrape_companies_parallel {args.mode}')
+
+    connection = psycopg2.connect(
+        database=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST"),
+    )
+    session = create_session(args.workers)
+    limiter_connection = None
+    if args.queue:
+        # All --queue workers share the rate limit per host through the database
+        limiter_connection = psycopg2.connect(
+            database=os.getenv("DB_NAME"),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD"),
+            host=os.getenv("DB_HOST"),
+        )
+        rate_limiter = HostRateLimiter(REQUESTS_PER_SECOND,
+                                       create_bucket=lambda host: SharedRateLimiter(limiter_connection, f'scrape {host}', REQUESTS_PER_SECOND))
+    else:
+        rate_limiter = HostRateLimiter(REQUESTS_PER_SECOND)
+    parse_pool = ProcessPoolExecutor(args.parse_processes) if args.parse_processes else None
+
+    try:
+        with ThreadPoolExecutor(args.workers) as fetch_pool:
+            if args.queue:
+                # Every process claims its own chunks, the job is marked done in the same commit as its data
+                job_queue = JobQueue(QUEUES[args.mode][0])
+                job_queue.seed(connection, QUEUES[args.mode][1])
+                scrape_chunk = scrape_game_chunk if args.mode == 'games' else scrape_name_chunk
+                cursor = connection.cursor()
+                job_queue.run(connection, args.chunk_size,
+                              lambda chunk: scrape_chunk(cursor, chunk, fetch_pool, parse_pool, session, rate_limiter),
+                              args.limit if args.mode == 'games' else None)
+            elif args.mode == 'games':
+                scrape_games(connection, args.limit, args.chunk_size, fetch_pool, parse_pool, session, rate_limiter)
+            else:
+                scrape_company_names(connection, args.chunk_size, fetch_pool, parse_pool, session, rate_limiter)
+    finally:
+        if parse_pool:
+            parse_pool.shutdown()
+        if limiter_connection:
+            limiter_connection.close()
+        connection.close()
+
+
+# Allows the script to be imported without running main()
+if __name__ == '__main__':
+    main()
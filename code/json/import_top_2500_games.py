@@ -3,8 +3,14 @@ from dotenv import load_dotenv
 import os
 import json
 import re
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.bulk_load import bulk_insert
+from common.metrics import metrics
 
 load_dotenv()
+metrics.start('import_top_2500_games')
 
 connection = psycopg2.connect(
             database=os.getenv("DB_NAME"),
@@ -14,18 +20,22 @@ connection = psycopg2.connect(
         )
 cursor = connection.cursor()
 
-f = open('../../data/Top2500GamesbyRating.json')
-games_json = json.load(f)
+with metrics.timer('json_parse'):
+    f = open('../../data/Top2500GamesbyRating.json')
+    games_json = json.load(f)
 
+games = []
 for game in games_json:
     if re.search(r'^[12]\d{3}$', game['release_date']):
         game['release_date'] = game['release_date']+'-01-01'
     elif re.search(r'^[12]\d{3}-[0-3]\d$', game['release_date']):
         game['release_date'] = game['release_date']+'-01'
-    try:
-        cursor.execute('''INSERT INTO game (game_id, title, score, release_date) values (%s, %s, %s, %s)''', (game['id'], game['title'], game['moby_score'], game['release_date']))
-    except psycopg2.IntegrityError:
-        print(f'Game \'{game['title']}\' and game ID {game['id']} already exists in database.')
+    games.append((game['id'], game['title'], game['moby_score'], game['release_date']))
+
+# Load all games at once, games that already exist in the database are skipped
+inserted_games = bulk_insert(cursor, 'game', ['game_id', 'title', 'score', 'release_date'], games)
+print(f'{inserted_games} of {len(games)} games inserted, {len(games) - inserted_games} already exist in database.')
 
-connection.commit()
+with metrics.timer('db_commit'):
+    connection.commit()
 connection.close()
@@ -0,0 +1,369 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+import psycopg2
+from neo4j import GraphDatabase
+from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(CODE_DIR, '..', 'data')
+
+# Local file that stores every completed stage {Stage: {"fingerprint": Fingerprint, "completed_at": Timestamp}}
+PIPELINE_STATE_FILE = os.getenv('PIPELINE_STATE_FILE', os.path.join(CODE_DIR, 'pipeline_state.json'))
+
+MISSING_RESPONSES_QUERY = '''SELECT COUNT(*) FROM game g WHERE NOT EXISTS (SELECT 1 FROM game_api_response r WHERE r.game_id = g.game_id)'''
+
+# Stages of the pipeline. Every stage runs its script in the script's directory, since the
+# scripts open files relative to it. A stage reruns if a dependency ran or its fingerprint
+# changed: the command, its files, the results of its Postgres queries and Cypher queries.
+# Stages that read from MobyGames rerun after refresh_days, changes there can not be detected.
+STAGES = {
+    'genre_types': {
+        'command': ['api/import_genre_types.py'],
+        'inputs': ['common/bulk_load.py', 'common/http_cache.py'],
+        'queries': ['''SELECT COUNT(*), MAX(genre_type_id) FROM genre_type'''],
+        'refresh_days': 30,
+        'depends_on': [],
+    },
+    'genres': {
+        'command': ['api/import_genres.py'],
+        'inputs': ['common/bulk_load.py', 'common/http_cache.py'],
+        'queries': ['''SELECT COUNT(*), MAX(genre_type_id) FROM genre_type''', '''SELECT COUNT(*), MAX(genre_id) FROM genre'''],
+        'refresh_days': 30,
+        'depends_on': ['genre_types'],
+    },
+    'top_games': {
+        'command': ['json/import_top_2500_games.py'],
+        'inputs': [os.path.join(DATA_DIR, 'Top2500GamesbyRating.json'), 'common/bulk_load.py'],
+        'queries': ['''SELECT COUNT(*), MAX(game_id) FROM game'''],
+        'depends_on': [],
+    },
+    'game_data': {
+        'command': ['api/get_game_data_async.py', '--limit', '100000'],
+        'inputs': ['common/bulk_load.py', 'common/rate_limit.py'],
+        'queries': ['''SELECT COUNT(*), MAX(game_id) FROM game''', MISSING_RESPONSES_QUERY],
+        'depends_on': ['top_games'],
+    },
+    'platform_relations': {
+        'command': ['api/import_game_platform_relations.py', '--in-database'],
+        'inputs': ['common/bulk_load.py'],
+        'queries': ['''SELECT COUNT(*), MAX(game_id) FROM game_api_response''',
+                    '''SELECT COUNT(*), MAX(game_id) FROM games_platforms''', '''SELECT COUNT(*) FROM platform'''],
+        'depends_on': ['game_data'],
+    },
+    'genre_relations': {
+        'command': ['api/import_game_genre_relations.py', '--in-database'],
+        'inputs': ['common/bulk_load.py'],
+        'queries': ['''SELECT COUNT(*), MAX(game_id) FROM game_api_response''', '''SELECT COUNT(*), MAX(genre_id) FROM genre''',
+                    '''SELECT COUNT(*), MAX(game_id) FROM games_genres'''],
+        'depends_on': ['game_data', 'genres'],
+    },
+    'companies': {
+        'command': ['html/scrape_companies_parallel.py', 'games', '--limit', '100000'],
+        'inputs': ['html/company_parsing.py', 'common/bulk_load.py', 'common/rate_limit.py'],
+        'queries': ['''SELECT COUNT(*), MAX(game_id) FROM game''', '''SELECT COUNT(*), MAX(game_id) FROM games_companies'''],
+        'refresh_days': 30,
+        'depends_on': ['top_games'],
+    },
+    'company_names': {
+        'command': ['html/scrape_companies_parallel.py', 'names'],
+        'inputs': ['html/company_parsing.py', 'common/bulk_load.py', 'common/rate_limit.py'],
+        'queries': ['''SELECT COUNT(*), COUNT(company_name), MAX(company_id) FROM company'''],
+        'refresh_days': 30,
+        'depends_on': ['companies'],
+    },
+    'neo4j': {
+        'command': ['dbs/neon_to_neo4j_dynamic.py', '--incremental'],
+        'inputs': ['dbs/schema_definitions.py', 'dbs/provision_schema.py', 'dbs/neon_reader.py', 'dbs/sync_state.py'],
+        'queries': ['''SELECT COUNT(*), MAX(game_id) FROM game''', '''SELECT COUNT(*), COUNT(company_name), MAX(company_id) FROM company''',
+                    '''SELECT COUNT(*), MAX(genre_id) FROM genre''', '''SELECT COUNT(*), MAX(genre_type_id) FROM genre_type''',
+                    '''SELECT COUNT(*), MAX(platform_id) FROM platform''', '''SELECT COUNT(*) FROM games_companies''',
+                    '''SELECT COUNT(*) FROM games_genres''', '''SELECT COUNT(*) FROM games_platforms'''],
+        'cypher': ['''MATCH (n) RETURN count(n)'''],
+        'depends_on': ['genres', 'platform_relations', 'genre_relations', 'company_names'],
+    },
+    'static_export': {
+        'command': ['app/export_games.py'],
+        'inputs': ['app/game_documents.py', 'app/serialization.py', 'app/rdf_serializer.py'],
+        'cypher': ['''MATCH (v:GraphVersion) RETURN v.version'''],
+        'depends_on': ['neo4j'],
+    },
+}
+
+# Connections for the queries of the fingerprints, opened on first use
+connections = {}
+
+
+def load_pipeline_state(path=PIPELINE_STATE_FILE):
+    """
+    Load the state of the completed stages.
+
+    :param path: Path of the state file
+    :return: Dict of stage and its fingerprint and completion time, empty if nothing ran yet
+    """
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, 'r') as state_file:
+        return json.load(state_file)
+
+def save_pipeline_state(state, path=PIPELINE_STATE_FILE):
+    """
+    Save the state of the completed stages. The file is replaced
+    atomically, so an interrupted run never leaves a half-written state.
+
+    :param state: Dict of stage and its fingerprint and completion time
+    :param path: Path of the state file
+    """
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w') as state_file:
+        json.dump(state, state_file, indent=2)
+    os.replace(temp_path, path)
+
+def run_fingerprint_query(database, query):
+    """
+    Run a query of a fingerprint in Postgres or Neo4j.
+
+    :param database: postgres or neo4j
+    :param query: SQL or Cypher query
+    :return: Rows of the result, None if the database is not reachable
+    """
+    try:
+        if database not in connections:
+            load_dotenv()
+            if database == 'postgres':
+                connections[database] = psycopg2.connect(
+                    database=os.getenv("DB_NAME"),
+                    user=os.getenv("DB_USER"),
+                    password=os.getenv("DB_PASSWORD"),
+                    host=os.getenv("DB_HOST"),
+                )
+                connections[database].autocommit = True
+            else:
+                connections[database] = GraphDatabase.driver(os.getenv("NEO4J_URI"),
+                                                             auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD")))
+
+        if database == 'postgres':
+            with connections[database].cursor() as cursor:
+                cursor.execute(query)
+                return cursor.fetchall()
+        records, _, _ = connections[database].execute_query(query)
+        return [list(record.values()) for record in records]
+    except Exception as e:
+        print(f'Failed to run the query "{query}" for the fingerprint. Error: {e}')
+        return None
+
+def fingerprint_stage(stage):
+    """
+    Hash the command of a stage, the contents of its script and inputs and
+    the results of its queries. Missing inputs are hashed as missing, so
+    they count as changed once they appear. Queries that fail make the
+    fingerprint unique, so the stage counts as changed.
+
+    :param stage: Stage definition of STAGES
+    :return: Hex digest
+    """
+    digest = hashlib.sha256(json.dumps(stage['command']).encode())
+    for path in [stage['command'][0], *stage['inputs']]:
+        path = os.path.join(CODE_DIR, path)
+        digest.update(path.encode())
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                digest.update(hashlib.sha256(file.read()).digest())
+        else:
+            digest.update(b'missing')
+
+    for database, key in (('postgres', 'queries'), ('neo4j', 'cypher')):
+        for query in stage.get(key, []):
+            rows = run_fingerprint_query(database, query)
+            digest.update(query.encode())
+            digest.update(json.dumps(rows, default=str).encode() if rows is not None else os.urandom(16))
+    return digest.hexdigest()
+
+def is_stale(stage, entry):
+    """
+    Check if a completed stage must run again, because its fingerprint
+    changed or its data from MobyGames is older than refresh_days.
+
+    :param stage: Stage definition of STAGES
+    :param entry: State of the last completed run, None if it never completed
+    :return: True if the stage must run
+    """
+    if entry is None or entry['fingerprint'] != fingerprint_stage(stage):
+        return True
+    refresh_days = stage.get('refresh_days')
+    return bool(refresh_days) and time.time() - entry['completed_at'] > refresh_days * 86400
+
+def get_dependents(stages, names):
+    """
+    Collect the given stages and every stage that depends on them, directly
+    or indirectly.
+
+    :param stages: Stage definitions
+    :param names: Names of the stages
+    :return: Set of stage names
+    """
+    dependents = set(names)
+    changed = True
+    while changed:
+        changed = False
+        for name, stage in stages.items():
+            if name not in dependents and dependents.intersection(stage['depends_on']):
+                dependents.add(name)
+                changed = True
+    return dependents
+
+def check_stages(stages):
+    """
+    Check that every dependency exists and that the stages have no cycle.
+
+    :param stages: Stage definitions
+    :raises ValueError: If a dependency is unknown or the stages have a cycle
+    """
+    for name, stage in stages.items():
+        for dependency in stage['depends_on']:
+            if dependency not in stages:
+                raise ValueError(f'Stage {name} depends on the unknown stage {dependency}')
+
+    done = set()
+    while len(done) < len(stages):
+        ready = [name for name, stage in stages.items() if name not in done and set(stage['depends_on']) <= done]
+        if not ready:
+            raise ValueError(f'The stages {sorted(set(stages) - done)} have a cycle')
+        done.update(ready)
+
+def plan_stages(stages, state, only=None, force=()):
+    """
+    Select the stages to run: stale stages, forced stages and everything
+    downstream of them.
+
+    :param stages: Stage definitions
+    :param state: Dict of stage and state of the last completed runs
+    :param only: Names of the stages to consider, None for all
+    :param force: Names of the stages to run even if unchanged
+    :return: Set of stage names
+    """
+    changed = [name for name, stage in stages.items() if is_stale(stage, state.get(name))]
+    selected = get_dependents(stages, [*changed, *force])
+    if only is not None:
+        selected &= set(only)
+    return selected
+
+def run_stage(name, stage):
+    """
+    Run the script of a stage in its directory with the current interpreter.
+
+    :param name: Name of the stage
+    :param stage: Stage definition
+    :return: Tuple of exit code and duration in seconds
+    """
+    script, *arguments = stage['command']
+    script_path = os.path.join(CODE_DIR, script)
+
+    start = time.perf_counter()
+    print(f'[{name}] started: {script} {" ".join(arguments)}', flush=True)
+    process = subprocess.run([sys.executable, os.path.basename(script_path), *arguments], cwd=os.path.dirname(script_path))
+    duration = time.perf_counter() - start
+    print(f'[{name}] finished with exit code {process.returncode} in {duration:.1f}s', flush=True)
+
+    return process.returncode, duration
+
+def run_pipeline(stages, selected, state, max_parallel):
+    """
+    Run the selected stages as soon as their dependencies are done,
+    independent stages run concurrently. A stage is done if it completed in
+    this run or is not selected. Stages downstream of a failed stage are
+    skipped, the others still run. The state is saved after every stage, so
+    an interrupted run continues where it stopped.
+
+    :param stages: Stage definitions
+    :param selected: Names of the stages to run
+    :param state: Dict of stage and state of the last completed run, updated in place
+    :param max_parallel: Maximum number of stages running at once
+    :return: Dict of stage and result: done, failed or skipped
+    """
+    results = {}
+    pending = set(selected)
+    running = {}
+
+    with ThreadPoolExecutor(max_parallel) as executor:
+        while pending or running:
+            # Skip the stages whose dependencies failed
+            for name in sorted(pending):
+                if any(results.get(dependency) in ('failed', 'skipped') for dependency in stages[name]['depends_on']):
+                    print(f'[{name}] skipped, a dependency failed', flush=True)
+                    results[name] = 'skipped'
+                    pending.discard(name)
+
+            ready = [name for name in sorted(pending)
+                     if all(dependency not in selected or results.get(dependency) == 'done' for dependency in stages[name]['depends_on'])]
+            for name in ready[:max_parallel - len(running)]:
+                pending.discard(name)
+                running[executor.submit(run_stage, name, stages[name])] = name
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                returncode, _ = future.result()
+                if returncode == 0:
+                    results[name] = 'done'
+                    # The fingerprint is taken after the stage, since stages like game_data change their own queries
+                    state[name] = {'fingerprint': fingerprint_stage(stages[name]), 'completed_at': time.time()}
+                else:
+                    results[name] = 'failed'
+                    state.pop(name, None)
+                save_pipeline_state(state)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the stages of the pipeline in the order of their dependencies.')
+    parser.add_argument('stages', nargs='*', help='only run these stages if needed, defaults to all stages')
+    parser.add_argument('--force', nargs='+', default=[], metavar='STAGE',
+                        help='run these stages and their dependents even if their inputs did not change, "all" for every stage')
+    parser.add_argument('--parallel', type=int, default=4, help='maximum number of stages running at once')
+    parser.add_argument('--dry-run', action='store_true', help='print the stages that would run')
+    args = parser.parse_args()
+
+    check_stages(STAGES)
+    force = list(STAGES) if 'all' in args.force else args.force
+    for name in [*args.stages, *force]:
+        if name not in STAGES:
+            parser.error(f'unknown stage {name}, choose from {", ".join(STAGES)}')
+
+    state = load_pipeline_state()
+    selected = plan_stages(STAGES, state, args.stages or None, force)
+    if not selected:
+        print('All stages are up to date')
+        return
+
+    print(f'Stages to run: {", ".join(name for name in STAGES if name in selected)}')
+    if args.dry_run:
+        return
+
+    start = time.perf_counter()
+    results = run_pipeline(STAGES, selected, state, args.parallel)
+    print(f'Pipeline finished in {time.perf_counter() - start:.1f}s')
+    for name in STAGES:
+        if name in results:
+            print(f'{name}: {results[name]}')
+
+    if any(result != 'done' for result in results.values()):
+        sys.exit(1)
+
+
+# Allows the script to be imported without running main()
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        for connection in connections.values():
+            connection.close()
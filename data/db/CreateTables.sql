@@ -8,4 +8,8 @@ create table games_genres(game_id int references game(game_id), genre_id int ref
 CREATE TYPE company_type AS ENUM ('publisher', 'developer');
 create table games_companies(game_id int references game(game_id), company_id int references company(company_id), type company_type, constraint PK_games_companies primary key(game_id, company_id, type));
 create table platform(platform_id int primary key, name varchar);
-create table games_platforms(game_id int references game(game_id), platform_id int references platform(platform_id), constraint PK_games_platforms primary key (game_id, platform_id));
\ No newline at end of file
+create table games_platforms(game_id int references game(game_id), platform_id int references platform(platform_id), constraint PK_games_platforms primary key (game_id, platform_id));
+CREATE TYPE job_status AS ENUM ('pending', 'running', 'done', 'failed');
+create table scrape_job(queue varchar, item_id int, status job_status not null default 'pending', attempts int not null default 0, last_error varchar, worker varchar, lease_until timestamptz, updated_at timestamptz default now(), constraint PK_scrape_job primary key (queue, item_id));
+create index IX_scrape_job_claim on scrape_job(queue, status, item_id);
+create table rate_limit(name varchar primary key, due timestamptz not null default now());
\ No newline at end of file